@@ -0,0 +1,73 @@
+"""
+Environment driven choice of what a process loads.
+
+``BANK_APP_PROFILE``  ``full`` (default: API, HTML pages and the admin) or ``api``
+
+``api`` is for API-only web workers, ``run_worker`` and management
+commands: it leaves out the admin, messages and staticfiles apps with
+their middleware and context processors, serves only the REST API
+(``bank.api_urls``, no HTML pages) and renders JSON without the browsable
+API. Fewer apps means a faster ``django.setup()`` and a smaller process,
+which is what a freshly started autoscaled instance waits on.
+"""
+import os
+
+CORE_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'bank',
+    'rest_framework',
+]
+
+CORE_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'bank.metrics.MetricsMiddleware',
+    'bank.querybudget.QueryCountMiddleware',
+    'bank.routers.ReplicaRoutingMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+]
+
+CORE_CONTEXT_PROCESSORS = [
+    'django.template.context_processors.debug',
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+]
+
+APP_PROFILES = {
+    'full': {
+        'INSTALLED_APPS': [
+            'django.contrib.admin',
+            *CORE_APPS[:3],
+            'django.contrib.messages',
+            'django.contrib.staticfiles',
+            *CORE_APPS[3:],
+        ],
+        'MIDDLEWARE': [
+            *CORE_MIDDLEWARE,
+            'django.contrib.messages.middleware.MessageMiddleware',
+            'django.middleware.clickjacking.XFrameOptionsMiddleware',
+        ],
+        'CONTEXT_PROCESSORS': [*CORE_CONTEXT_PROCESSORS, 'django.contrib.messages.context_processors.messages'],
+        'ROOT_URLCONF': 'app.urls',
+        'BROWSABLE_API': True,
+    },
+    'api': {
+        'INSTALLED_APPS': CORE_APPS,
+        'MIDDLEWARE': CORE_MIDDLEWARE,
+        'CONTEXT_PROCESSORS': CORE_CONTEXT_PROCESSORS,
+        'ROOT_URLCONF': 'bank.api_urls',
+        'BROWSABLE_API': False,
+    },
+}
+
+
+def apps_from_env() -> dict:
+    profile = os.environ.get('BANK_APP_PROFILE', 'full')
+    try:
+        return dict(APP_PROFILES[profile])
+    except KeyError:
+        raise ValueError(f"Unknown BANK_APP_PROFILE {profile!r}, expected one of {', '.join(APP_PROFILES)}")
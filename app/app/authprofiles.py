@@ -0,0 +1,60 @@
+"""
+Environment driven password hashing and session configuration.
+
+``BANK_AUTH_PROFILE``       ``default`` (Django's hashing cost, database sessions) or ``fast``
+``BANK_SESSION_ENGINE``     overrides the profile's sessions: ``db``, ``cache``, ``cached_db`` or ``signed_cookies``
+``BANK_PBKDF2_ITERATIONS``  iterations of the tuned PBKDF2 hasher (default 100000)
+
+``fast`` hashes new passwords with Argon2 tuned to a few milliseconds when
+argon2-cffi is installed, otherwise with PBKDF2 at ``BANK_PBKDF2_ITERATIONS``,
+and reads sessions from the cache (``cached_db``) instead of querying the
+session table on every request. Both profiles verify each other's hashes,
+and a successful login rehashes the password with the active profile's
+hasher, so switching profiles needs no migration.
+"""
+import os
+from importlib.util import find_spec
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+DJANGO_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# the tuned hashers share their algorithm names with Django's, which they replace
+if find_spec('argon2') is not None:
+    FAST_HASHERS = ['bank.hashers.TunedArgon2PasswordHasher', 'bank.hashers.TunedPBKDF2PasswordHasher',
+                    *DJANGO_HASHERS[1:2], *DJANGO_HASHERS[3:]]
+else:
+    FAST_HASHERS = ['bank.hashers.TunedPBKDF2PasswordHasher', *DJANGO_HASHERS[1:]]
+
+AUTH_PROFILES = {
+    'default': {
+        'PASSWORD_HASHERS': DJANGO_HASHERS,
+        'SESSION_ENGINE': SESSION_ENGINES['db'],
+    },
+    'fast': {
+        'PASSWORD_HASHERS': FAST_HASHERS,
+        'SESSION_ENGINE': SESSION_ENGINES['cached_db'],
+    },
+}
+
+
+def auth_from_env() -> dict:
+    profile = os.environ.get('BANK_AUTH_PROFILE', 'default')
+    try:
+        config = dict(AUTH_PROFILES[profile])
+    except KeyError:
+        raise ValueError(f"Unknown BANK_AUTH_PROFILE {profile!r}, expected one of {', '.join(AUTH_PROFILES)}")
+    if os.environ.get('BANK_SESSION_ENGINE'):
+        config['SESSION_ENGINE'] = SESSION_ENGINES[os.environ['BANK_SESSION_ENGINE']]
+    return config
@@ -0,0 +1,80 @@
+"""
+Environment driven database configuration.
+
+``DATABASE_URL``           primary, e.g. ``postgres://user:pass@db:5432/bank`` or ``sqlite:///path/db.sqlite3``
+``DATABASE_REPLICA_URLS``  comma separated read replicas, registered as ``replica1``, ``replica2``, ...
+``DATABASE_CONN_MAX_AGE``  seconds to keep connections open (default 60 for PostgreSQL, 0 for SQLite)
+``DATABASE_POOL``          ``1`` to use Django's native connection pool (PostgreSQL with psycopg 3 only)
+``DATABASE_SQLITE_PROFILE`` ``fast`` for WAL, relaxed fsync, mmap and a busy timeout on every SQLite connection
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ENGINES = {
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+
+SQLITE_PROFILES = {
+    'default': {},
+    'fast': {
+        # take the write lock at BEGIN, so concurrent writers wait on busy_timeout
+        # instead of failing with "database is locked" when upgrading a read lock
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA mmap_size=268435456;'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    },
+}
+
+
+def database_from_url(url: str) -> dict:
+    parts = urlsplit(url)
+    try:
+        engine = ENGINES[parts.scheme]
+    except KeyError:
+        raise ValueError(f"Unsupported database URL scheme {parts.scheme!r}")
+
+    if engine.endswith('sqlite3'):
+        # sqlite:///relative.db, sqlite:////absolute/path.db
+        config = {
+            'ENGINE': engine,
+            'NAME': unquote(parts.path[1:]) or ':memory:',
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': dict(SQLITE_PROFILES[os.environ.get('DATABASE_SQLITE_PROFILE', 'default')]),
+        }
+    else:
+        config = {
+            'ENGINE': engine,
+            'NAME': unquote(parts.path.lstrip('/')),
+            'USER': unquote(parts.username or ''),
+            'PASSWORD': unquote(parts.password or ''),
+            'HOST': parts.hostname or '',
+            'PORT': str(parts.port or ''),
+            'CONN_MAX_AGE': 60,
+            'OPTIONS': dict(parse_qsl(parts.query)),
+        }
+        if os.environ.get('DATABASE_POOL') == '1':
+            # the pool replaces persistent connections
+            config['OPTIONS']['pool'] = True
+            config['CONN_MAX_AGE'] = 0
+
+    if 'DATABASE_CONN_MAX_AGE' in os.environ and not config.get('OPTIONS', {}).get('pool'):
+        config['CONN_MAX_AGE'] = int(os.environ['DATABASE_CONN_MAX_AGE'])
+    # re-validate persistent connections at the start of each request instead of failing mid-request
+    config['CONN_HEALTH_CHECKS'] = config['CONN_MAX_AGE'] != 0
+    return config
+
+
+def databases_from_env(default_url: str) -> dict:
+    databases = {'default': database_from_url(os.environ.get('DATABASE_URL', default_url))}
+    replicas = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    for number, url in enumerate(replicas, start=1):
+        # tests read replicas through the primary's test database
+        databases[f'replica{number}'] = {**database_from_url(url), 'TEST': {'MIRROR': 'default'}}
+    return databases
@@ -10,8 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import datetime
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
+from .appprofiles import apps_from_env
+from .authprofiles import auth_from_env
+from .databases import databases_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,29 +37,12 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
-INSTALLED_APPS = [
-    'django.contrib.admin',
-    'django.contrib.auth',
-    'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
-    # user added
-    "bank",
-    "rest_framework"
-]
+# Apps, middleware and URLconf from BANK_APP_PROFILE (full | api), see app/appprofiles.py
 
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
-
-ROOT_URLCONF = 'app.urls'
+_apps = apps_from_env()
+INSTALLED_APPS = _apps['INSTALLED_APPS']
+MIDDLEWARE = _apps['MIDDLEWARE']
+ROOT_URLCONF = _apps['ROOT_URLCONF']
 
 TEMPLATES = [
     {
@@ -60,12 +50,7 @@ TEMPLATES = [
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+            'context_processors': _apps['CONTEXT_PROCESSORS'],
         },
     },
 ]
@@ -76,17 +61,161 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Configured from DATABASE_URL / DATABASE_REPLICA_URLS, see app/databases.py
+
+DATABASES = databases_from_env(f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+DATABASE_ROUTERS = ['bank.routers.PrimaryReplicaRouter']
+
+# how long a client keeps reading from the primary after a write
+BANK_REPLICA_STICKY_SECONDS = 5
+
+# Metrics (/metrics): with several worker processes point BANK_METRICS_DIR at a
+# directory they share, emptied on deploy, so any worker can serve the sum
+
+BANK_METRICS_DIR = os.environ.get('BANK_METRICS_DIR') or None
+BANK_METRICS_FLUSH_INTERVAL = 1.0
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
+# how long responses to requests with an Idempotency-Key header are kept for replay
+BANK_IDEMPOTENCY_TTL = 24 * 3600
+
+# funnel balance changes through one writer thread per process, see bank/writequeue.py;
+# pairs with DATABASE_SQLITE_PROFILE=fast
+BANK_WRITE_QUEUE = os.environ.get('BANK_WRITE_QUEUE') == '1'
+
+# Background tasks (bank/tasks.py, run by `manage.py run_worker`): how long a claimed task
+# may run before another worker takes it over, and the annual savings interest rate in percent
+BANK_TASK_LEASE = 600
+BANK_SAVINGS_INTEREST_RATE = '2.00'
+
+# Standing orders (bank/standing.py, run by `manage.py run_standing_orders`): how long a runner
+# holds a claimed batch before another may take it over, and how many orders a batch pays
+BANK_STANDING_ORDER_LEASE = 300
+BANK_STANDING_ORDER_BATCH = 500
+
+# Velocity limits on withdrawals and transfers per account / per user within a sliding
+# window of seconds, counted in the cache (share it between processes), see bank/velocity.py;
+# a bulk transfer (payroll, standing orders) is one payment per source account for max_count;
+# run `manage.py rebuild_velocity` after changing them
+
+BANK_VELOCITY_RULES = [
+    {'scope': 'account', 'window': 60, 'max_count': 10},
+    {'scope': 'account', 'window': 24 * 3600, 'max_count': 200, 'max_amount': '20000.00'},
+    {'scope': 'user', 'window': 24 * 3600, 'max_amount': '50000.00'},
+]
+
+# Cache
+# BANK_CACHE=locmem (default) | file | redis; the file backend is a drop-in local stand-in for redis
+
+BANK_CACHE = os.environ.get('BANK_CACHE', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bank',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('BANK_CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('BANK_CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[BANK_CACHE],
+}
+
+# Real-time events on /api/events/ (ASGI, see bank/events.py)
+# BANK_EVENTS=local (default, one process serves the API and the streams) | redis (several processes or nodes)
+
+BANK_EVENTS = os.environ.get('BANK_EVENTS', 'local')
+EVENT_BROKERS = {
+    'local': {'BACKEND': 'bank.events.LocalBroker', 'OPTIONS': {}},
+    'redis': {
+        'BACKEND': 'bank.events.RedisBroker',
+        'OPTIONS': {'url': os.environ.get('BANK_EVENTS_LOCATION', 'redis://127.0.0.1:6379/0')},
+    },
+}
+BANK_EVENT_BROKER = EVENT_BROKERS[BANK_EVENTS]
+
+# API auth: stateless JWT (bank/authentication.py) when djangorestframework-simplejwt is installed,
+# sessions for the browser and basic auth for scripts
+
+BANK_JWT = find_spec('rest_framework_simplejwt') is not None
+# byte-identical JSON encoded with orjson when it is installed (bank/renderers.py)
+BANK_ORJSON = find_spec('orjson') is not None
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': datetime.timedelta(minutes=5),  # also how long stale is_staff claims can live
+    'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=1),
+    'ROTATE_REFRESH_TOKENS': True,
+    'UPDATE_LAST_LOGIN': False,
 }
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        *(['bank.authentication.StatelessJWTAuthentication'] if BANK_JWT else []),
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'bank.renderers.ORJSONRenderer' if BANK_ORJSON else 'rest_framework.renderers.JSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if _apps['BROWSABLE_API'] else []),
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'bank.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_FILTER_BACKENDS': [
+        'bank.filters.QueryParamFilterBackend',
+    ],
+}
+
+# Maximum SQL queries per request, by URL name (checked by bank.querybudget.QueryCountMiddleware
+# when DEBUG is on; BANK_QUERY_BUDGET_STRICT turns overruns into errors)
+
+BANK_QUERY_BUDGETS = {
+    'customuser-list': 3,
+    'bankaccount-list': 3,
+    'bankaccount-detail': 3,
+    'bankaccount-statement': 3,
+    'logentry-list': 3,
+    'logentry-export': 2,
+    'task-list': 3,
+    'task-detail': 3,
+    'analytics-list': 5,
+    'analytics-bank': 6,
+    'async-account-list': 4,
+    'async-account-detail': 3,
+    'async-log-list': 3,
+    'profile': 2,
+    'account': 3,
+    'dashboard': 9,
+    'bank_bankaccount_changelist': 5,
+}
+BANK_QUERY_BUDGET_STRICT = False
+
+# Audit log destination, see bank/logsinks.py
+# (BufferedSink batches inserts off the request path, on_commit=True writes rows only when the business transaction commits)
+
+BANK_LOG_SINK = {
+    'BACKEND': 'bank.logsinks.SyncSink',
+    'OPTIONS': {},
+}
+
+# Password hashing and sessions from BANK_AUTH_PROFILE / BANK_SESSION_ENGINE, see app/authprofiles.py
+
+_auth = auth_from_env()
+PASSWORD_HASHERS = _auth['PASSWORD_HASHERS']
+SESSION_ENGINE = _auth['SESSION_ENGINE']
+BANK_PBKDF2_ITERATIONS = int(os.environ.get('BANK_PBKDF2_ITERATIONS', 100_000))
+
+# failed logins are throttled per client IP and per username before any password is hashed
+AUTHENTICATION_BACKENDS = ['bank.throttling.ThrottledModelBackend']
+BANK_LOGIN_THROTTLE = {
+    'ip': (50, 300),  # failed attempts per window in seconds
+    'username': (10, 300),
 }
 
 # Password validation
@@ -125,6 +254,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (profile pictures) and statements rendered by background tasks
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -1,5 +1,34 @@
 from django.contrib import admin
-from .models import CustomUser, BankAccount
+from .models import CustomUser, BankAccount, StandingOrder, Task
 
 admin.site.register(CustomUser)
-admin.site.register(BankAccount)
+
+
+@admin.register(BankAccount)
+class BankAccountAdmin(admin.ModelAdmin):
+    list_display = ('account_number', 'account_holder', 'account_type', 'balance', 'bank_name')
+    list_filter = ('account_type',)
+    search_fields = ('account_number',)
+    # BankAccount.__str__ and the holder column read account_holder.username - join it instead of a query per row
+    list_select_related = ('account_holder',)
+    # a search box instead of a <select> listing every user
+    raw_id_fields = ('account_holder',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # editing the balance would bypass the ledger; a new account's opening balance is journaled by save()
+        return ('balance',) if obj is not None else ()
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'name')
+    raw_id_fields = ('user',)
+
+
+@admin.register(StandingOrder)
+class StandingOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'from_account', 'to_account', 'amount', 'frequency', 'next_run_at', 'active', 'last_status')
+    list_filter = ('active', 'frequency', 'last_status')
+    list_select_related = ('from_account__account_holder', 'to_account__account_holder')
+    raw_id_fields = ('from_account', 'to_account')
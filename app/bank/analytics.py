@@ -0,0 +1,232 @@
+"""
+Account analytics answered by the database from daily ledger rollups.
+
+``DailyRollup`` holds, per account and day (``TIME_ZONE``), the money that
+came in (``credited``) and went out (``debited``) and the number of ledger
+entries behind it.
+``ledger.record()`` adds every entry it writes to its rollup in the same
+transaction (one ``INSERT ... ON CONFLICT DO UPDATE`` per account and day),
+so the rollups are exactly as current as the balances. A report over a
+year therefore reads at most one row per account and active day instead
+of every ledger entry, and all totals, period buckets, running sums and
+rankings are computed by ``annotate()`` and window functions in one
+statement each.
+
+``rebuild_rollups`` recomputes the table from the ledger (after a restore,
+or for entries written before the rollups existed).
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Func, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, Rank, Trunc, TruncDate
+from django.utils import timezone
+
+from .enums import AccountType, Direction
+from .models import BankAccount, DailyRollup, LedgerEntry
+
+PERIODS = ('day', 'week', 'month', 'year')
+# default report range per period, in days back from today
+DEFAULT_SPAN = {'day': 30, 'week': 7 * 12, 'month': 365, 'year': 5 * 365}
+TOP_HOLDERS = 10
+MONEY = DecimalField(max_digits=17, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+
+class RunningTotal(Func):
+    """ ``SUM(<aggregate>)`` for use in ``Window()``; ``Sum()`` refuses an aggregate as its argument """
+    function = 'SUM'
+    window_compatible = True
+    output_field = MONEY
+
+
+# maintenance
+
+def rollup_day(moment) -> datetime.date:
+    return timezone.localdate(moment, timezone.get_default_timezone())
+
+
+def roll_up(entries: list) -> None:
+    """ Add ledger entries to their accounts' daily rollups; call in the transaction that writes them """
+    totals = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00'), 0, 0])
+    for entry in entries:
+        row = totals[entry.account_id, rollup_day(entry.created_at)]
+        amount = Decimal(str(entry.amount))
+        if entry.direction == Direction.CREDIT.value:
+            row[0] += amount
+            row[2] += 1
+        else:
+            row[1] += amount
+            row[3] += 1
+    if not totals:
+        return
+    if connection.features.supports_update_conflicts_with_target:
+        _upsert([(account_id, day, *row) for (account_id, day), row in totals.items()])
+        return
+    # the caller holds the accounts' row locks, so nobody inserts the same rollup meanwhile
+    for (account_id, day), (credited, debited, credits, debits) in totals.items():
+        if not DailyRollup.objects.filter(account_id=account_id, day=day).update(
+            credited=F('credited') + credited, debited=F('debited') + debited,
+            credits=F('credits') + credits, debits=F('debits') + debits,
+        ):
+            DailyRollup.objects.create(
+                account_id=account_id, day=day, credited=credited, debited=debited, credits=credits, debits=debits,
+            )
+
+
+def _upsert(rows: list) -> None:
+    """ ``(account_id, day, credited, debited, credits, debits)`` rows added onto existing rollups """
+    quote = connection.ops.quote_name
+    table = quote(DailyRollup._meta.db_table)
+    columns = [DailyRollup._meta.get_field(name).column for name in ('account', 'day')]
+    summed = [quote(name) for name in ('credited', 'debited', 'credits', 'debits')]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(map(quote, columns))}, {', '.join(summed)}) VALUES (%s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT ({', '.join(map(quote, columns))}) DO UPDATE SET "
+        + ", ".join(f"{column} = {table}.{column} + excluded.{column}" for column in summed)
+    )
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (account_id, ops.adapt_datefield_value(day), ops.adapt_decimalfield_value(credited),
+             ops.adapt_decimalfield_value(debited), credits, debits)
+            for account_id, day, credited, debited, credits, debits in rows
+        ])
+
+
+def rebuild_rollups(account_ids: list) -> int:
+    """
+    Recompute the rollups of ``account_ids`` from the ledger in one grouped
+    query. The accounts are locked meanwhile, so no balance change can slip
+    in between the delete and the insert.
+    """
+    with transaction.atomic():
+        ids = list(BankAccount.objects.select_for_update().filter(pk__in=account_ids).values_list('pk', flat=True))
+        DailyRollup.objects.filter(account_id__in=ids).delete()
+        credit = Q(direction=Direction.CREDIT.value)
+        rows = (
+            LedgerEntry.objects.filter(account_id__in=ids)
+            .values('account_id', day=TruncDate('created_at', tzinfo=timezone.get_default_timezone()))
+            .annotate(
+                credited=Coalesce(Sum('amount', filter=credit), ZERO),
+                debited=Coalesce(Sum('amount', filter=~credit), ZERO),
+                credits=Count('pk', filter=credit),
+                debits=Count('pk', filter=~credit),
+            )
+            .order_by()
+        )
+        return len(DailyRollup.objects.bulk_create(DailyRollup(**row) for row in rows))
+
+
+# reports
+
+def report_range(period: str, since: datetime.date = None, until: datetime.date = None) -> tuple:
+    """ ``(since, until)`` days, defaulting to ``DEFAULT_SPAN[period]`` days up to today """
+    until = until or timezone.localdate(timezone.now(), timezone.get_default_timezone())
+    since = since or until - datetime.timedelta(days=DEFAULT_SPAN[period] - 1)
+    if since > until:
+        raise ValueError("since must not be after until")
+    return since, until
+
+
+def flows(rollups, period: str, opening: Decimal) -> list:
+    """
+    Inflow/outflow per ``period`` bucket and the running net from one
+    grouped query with a window over the buckets; the balance at the end of
+    each bucket is ``opening`` plus that running net.
+    """
+    net = Sum(F('credited') - F('debited'), output_field=MONEY)
+    rows = list(
+        rollups.values(period=Trunc('day', period))
+        .annotate(
+            inflow=Sum('credited'), outflow=Sum('debited'), net=net,
+            transactions=Sum(F('credits') + F('debits')), active_accounts=Count('account', distinct=True),
+        )
+        .annotate(running_net=Window(RunningTotal(F('net')), order_by=F('period').asc()))
+        .order_by('period')
+    )
+    for row in rows:
+        row['closing_balance'] = opening + row['running_net']
+    return rows
+
+
+def by_type(accounts, rollups, since, until) -> tuple:
+    """
+    Accounts, balance (and its share of the total, a window over the
+    groups) and the range's inflow/outflow per ``AccountType``, plus the
+    total balance at the start of the range: the current balance less
+    everything that moved since ``since``.
+    """
+    holdings = {
+        row['account_type']: row for row in
+        accounts.values('account_type')
+        .annotate(accounts=Count('pk'), held=Sum('balance'), total=Window(RunningTotal(F('held'))))
+        .order_by()
+    }
+    in_range = Q(day__lte=until)
+    moved = {
+        row['account_type']: row for row in
+        rollups.filter(day__gte=since)
+        .values(account_type=F('account__account_type'))
+        .annotate(
+            inflow=Coalesce(Sum('credited', filter=in_range), ZERO),
+            outflow=Coalesce(Sum('debited', filter=in_range), ZERO),
+            net_since=Sum(F('credited') - F('debited'), output_field=MONEY),
+        )
+        .order_by()
+    }
+    rows, opening = [], Decimal('0.00')
+    for tag in AccountType:
+        held, flow = holdings.get(tag.value), moved.get(tag.value)
+        if held is None and flow is None:
+            continue
+        balance = held['held'] if held else Decimal('0.00')
+        net_since = flow['net_since'] if flow else Decimal('0.00')
+        opening += balance - net_since
+        rows.append({
+            'account_type': tag.value,
+            'label': str(tag),
+            'accounts': held['accounts'] if held else 0,
+            'balance': balance,
+            'share': held['held'] * 100 / held['total'] if held and held['total'] else None,
+            'inflow': flow['inflow'] if flow else Decimal('0.00'),
+            'outflow': flow['outflow'] if flow else Decimal('0.00'),
+        })
+    return rows, opening
+
+
+def summary(accounts, rollups, period: str, since: datetime.date, until: datetime.date) -> dict:
+    types, opening = by_type(accounts, rollups, since, until)
+    return {
+        'period': period, 'since': since, 'until': until, 'opening_balance': opening, 'by_type': types,
+        'flows': flows(rollups.filter(day__gte=since, day__lte=until), period, opening),
+    }
+
+
+def holder_summary(user_id: int, period: str = 'month', since=None, until=None) -> dict:
+    """ Analytics over the accounts of one user """
+    since, until = report_range(period, since, until)
+    return summary(
+        BankAccount.objects.filter(account_holder_id=user_id),
+        DailyRollup.objects.filter(account__account_holder_id=user_id),
+        period, since, until,
+    )
+
+
+def top_holders(limit: int = TOP_HOLDERS) -> list:
+    """ Users with the largest total balance, ranked by the database """
+    return list(
+        BankAccount.objects.values('account_holder', username=F('account_holder__username'))
+        .annotate(accounts=Count('pk'), total=Sum('balance'), rank=Window(Rank(), order_by=F('total').desc()))
+        .order_by('rank', 'account_holder')[:limit]
+    )
+
+
+def bank_summary(period: str = 'month', since=None, until=None, top: int = TOP_HOLDERS) -> dict:
+    """ Bank-wide analytics for administrators """
+    since, until = report_range(period, since, until)
+    data = summary(BankAccount.objects.all(), DailyRollup.objects.all(), period, since, until)
+    data['top_holders'] = top_holders(top)
+    return data
@@ -0,0 +1,35 @@
+"""
+REST API routes; the whole URLconf of the ``api`` app profile and part of
+``full`` (bank/urls.py).
+"""
+from django.conf import settings
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from bank import async_views
+from bank.views import (
+    AnalyticsViewSet, CustomUserViewSet, BankAccountViewSet, LogEntryViewSet, TaskViewSet, metrics_view
+)
+
+router = DefaultRouter()
+router.register(r'users', CustomUserViewSet)
+router.register(r'accounts', BankAccountViewSet)
+router.register(r'logs', LogEntryViewSet)
+router.register(r'tasks', TaskViewSet)
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+
+urlpatterns = [
+    path('api/', include(router.urls)),
+    path('api/async/accounts/', async_views.account_list, name='async-account-list'),
+    path('api/async/accounts/<int:pk>/', async_views.account_detail, name='async-account-detail'),
+    path('api/async/logs/', async_views.log_list, name='async-log-list'),
+    path('metrics', metrics_view, name='metrics'),
+]
+
+if settings.BANK_JWT:
+    from bank.authentication import TokenObtainView, TokenRefreshWithClaimsView, TokenRevokeView
+
+    urlpatterns += [
+        path('api/token/', TokenObtainView.as_view(), name='token-obtain'),
+        path('api/token/refresh/', TokenRefreshWithClaimsView.as_view(), name='token-refresh'),
+        path('api/token/revoke/', TokenRevokeView.as_view(), name='token-revoke'),
+    ]
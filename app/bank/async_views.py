@@ -0,0 +1,123 @@
+"""
+ASGI-native read endpoints. They run on the event loop and use the async
+ORM (``aget``, ``acount``, async iteration) so no request needs a
+``sync_to_async`` thread hop. Paging is keyset based: ``?after=<id>`` for
+accounts, ``?before=<id>`` for logs, ``?limit=`` up to 500. Like the REST
+API they accept the session or, with ``BANK_JWT``, an
+``Authorization: Bearer`` access token.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.http import Http404, JsonResponse
+
+from . import params
+from .cache import aget_user_accounts
+from .models import BankAccount, LogEntry
+from .serializers import BankAccountSerializer, LogEntrySerializer
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def _error(detail: str, status: int) -> JsonResponse:
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _int_param(request, name: str, default=None):
+    raw = request.GET.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        return params.integer(raw)
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}")
+
+
+async def authenticate(request):
+    """
+    The user of an ``Authorization: Bearer`` access token with ``BANK_JWT``,
+    else the session's; ``None`` when anonymous. Needs ``request.session``.
+    """
+    if settings.BANK_JWT and request.META.get('HTTP_AUTHORIZATION'):
+        from rest_framework.exceptions import AuthenticationFailed
+
+        from .authentication import StatelessJWTAuthentication
+
+        try:
+            result = await sync_to_async(StatelessJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed:
+            return None
+        return result[0] if result else None
+    user = await auth.aget_user(request)
+    return user if user.is_authenticated else None
+
+
+async def _authenticated_user(request, staff: bool = False):
+    user = await authenticate(request)
+    if user is None:
+        return None, _error('Authentication credentials were not provided.', 403)
+    if staff and not user.is_staff:
+        return None, _error('You do not have permission to perform this action.', 403)
+    return user, None
+
+
+async def account_list(request):
+    user, error = await _authenticated_user(request)
+    if error:
+        return error
+    if not user.is_staff:
+        accounts = await aget_user_accounts(user.pk)
+        return JsonResponse({
+            'count': len(accounts),
+            'next_after': None,
+            'results': BankAccountSerializer(accounts, many=True).data,
+        })
+
+    try:
+        after = _int_param(request, 'after', 0)
+        limit = max(1, min(_int_param(request, 'limit', DEFAULT_LIMIT), MAX_LIMIT))
+    except ValueError as e:
+        return _error(str(e), 400)
+    page = BankAccount.objects.filter(pk__gt=after).order_by('pk')[:limit]
+    accounts = [account async for account in page]
+    return JsonResponse({
+        'count': await BankAccount.objects.acount(),
+        'next_after': accounts[-1].pk if len(accounts) == limit else None,
+        'results': BankAccountSerializer(accounts, many=True).data,
+    })
+
+
+async def account_detail(request, pk: int):
+    user, error = await _authenticated_user(request)
+    if error:
+        return error
+    if user.is_staff:
+        try:
+            account = await BankAccount.objects.aget(pk=pk)
+        except BankAccount.DoesNotExist:
+            raise Http404
+    else:
+        account = next((account for account in await aget_user_accounts(user.pk) if account.pk == pk), None)
+        if account is None:
+            raise Http404
+    return JsonResponse(BankAccountSerializer(account).data)
+
+
+async def log_list(request):
+    user, error = await _authenticated_user(request, staff=True)
+    if error:
+        return error
+    try:
+        before = _int_param(request, 'before')
+        limit = max(1, min(_int_param(request, 'limit', DEFAULT_LIMIT), MAX_LIMIT))
+    except ValueError as e:
+        return _error(str(e), 400)
+    entries = LogEntry.objects.order_by('-pk')
+    if before is not None:
+        entries = entries.filter(pk__lt=before)
+    page = [entry async for entry in entries[:limit].aiterator()]
+    return JsonResponse({
+        'next_before': page[-1].pk if len(page) == limit else None,
+        'results': LogEntrySerializer(page, many=True).data,
+    })
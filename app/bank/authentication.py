@@ -0,0 +1,123 @@
+"""
+Stateless JWT authentication for the REST API (djangorestframework-simplejwt).
+
+Access tokens carry ``user_id``, ``username`` and ``is_staff``, and
+``StatelessJWTAuthentication`` builds a ``TokenUser`` from those claims, so
+an authenticated API read needs neither a session nor a user query. The
+claims are re-read from the database when a refresh token is exchanged,
+so a demoted or deactivated user keeps access for at most one access token
+lifetime.
+
+Revoked tokens go to a denylist keyed by ``jti`` in the cache, where each
+entry lives exactly as long as its token would have, so every check is a
+single key lookup. With several server processes the cache must be shared
+(``BANK_CACHE=redis`` or ``file``). Refresh tokens are rotated, and the
+token a refresh replaces is denied.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework import permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+DENYLIST_PREFIX = 'bank:jwt:denied:'
+
+
+def _cache():
+    return caches[getattr(settings, 'BANK_CACHE_ALIAS', 'default')]
+
+
+def deny(token: Token) -> None:
+    """ Revoke ``token`` until it would have expired anyway """
+    remaining = int(token['exp'] - time.time())
+    if remaining > 0:
+        _cache().set(DENYLIST_PREFIX + token[api_settings.JTI_CLAIM], True, remaining)
+
+
+def is_denied(token: Token) -> bool:
+    return _cache().get(DENYLIST_PREFIX + token[api_settings.JTI_CLAIM]) is not None
+
+
+def add_claims(token: Token, user) -> Token:
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    return token
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """ ``Authorization: Bearer <access token>``; the user comes from the claims, not the database """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_denied(token):
+            raise InvalidToken('Token has been revoked.')
+        return token
+
+
+class BankTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class BankTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_denied(refresh):
+            raise TokenError('Token has been revoked.')
+        user = (
+            get_user_model().objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True)
+            .only('username', 'is_staff').first()
+        )
+        if user is None:
+            raise TokenError('User is inactive or deleted.')
+        add_claims(refresh, user)
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            deny(refresh)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class TokenObtainView(TokenObtainPairView):
+    """ Username and password for an access/refresh token pair (login throttling applies) """
+    serializer_class = BankTokenObtainPairSerializer
+
+
+class TokenRefreshWithClaimsView(TokenRefreshView):
+    serializer_class = BankTokenRefreshSerializer
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
+class TokenRevokeView(APIView):
+    """ Logout: deny the given refresh token and the access token the request was made with """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = TokenRevokeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            refresh = RefreshToken(serializer.validated_data['refresh'])
+        except TokenError as e:
+            raise InvalidToken(str(e))
+        if str(refresh[api_settings.USER_ID_CLAIM]) != str(request.user.pk):
+            return Response({'detail': 'Not your token.'}, status=status.HTTP_403_FORBIDDEN)
+        deny(refresh)
+        if isinstance(request.auth, Token):
+            deny(request.auth)
+        return Response(status=status.HTTP_205_RESET_CONTENT)
@@ -0,0 +1,137 @@
+"""
+Benchmark scenarios for the bank app, run with ``manage.py bench``.
+
+Each scenario module registers one or more functions with ``@scenario``.
+A scenario receives the parsed command options as a dict and returns a
+JSON-serialisable dict of results.
+"""
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+from importlib import import_module
+
+from django.db import connection
+
+SCENARIOS = {}
+SCENARIO_MODULES = [
+    "bank.benchmarks.transfers",
+    "bank.benchmarks.bulk_transfers",
+    "bank.benchmarks.logs_query",
+    "bank.benchmarks.account_cache",
+    "bank.benchmarks.connections",
+    "bank.benchmarks.sqlite",
+    "bank.benchmarks.operations",
+    "bank.benchmarks.http",
+    "bank.benchmarks.metrics",
+    "bank.benchmarks.serializers",
+    "bank.benchmarks.analytics",
+    "bank.benchmarks.startup",
+    "bank.benchmarks.velocity",
+    "bank.benchmarks.standing_orders",
+    "bank.benchmarks.events",
+]
+
+
+def scenario(name: str):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def load_scenarios() -> dict:
+    for module in SCENARIO_MODULES:
+        import_module(module)
+    return SCENARIOS
+
+
+def summarize(samples: list) -> dict:
+    """ Latency summary in milliseconds for a list of durations in seconds """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def compare(baseline, current, path: str = "") -> list:
+    """
+    Walk two result trees and list the metrics that moved, as
+    ``(path, baseline, current, change)``. ``*_ms`` and ``*_s`` are better
+    lower, ``*_per_s`` better higher; ``change`` is positive for a regression.
+    """
+    changes = []
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            changes += compare(old or {}, value, name)
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old and not isinstance(value, bool):
+            if key.endswith("_per_s"):
+                changes.append((name, old, value, (old - value) / old))
+            elif key.endswith(("_ms", "_s")):
+                changes.append((name, old, value, (value - old) / old))
+    return changes
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_threads(count: int, target) -> float:
+    """
+    Run ``target(index)`` in ``count`` threads and return the wall time.
+    Every thread closes its own database connection when it is done.
+    """
+    def worker(index):
+        try:
+            target(index)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def make_accounts(count: int, balance=Decimal("1000.00")) -> list:
+    """ Create one bench user holding ``count`` accounts with the given balance """
+    from bank.enums import AccountType
+    from bank.ledger import record_opening
+    from bank.models import BankAccount, CustomUser
+
+    tag = uuid.uuid4().hex[:8]
+    user = CustomUser.objects.create(
+        username=f"bench-{tag}", email=f"bench-{tag}@example.com",
+        first_name="Bench", last_name="User",
+    )
+    accounts = BankAccount.objects.bulk_create(
+        BankAccount(
+            account_number=f"B{tag}{i:011d}",
+            account_holder=user,
+            account_type=AccountType.CHECKING.value,
+            bank_name="Bench",
+            balance=balance,
+        )
+        for i in range(count)
+    )
+    record_opening(accounts)
+    return accounts
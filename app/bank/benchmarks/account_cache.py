@@ -0,0 +1,28 @@
+import time
+
+from django.core.cache import cache
+
+from bank.cache import get_user_accounts, invalidate_accounts, stats
+from bank.models import BankAccount
+
+from . import make_accounts, scenario, summarize
+
+
+@scenario("account_cache")
+def account_cache(options: dict) -> dict:
+    """ Account list lookups straight from the database versus through the per-user cache """
+    user_id = make_accounts(options["scale"] or 5)[0].account_holder_id
+    cache.clear()
+    stats.reset()
+
+    db, cached = [], []
+    for _ in range(options["iterations"]):
+        start = time.perf_counter()
+        list(BankAccount.objects.filter(account_holder_id=user_id).order_by("id"))
+        db.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        get_user_accounts(user_id)
+        cached.append(time.perf_counter() - start)
+        if len(cached) % 10 == 0:
+            invalidate_accounts(user_id)  # outside a transaction this runs immediately
+    return {"database": summarize(db), "cached": summarize(cached), "stats": stats.snapshot()}
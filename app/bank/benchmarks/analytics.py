@@ -0,0 +1,68 @@
+import datetime
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Trunc
+
+from bank import analytics
+from bank.enums import Direction
+from bank.models import DailyRollup, LedgerEntry
+from bank.seeding import insert_rows, stored_now
+
+from . import make_accounts, scenario, summarize
+
+
+@scenario("analytics")
+def analytics_report(options: dict) -> dict:
+    """ A year of monthly inflow/outflow for one holder: grouped over raw ledger entries vs over daily rollups """
+    rows = options["scale"] or 200_000
+    accounts = make_accounts(20)
+    ids = [account.pk for account in accounts]
+    holder = accounts[0].account_holder_id
+    rnd = random.Random(0)
+    now = stored_now()
+    step = datetime.timedelta(days=365) / rows
+    insert_rows(LedgerEntry, ["account", "transfer_id", "direction", "amount", "created_at"], (
+        (rnd.choice(ids), uuid.uuid4(), rnd.choice((Direction.CREDIT.value, Direction.DEBIT.value)),
+         Decimal(rnd.randint(1, 100_000)) / 100, now - step * i)
+        for i in range(rows)
+    ))
+    start = time.perf_counter()
+    rollup_rows = analytics.rebuild_rollups(ids)
+    rebuild_elapsed = time.perf_counter() - start
+
+    since, until = analytics.report_range("month")
+    credit = Q(direction=Direction.CREDIT.value)
+    queries = {
+        "ledger": lambda: list(
+            LedgerEntry.objects.filter(account__account_holder_id=holder, created_at__date__gte=since)
+            .values(period=Trunc("created_at", "month"))
+            .annotate(inflow=Sum("amount", filter=credit), outflow=Sum("amount", filter=~credit), transactions=Count("pk"))
+            .order_by("period")
+        ),
+        "rollups": lambda: analytics.flows(
+            DailyRollup.objects.filter(account__account_holder_id=holder, day__gte=since, day__lte=until),
+            "month", Decimal("0.00"),
+        ),
+        "holder_summary": lambda: analytics.holder_summary(holder, "month"),
+    }
+    results = {
+        "ledger_entries": rows,
+        "rollup_rows": rollup_rows,
+        "rebuild_rows_per_s": rows / rebuild_elapsed,
+    }
+    for name, query in queries.items():
+        samples = []
+        for _ in range(options["iterations"]):
+            start = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - start)
+        results[name] = summarize(samples)
+    ledger = {(row["period"].date() if hasattr(row["period"], "date") else row["period"]): row["transactions"]
+              for row in queries["ledger"]()}
+    results["consistent"] = ledger == {row["period"]: row["transactions"] for row in queries["rollups"]()}
+    results["speedup"] = results["ledger"]["mean_ms"] / results["rollups"]["mean_ms"]
+    return results
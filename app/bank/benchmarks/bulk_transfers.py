@@ -0,0 +1,53 @@
+import random
+import time
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from bank.models import BankAccount
+from bank.services import bulk_transfer, transfer
+
+from . import make_accounts, scenario
+
+
+@scenario("bulk_transfers")
+def bulk_transfers(options: dict) -> dict:
+    """
+    Legs per second for the batched bulk transfer path compared with the
+    same legs applied one by one through ``transfer()``.
+    """
+    accounts = make_accounts(options["scale"] or 1000)
+    numbers = [account.account_number for account in accounts]
+    pks = [account.pk for account in accounts]
+    rnd = random.Random(0)
+    leg_count = options["iterations"] * 10
+
+    def legs(count):
+        return [(*rnd.sample(numbers, 2), str(Decimal(rnd.randint(1, 2000)) / 100)) for _ in range(count)]
+
+    expected_total = BankAccount.objects.filter(pk__in=pks).aggregate(total=Sum("balance"))["total"]
+
+    batch = legs(leg_count)
+    start = time.perf_counter()
+    results = bulk_transfer(batch)
+    bulk_elapsed = time.perf_counter() - start
+
+    by_number = {account.account_number: account for account in accounts}
+    single = legs(min(leg_count, 500))
+    start = time.perf_counter()
+    for source, target, amount in single:
+        try:
+            transfer(by_number[source], by_number[target], amount)
+        except ValueError:
+            pass
+    single_elapsed = time.perf_counter() - start
+
+    total = BankAccount.objects.filter(pk__in=pks).aggregate(total=Sum("balance"))["total"]
+    return {
+        "legs": leg_count,
+        "succeeded": sum(1 for result in results if result["status"] == "success"),
+        "bulk_elapsed_s": bulk_elapsed,
+        "bulk_legs_per_s": leg_count / bulk_elapsed,
+        "single_legs_per_s": len(single) / single_elapsed,
+        "money_conserved": total == expected_total,
+    }
@@ -0,0 +1,32 @@
+import time
+
+from django.db import connection
+
+from . import scenario, summarize
+
+
+@scenario("connections")
+def connections(options: dict) -> dict:
+    """
+    Cost of a trivial query when every request opens a new connection
+    (CONN_MAX_AGE=0) versus reusing a persistent one.
+    """
+    def query():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+
+    results = {"vendor": connection.vendor}
+    for name, reconnect in (("new_connection_per_request", True), ("persistent_connection", False)):
+        samples = []
+        for _ in range(options["iterations"]):
+            if reconnect:
+                connection.close()
+            start = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - start)
+        results[name] = summarize(samples)
+    results["setup_overhead_ms"] = (
+        results["new_connection_per_request"]["mean_ms"] - results["persistent_connection"]["mean_ms"]
+    )
+    return results
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import tracemalloc
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import connections
+from django.test.utils import override_settings
+
+from bank import events
+
+from . import make_accounts, scenario, summarize
+
+USERS = 20
+TRACED = 500
+
+
+def _session_cookies(users: list) -> list:
+    engine = import_module(settings.SESSION_ENGINE)
+    cookies = []
+    for user in users:
+        session = engine.SessionStore()
+        session.update({SESSION_KEY: str(user.pk), BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+                        HASH_SESSION_KEY: user.get_session_auth_hash()})
+        session.create()
+        cookies.append(f"{settings.SESSION_COOKIE_NAME}={session.session_key}".encode())
+    return cookies
+
+
+@scenario("events")
+def event_streams(options: dict) -> dict:
+    """
+    ``options["scale"]`` (default 10000) idle ``/api/events/`` streams held
+    by one process: time to open them, Python memory per idle stream, and
+    the latency from publishing a balance change to its delivery on every
+    stream of the holder.
+    """
+    count = max(options["scale"] or 10_000, 2 * TRACED)
+    accounts = [make_accounts(1)[0] for _ in range(USERS)]
+    cookies = _session_cookies([account.account_holder for account in accounts])
+    # with DEBUG every query's SQL is kept, which would count as stream memory
+    with override_settings(DEBUG=False):
+        return asyncio.run(_run(count, accounts, cookies, options["iterations"]))
+
+
+async def _run(count: int, accounts: list, cookies: list, iterations: int) -> dict:
+    disconnect = asyncio.Event()
+    delivered = asyncio.Queue()
+    opened = asyncio.Semaphore(0)
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    def stream(index: int):
+        async def send(message):
+            if message.get("body", b"").startswith(b"id:"):
+                if b"event: accounts" in message["body"]:
+                    opened.release()
+                else:
+                    delivered.put_nowait(time.perf_counter())
+        scope = {"type": "http", "method": "GET", "path": events.EVENTS_PATH, "query_string": b"",
+                 "headers": [(b"cookie", cookies[index % len(cookies)])]}
+        return events.event_stream(scope, receive, send)
+
+    tasks = []
+
+    async def open_streams(number: int):
+        for _ in range(number):
+            tasks.append(asyncio.ensure_future(stream(len(tasks))))
+        for _ in range(number):
+            await opened.acquire()
+
+    start = time.perf_counter()
+    await open_streams(count - TRACED)
+    open_elapsed = time.perf_counter() - start
+    # the last ones are traced, once the cache, the hub and the broker are warm
+    await asyncio.sleep(0.1)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    await open_streams(TRACED)
+    await asyncio.sleep(0.1)
+    per_stream = (tracemalloc.get_traced_memory()[0] - before) / TRACED
+    tracemalloc.stop()
+
+    streams_per_user = len(events.hub.streams[accounts[0].account_holder_id])
+    samples = []
+    for index in range(iterations):
+        account = accounts[index % len(accounts)]
+        published = time.perf_counter()
+        events.get_broker().publish({account.account_holder_id: [
+            {"event": "balance", "data": {"account": account.pk, "balance": f"{index}.00"}},
+        ]})
+        for _ in range(streams_per_user):
+            last = await delivered.get()
+        samples.append(last - published)
+
+    disconnect.set()
+    await asyncio.gather(*tasks)
+    await sync_to_async(connections.close_all)()
+    return {
+        "streams": count,
+        "streams_per_user": streams_per_user,
+        "open_s": open_elapsed,
+        "streams_opened_per_s": (count - TRACED) / open_elapsed,
+        "memory_per_stream_kb": per_stream / 1024,
+        "fanout": summarize(samples),
+        "open_after_disconnect": sum(len(streams) for streams in events.hub.streams.values()),
+    }
@@ -0,0 +1,79 @@
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from bank.querybudget import QueryCounter
+from bank.seeding import seed_bank, seed_logs
+
+from . import scenario, summarize
+
+_datasets = {}
+
+
+def dataset(scale: int):
+    """ One seeded dataset per scale, shared by the HTTP scenarios of a run """
+    cached = _datasets.get(scale)
+    if cached is None or not cached.users().exists():
+        dataset = seed_bank(users=max(10, scale // 100), accounts_per_user=2, logs_per_account=0)
+        seed_logs(scale, list(dataset.accounts().values_list("pk", flat=True)))
+        _datasets[scale] = dataset
+    return _datasets[scale]
+
+
+def measure(path: str, user, iterations: int) -> dict:
+    """ Latency and query count of ``iterations`` GETs of ``path`` as ``user`` """
+    client = Client()
+    client.force_login(user)
+    samples = []
+    with override_settings(ALLOWED_HOSTS=["*"]):
+        response = client.get(path)  # warm up url resolving, templates and caches
+        if response.status_code != 200:
+            return {"error": f"HTTP {response.status_code}"}
+        # request_started resets connection.queries, so count with a wrapper instead
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            client.get(path)
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - start)
+    return {"queries": queries.count, "bytes": len(response.content), "latency": summarize(samples)}
+
+
+def as_staff(user):
+    user.is_staff = True
+    user.save(update_fields=["is_staff"])
+    return user
+
+
+@scenario("api_accounts")
+def api_accounts(options: dict) -> dict:
+    """ GET /api/accounts/ for an account holder and for staff over all accounts """
+    data = dataset(options["scale"] or 1000)
+    holder, staff = data.users()[0], as_staff(data.users()[1])
+    return {
+        "accounts": data.counts["accounts"],
+        "holder": measure("/api/accounts/", holder, options["iterations"]),
+        "staff": measure("/api/accounts/", staff, options["iterations"]),
+    }
+
+
+@scenario("api_logs")
+def api_logs(options: dict) -> dict:
+    """ GET /api/logs/, first page and a filtered page """
+    scale = options["scale"] or 1000
+    staff = as_staff(dataset(scale).users()[1])
+    return {
+        "logs": scale,
+        "first_page": measure("/api/logs/", staff, options["iterations"]),
+        "filtered": measure("/api/logs/?action=transfer&status=success", staff, options["iterations"]),
+    }
+
+
+@scenario("account_page")
+def account_page(options: dict) -> dict:
+    """ The server-rendered /account/ page """
+    holder = dataset(options["scale"] or 1000).users()[0]
+    return measure("/account/", holder, options["iterations"])
@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from django.utils import timezone
+
+from bank.enums import ActionStatus, ActionType
+from bank.models import LogEntry
+from bank.seeding import seed_logs
+
+from . import make_accounts, scenario, summarize
+
+@scenario("logs_query")
+def logs_query(options: dict) -> dict:
+    """ Latency of the common audit log filters over a seeded table """
+    rows = options["scale"] or 100_000
+    accounts = make_accounts(50)
+    start = time.perf_counter()
+    seed_logs(rows, [account.pk for account in accounts])
+    seed_elapsed = time.perf_counter() - start
+
+    now = timezone.now()
+    account = accounts[0]
+    queries = {
+        "latest": lambda: LogEntry.objects.order_by("-timestamp")[:50],
+        "action_status_latest": lambda: LogEntry.objects.filter(
+            action=ActionType.TRANSFER.value, status=ActionStatus.FAILURE.value,
+        ).order_by("-timestamp")[:50],
+        "last_week_count": lambda: [LogEntry.objects.filter(timestamp__gte=now - datetime.timedelta(days=7)).count()],
+        "account_latest": lambda: LogEntry.objects.filter(account=account).order_by("-timestamp")[:50],
+    }
+    results = {"rows": rows, "seed_rows_per_s": rows / seed_elapsed}
+    for name, query in queries.items():
+        samples = []
+        for _ in range(options["iterations"]):
+            start = time.perf_counter()
+            list(query())
+            samples.append(time.perf_counter() - start)
+        results[name] = summarize(samples)
+    return results
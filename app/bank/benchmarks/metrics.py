@@ -0,0 +1,31 @@
+import time
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+from bank import metrics
+
+from . import scenario
+
+
+@scenario("metrics_overhead")
+def metrics_overhead(options: dict) -> dict:
+    """ Per-request cost of MetricsMiddleware around a view that does nothing """
+    request = RequestFactory().get("/api/accounts/")
+    request.resolver_match = resolve("/api/accounts/")
+    response = HttpResponse()
+    iterations = max(options["iterations"], 1) * 100
+
+    def view(request):
+        return response
+
+    instrumented = metrics.MetricsMiddleware(view)
+    results = {}
+    for name, handler in (("bare", view), ("instrumented", instrumented)):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            handler(request)
+        results[f"{name}_us"] = (time.perf_counter() - start) / iterations * 1e6
+    results["overhead_us"] = results["instrumented_us"] - results["bare_us"]
+    return results
@@ -0,0 +1,73 @@
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from bank.models import BankAccount, CustomUser
+from bank.services import deposit, withdraw
+
+from . import make_accounts, scenario, summarize
+
+
+@scenario("deposit_withdraw")
+def deposit_withdraw(options: dict) -> dict:
+    """ Single-threaded latency of deposit() and withdraw(), each followed by a balance check """
+    accounts = make_accounts(options["scale"] or 20)
+    pks = [account.pk for account in accounts]
+    expected_total = BankAccount.objects.filter(pk__in=pks).aggregate(total=Sum("balance"))["total"]
+    rnd = random.Random(0)
+    samples = {"deposit": [], "withdraw": []}
+    for _ in range(options["iterations"]):
+        account = rnd.choice(accounts)
+        amount = Decimal(rnd.randint(1, 5000)) / 100
+        for name, func in (("deposit", deposit), ("withdraw", withdraw)):
+            start = time.perf_counter()
+            func(account, amount)
+            samples[name].append(time.perf_counter() - start)
+    total = BankAccount.objects.filter(pk__in=pks).aggregate(total=Sum("balance"))["total"]
+    return {
+        **{name: summarize(values) for name, values in samples.items()},
+        "money_conserved": total == expected_total,
+    }
+
+
+@scenario("create_user")
+def create_user(options: dict) -> dict:
+    """ CustomUserManager.create_user, dominated by the configured password hasher """
+    from django.contrib.auth.hashers import get_hasher
+
+    tag = uuid.uuid4().hex[:8]
+    samples = []
+    for i in range(min(options["iterations"], 50)):
+        start = time.perf_counter()
+        CustomUser.objects.create_user(
+            email=f"{tag}-{i}@bench.example.com", username=f"{tag}-{i}", password="bench-password",
+        )
+        samples.append(time.perf_counter() - start)
+    return {"hasher": get_hasher().algorithm, "latency": summarize(samples)}
+
+
+@scenario("password_hashing")
+def password_hashing(options: dict) -> dict:
+    """ Hashing (registration) and checking (login) a password under each BANK_AUTH_PROFILE """
+    from django.contrib.auth.hashers import check_password, get_hasher, make_password
+    from django.test.utils import override_settings
+
+    from app.authprofiles import AUTH_PROFILES
+
+    results = {}
+    for name, profile in AUTH_PROFILES.items():
+        with override_settings(PASSWORD_HASHERS=profile["PASSWORD_HASHERS"]):
+            samples = {"make_password": [], "check_password": []}
+            for _ in range(min(options["iterations"], 20)):
+                start = time.perf_counter()
+                encoded = make_password("bench-password")
+                samples["make_password"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                check_password("bench-password", encoded)
+                samples["check_password"].append(time.perf_counter() - start)
+            results[name] = {"hasher": type(get_hasher()).__name__,
+                             **{call: summarize(values) for call, values in samples.items()}}
+    return results
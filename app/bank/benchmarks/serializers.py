@@ -0,0 +1,73 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from bank.fastserializers import FastSerializer
+from bank.seeding import seed_bank, seed_logs
+from bank.serializers import BankAccountSerializer, LogEntrySerializer
+
+from . import scenario, summarize
+
+
+def _timed(func, runs: int):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, summarize(samples)
+
+
+def compare_serializers(serializer_class, queryset, runs: int) -> dict:
+    """
+    Fetch, serialize and render ``queryset`` with the ModelSerializer and
+    with its FastSerializer; speedups compare serialization alone and the
+    whole pipeline.
+    """
+    fast = FastSerializer(serializer_class)
+    renderers = {"json": JSONRenderer()}
+    try:
+        from bank.renderers import ORJSONRenderer
+        renderers["orjson"] = ORJSONRenderer()
+    except ImportError:
+        pass
+
+    instances, fetch_instances = _timed(lambda: list(queryset.all()), runs)
+    model_data, model = _timed(lambda: serializer_class(instances, many=True).data, runs)
+    rows, fetch_rows = _timed(lambda: list(fast.values(queryset)), runs)
+    fast_data, fast_stats = _timed(lambda: fast.serialize(rows), runs)
+    results = {
+        "rows": len(model_data),
+        "fetch_instances": fetch_instances,
+        "model_serializer": model,
+        "fetch_values": fetch_rows,
+        "fast_serializer": fast_stats,
+    }
+    for name, renderer in renderers.items():
+        body, results[f"render_{name}"] = _timed(lambda: renderer.render(fast_data), runs)
+    results["identical"] = renderers["json"].render(model_data) == body
+    results["serializer_speedup"] = model["p50_ms"] / fast_stats["p50_ms"]
+    # the last renderer is the fastest available one
+    before = fetch_instances["p50_ms"] + model["p50_ms"] + results["render_json"]["p50_ms"]
+    after = fetch_rows["p50_ms"] + fast_stats["p50_ms"] + results[f"render_{name}"]["p50_ms"]
+    results["total_speedup"] = before / after
+    return results
+
+
+@scenario("list_serialization")
+def list_serialization(options: dict) -> dict:
+    """
+    ModelSerializer vs FastSerializer on ``scale`` (default
+    10k) accounts and log entries, plus JSON vs orjson rendering; checks
+    that both produce byte-identical JSON.
+    """
+    scale = options["scale"] or 10_000
+    runs = max(1, min(options["iterations"], 10))
+    dataset = seed_bank(users=scale // 2, accounts_per_user=2)
+    accounts = dataset.accounts()
+    seed_logs(scale, list(accounts.values_list("pk", flat=True)), details=("bench",))
+    logs = LogEntrySerializer.Meta.model.objects.filter(details="bench").order_by("-timestamp")
+    return {
+        "accounts": compare_serializers(BankAccountSerializer, accounts, runs),
+        "logs": compare_serializers(LogEntrySerializer, logs[:scale], runs),
+    }
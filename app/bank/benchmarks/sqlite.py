@@ -0,0 +1,40 @@
+from django.db import connection
+from django.test.utils import override_settings
+
+from app.databases import SQLITE_PROFILES
+
+from . import make_accounts, scenario
+from .transfers import run_transfers
+
+
+@scenario("sqlite_concurrency")
+def sqlite_concurrency(options: dict) -> dict:
+    """
+    The ``transfers`` workload under the three SQLite write modes: stock
+    settings, the ``fast`` profile (WAL, IMMEDIATE transactions, busy
+    timeout) and the fast profile with writes funnelled through the
+    ``BANK_WRITE_QUEUE`` writer thread. Modes run in that order because WAL
+    is persistent once enabled on the database file.
+    """
+    if connection.vendor != "sqlite":
+        return {"skipped": f"needs SQLite, running on {connection.vendor}"}
+
+    # worker threads build their connections from this shared settings dict
+    settings_dict = connection.settings_dict
+    original = dict(settings_dict["OPTIONS"])
+    modes = (
+        ("default", original, False),
+        ("fast", {**original, **SQLITE_PROFILES["fast"]}, False),
+        ("fast_write_queue", {**original, **SQLITE_PROFILES["fast"]}, True),
+    )
+    results = {}
+    try:
+        for name, db_options, write_queue in modes:
+            settings_dict["OPTIONS"] = db_options
+            connection.close()
+            with override_settings(BANK_WRITE_QUEUE=write_queue):
+                results[name] = run_transfers(make_accounts(options["scale"] or 20), options)
+    finally:
+        settings_dict["OPTIONS"] = original
+        connection.close()
+    return results
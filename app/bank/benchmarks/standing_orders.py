@@ -0,0 +1,59 @@
+import os
+import random
+import time
+from decimal import Decimal
+
+from django.utils import timezone
+
+from bank import standing
+from bank.models import StandingOrder
+from bank.services import transfer
+
+from . import make_accounts, scenario
+
+
+@scenario("standing_orders")
+def standing_orders(options: dict) -> dict:
+    """
+    Paying a run of due standing orders: a script calling ``transfer()``
+    and saving each order vs ``StandingOrderRunner`` batches, inline and
+    on a process pool. Every variant must pay every order exactly once.
+    """
+    count = options["scale"] or 2000
+    accounts = make_accounts(100, balance=Decimal("1000000.00"))
+    rnd = random.Random(0)
+
+    def due_orders():
+        now = timezone.now()
+        pairs = [rnd.sample(accounts, 2) for _ in range(count)]
+        return StandingOrder.objects.bulk_create(
+            StandingOrder(from_account=source, to_account=target, amount=Decimal(rnd.randint(1, 5000)) / 100,
+                          starts_at=now, next_run_at=now)
+            for source, target in pairs
+        )
+
+    def loop():
+        for order in StandingOrder.objects.select_related("from_account", "to_account"):
+            transfer(order.from_account, order.to_account, order.amount)
+            order.next_run_at = standing.next_run(order, timezone.now())
+            order.save(update_fields=["next_run_at"])
+        return count
+
+    processes = max(1, min(options["threads"], os.cpu_count() or 1))
+    variants = {
+        "loop": loop,
+        "batched": lambda: standing.StandingOrderRunner(1).run(once=True)["paid"],
+        "batched_parallel": lambda: standing.StandingOrderRunner(processes).run(once=True)["paid"],
+    }
+    results = {"orders": count, "processes": processes}
+    for name, run in variants.items():
+        due_orders()
+        start = time.perf_counter()
+        paid = run()
+        elapsed = time.perf_counter() - start
+        results[name] = {"elapsed_s": elapsed, "orders_per_s": count / elapsed, "paid": paid}
+        results[name]["exactly_once"] = paid == count and not StandingOrder.objects.filter(
+            next_run_at__lte=timezone.now()).exists()
+        StandingOrder.objects.all().delete()
+    results["speedup"] = results["batched"]["orders_per_s"] / results["loop"]["orders_per_s"]
+    return results
@@ -0,0 +1,112 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+
+from . import scenario
+
+# run in a fresh interpreter per sample; no database is touched
+SETUP_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - start
+rss_setup = rss()
+from django.urls import get_resolver
+get_resolver().reverse_dict
+urls = time.perf_counter() - start - setup
+print(json.dumps({"setup_ms": setup * 1000, "urls_ms": urls * 1000, "modules": len(sys.modules),
+                  "rss_setup_kb": rss_setup, "rss_urls_kb": rss()}))
+"""
+
+# forks WORKERS children that each serve one request, with or without preload() in the parent first
+FORK_PROBE = r"""
+import io, json, os, sys, time
+import django
+django.setup()
+if PRELOAD:
+    from app.startup import preload
+    preload()
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+results = []
+for _ in range(WORKERS):
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        start = time.perf_counter()
+        response = handler({
+            "REQUEST_METHOD": "GET", "PATH_INFO": "/api/", "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost", "HTTP_ACCEPT": "application/json", "wsgi.input": io.BytesIO(),
+            "wsgi.url_scheme": "http",
+        }, lambda status, headers: None)
+        b"".join(response)
+        os.write(write, json.dumps({"first_request_ms": (time.perf_counter() - start) * 1000, **smaps()}).encode())
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        results.append(json.loads(pipe.read()))
+    os.waitpid(pid, 0)
+print(json.dumps(results))
+"""
+
+MEMORY = r"""
+def rss():
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+
+def smaps():
+    with open("/proc/self/smaps_rollup") as rollup:
+        fields = {line.split(":")[0]: int(line.split()[1]) for line in rollup if line.split()[-1] == "kB"}
+    return {"rss_kb": fields["Rss"], "pss_kb": fields["Pss"],
+            "private_kb": fields["Private_Clean"] + fields["Private_Dirty"]}
+"""
+
+
+def _probe(code: str, profile: str):
+    env = {
+        **os.environ,
+        "BANK_APP_PROFILE": profile,
+        "DATABASE_URL": "sqlite://",
+        "DJANGO_SETTINGS_MODULE": "app.settings",
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", MEMORY + code], env=env, cwd=settings.BASE_DIR,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def _mean(rows: list) -> dict:
+    return {key: statistics.fmean(row[key] for row in rows) for key in rows[0]}
+
+
+@scenario("startup")
+def startup(options: dict) -> dict:
+    """
+    Cold start per app profile: ``django.setup()`` and URLconf import time
+    and RSS in fresh interpreters, then the private memory and first
+    request time of forked workers with and without ``preload()`` in the
+    parent (Linux only: reads /proc).
+    """
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return {"skipped": "needs /proc/self/smaps_rollup"}
+    runs = max(1, min(options["iterations"], 10))
+    workers = max(1, min(options["threads"], 4))
+    results = {}
+    for profile in ("full", "api"):
+        samples = [_probe(SETUP_PROBE, profile) for _ in range(runs)]
+        results[profile] = {
+            **_mean(samples),
+            "setup_min_ms": min(sample["setup_ms"] for sample in samples),
+            "workers": {
+                mode: _mean(_probe(f"PRELOAD = {mode == 'preloaded'}\nWORKERS = {workers}\n" + FORK_PROBE, profile))
+                for mode in ("lazy", "preloaded")
+            },
+        }
+    return results
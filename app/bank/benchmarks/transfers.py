@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.db import OperationalError
+from django.db.models import Sum
+
+from bank.enums import ActionStatus, ActionType
+from bank.models import BankAccount, LogEntry
+from bank.services import transfer
+
+from . import make_accounts, run_threads, scenario, summarize
+
+
+@scenario("transfers")
+def transfers(options: dict) -> dict:
+    """
+    Multi-threaded contention benchmark: every thread moves random amounts
+    between a small pool of accounts. Afterwards the total balance must be
+    unchanged and every committed transfer must have exactly one log row.
+    """
+    return run_transfers(make_accounts(options["scale"] or 20), options)
+
+
+def run_transfers(accounts: list, options: dict) -> dict:
+    """ Hammer ``accounts`` with random transfers from ``options["threads"]`` threads """
+    pks = [account.pk for account in accounts]
+    numbers = {account.pk: account.account_number for account in accounts}
+    expected_total = BankAccount.objects.filter(pk__in=pks).aggregate(total=Sum("balance"))["total"]
+    logs_before = LogEntry.objects.filter(action=ActionType.TRANSFER.value, status=ActionStatus.SUCCESS.value).count()
+
+    lock = threading.Lock()
+    samples, counts = [], {"committed": 0, "rejected": 0, "conflicts": 0}
+
+    def worker(index):
+        rnd = random.Random(index)
+        local, local_counts = [], dict.fromkeys(counts, 0)
+        for _ in range(options["iterations"]):
+            source, target = rnd.sample(pks, 2)
+            amount = Decimal(rnd.randint(1, 5000)) / 100
+            start = time.perf_counter()
+            try:
+                transfer(
+                    BankAccount(pk=source, account_number=numbers[source]),
+                    BankAccount(pk=target, account_number=numbers[target]),
+                    amount,
+                )
+            except ValueError:
+                local_counts["rejected"] += 1
+            except OperationalError:
+                local_counts["conflicts"] += 1
+            else:
+                local_counts["committed"] += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            samples.extend(local)
+            for key, value in local_counts.items():
+                counts[key] += value
+
+    elapsed = run_threads(options["threads"], worker)
+
+    total = BankAccount.objects.filter(pk__in=pks).aggregate(total=Sum("balance"))["total"]
+    logs_after = LogEntry.objects.filter(action=ActionType.TRANSFER.value, status=ActionStatus.SUCCESS.value).count()
+    return {
+        **counts,
+        "threads": options["threads"],
+        "elapsed_s": elapsed,
+        "transfers_per_s": counts["committed"] / elapsed if elapsed else 0,
+        "latency": summarize(samples),
+        "expected_total": f"{expected_total:.2f}",
+        "actual_total": f"{total:.2f}",
+        "money_conserved": total == expected_total,
+        "logs_consistent": logs_after - logs_before == counts["committed"],
+    }
@@ -0,0 +1,68 @@
+import datetime
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.test.utils import override_settings
+
+from bank import velocity
+from bank.enums import Direction
+from bank.models import LedgerEntry
+from bank.seeding import insert_rows, stored_now
+
+from . import make_accounts, scenario, summarize
+
+RULES = [
+    {"scope": "account", "window": 60, "max_count": 1_000_000},
+    {"scope": "account", "window": 24 * 3600, "max_count": 1_000_000, "max_amount": "100000000.00"},
+    {"scope": "user", "window": 24 * 3600, "max_amount": "100000000.00"},
+]
+
+
+@scenario("velocity")
+def velocity_checks(options: dict) -> dict:
+    """
+    The cost a withdrawal pays for the default set of velocity rules over a
+    day of debit history: aggregate queries over the ledger per check vs the
+    cached sliding-window counters, plus the one-off rebuild of the counters.
+    """
+    rows = options["scale"] or 100_000
+    accounts = make_accounts(20)
+    ids = [account.pk for account in accounts]
+    rnd = random.Random(0)
+    now = stored_now()
+    step = datetime.timedelta(days=2) / rows
+    insert_rows(LedgerEntry, ["account", "transfer_id", "direction", "amount", "created_at"], (
+        (rnd.choice(ids), uuid.uuid4(), Direction.DEBIT.value, Decimal(rnd.randint(1, 10_000)) / 100, now - step * i)
+        for i in range(rows)
+    ))
+
+    def aggregate(account):
+        current = time.time()
+        for rule in velocity.rules():
+            subject = Q(account_id=account.pk) if rule.scope == "account" else Q(
+                account__account_holder_id=account.account_holder_id)
+            LedgerEntry.objects.filter(
+                subject, direction=Direction.DEBIT.value,
+                created_at__gte=datetime.datetime.fromtimestamp(current - rule.window, datetime.timezone.utc),
+            ).aggregate(count=Count("pk"), paid=Sum("amount"))
+
+    def counters(account):
+        velocity.Tally([account]).allow(account, Decimal("1.00"))
+
+    results = {"ledger_entries": rows}
+    with override_settings(BANK_VELOCITY_RULES=RULES):
+        start = time.perf_counter()
+        velocity.rebuild()
+        results["rebuild_s"] = time.perf_counter() - start
+        for name, check in (("aggregate", aggregate), ("counters", counters)):
+            samples = []
+            for index in range(options["iterations"]):
+                start = time.perf_counter()
+                check(accounts[index % len(accounts)])
+                samples.append(time.perf_counter() - start)
+            results[name] = summarize(samples)
+    results["speedup"] = results["aggregate"]["mean_ms"] / results["counters"]["mean_ms"]
+    return results
@@ -0,0 +1,130 @@
+"""
+Per-user read-through cache for bank account lists.
+
+Every user has a version counter; cached account lists and the
+``account.html`` fragment are keyed by it, so bumping the counter (after a
+balance change commits, or an account is saved/deleted) invalidates all of
+them at once without having to know their keys. Misses are filled from the
+primary: a list read from a lagging replica would outlive the invalidation
+that was meant to replace it.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .metrics import CACHE_LOOKUPS, CACHE_SECONDS
+
+TIMEOUT = 300
+
+
+def _cache():
+    return caches[getattr(settings, 'BANK_CACHE_ALIAS', 'default')]
+
+
+class CacheStats:
+    """ Hit/miss counters and time spent in cache lookups for this process """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def record(self, hit: bool, seconds: float):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.lookup_seconds += seconds
+        CACHE_LOOKUPS.inc('hit' if hit else 'miss')
+        CACHE_SECONDS.inc(amount=seconds)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'mean_lookup_ms': self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+        }
+
+
+stats = CacheStats()
+
+
+def _version_key(user_id) -> str:
+    return f'bank:accounts:version:{user_id}'
+
+
+def accounts_version(user_id) -> int:
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # a fresh, never reused version in case an older counter was evicted
+        version = time.time_ns()
+        if not cache.add(_version_key(user_id), version, None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def get_user_accounts(user_id) -> list:
+    """ The user's accounts ordered by id, from the cache when possible """
+    from .models import BankAccount
+
+    cache = _cache()
+    key = f'bank:accounts:{user_id}:{accounts_version(user_id)}'
+    start = time.perf_counter()
+    accounts = cache.get(key)
+    stats.record(accounts is not None, time.perf_counter() - start)
+    if accounts is None:
+        accounts = list(BankAccount.objects.using(DEFAULT_DB_ALIAS).filter(account_holder_id=user_id).order_by('id'))
+        cache.set(key, accounts, TIMEOUT)
+    return accounts
+
+
+async def aaccounts_version(user_id) -> int:
+    cache = _cache()
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(_version_key(user_id), version, None):
+            version = await cache.aget(_version_key(user_id), version)
+    return version
+
+
+async def aget_user_accounts(user_id) -> list:
+    """ Async twin of ``get_user_accounts`` for ASGI views """
+    from .models import BankAccount
+
+    cache = _cache()
+    key = f'bank:accounts:{user_id}:{await aaccounts_version(user_id)}'
+    start = time.perf_counter()
+    accounts = await cache.aget(key)
+    stats.record(accounts is not None, time.perf_counter() - start)
+    if accounts is None:
+        accounts = BankAccount.objects.using(DEFAULT_DB_ALIAS).filter(account_holder_id=user_id).order_by('id')
+        accounts = [account async for account in accounts]
+        await cache.aset(key, accounts, TIMEOUT)
+    return accounts
+
+
+def invalidate_accounts(*user_ids) -> None:
+    """ Bump the version of every given user once the current transaction commits """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+
+    def bump():
+        cache = _cache()
+        for user_id in user_ids:
+            try:
+                cache.incr(_version_key(user_id))
+            except ValueError:
+                cache.set(_version_key(user_id), time.time_ns(), None)
+
+    if user_ids:
+        transaction.on_commit(bump)
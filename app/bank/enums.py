@@ -5,6 +5,11 @@ class Action(Enum):
     def __str__(self):
         return self.name.replace("_", "").capitalize()
 
+    @classmethod
+    def choices(cls) -> list:
+        """ ``(value, label)`` pairs for a model field; pass the method itself so Django builds them on first use """
+        return [(tag.value, str(tag)) for tag in cls]
+
 
 class ActionType(Action):
     USER_CREATED = 1
@@ -14,6 +19,7 @@ class ActionType(Action):
     ACCOUNT_CREATED = 5
     ACCOUNT_UPDATED = 6
     ACCOUNT_DELETED = 7
+    INTEREST = 8
 
 class ActionStatus(Action):
     SUCCESS = 1
@@ -26,3 +32,21 @@ class AccountType(Action):
     CHECKING = 'CHK'
     BUSINESS = 'BUS'
     CREDIT_CARD = 'CC'
+
+
+class Direction(Action):
+    DEBIT = 1
+    CREDIT = 2
+
+
+class TaskStatus(Action):
+    QUEUED = 1
+    RUNNING = 2
+    DONE = 3
+    FAILED = 4
+
+
+class Frequency(Action):
+    DAILY = 'D'
+    WEEKLY = 'W'
+    MONTHLY = 'M'
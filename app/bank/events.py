@@ -0,0 +1,311 @@
+"""
+Real-time balance and log events pushed to account holders as server-sent
+events on ``GET /api/events/`` (ASGI only).
+
+``deposit``, ``withdraw``, ``transfer`` and ``bulk_transfer`` call
+``notify()`` for every account they change. Once the transaction commits,
+the new balance and the log entries go to the event broker
+(``BANK_EVENT_BROKER``), which hands them to the ``hub`` of every process
+serving streams. The hub keeps one bounded queue per open stream, keyed
+by user, and encodes each event once however many streams receive it.
+
+``LocalBroker`` delivers straight into this process's hub: enough when the
+API and the streams are served by one ASGI process. With several processes
+or nodes use ``RedisBroker`` (``BANK_EVENTS=redis``, needs the ``redis``
+package): every process publishes to one channel and subscribes to it once,
+and fans out to its own streams from there.
+
+The stream is served by a plain ASGI callable in front of Django
+(``with_event_stream`` in app/asgi.py), not by a view. A Django request
+keeps a thread (and with it a database connection) for as long as its
+response is open, while an idle stream here is two suspended coroutines
+(one waits for events, one for the disconnect) and an empty queue; one
+task per process sends the keep-alive comments. A stream opens with an
+``accounts`` snapshot, so a client that reconnects after missing events
+(or gets a ``resync`` after falling behind) starts from current balances.
+"""
+import asyncio
+import io
+import itertools
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from importlib import import_module
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .async_views import authenticate
+from .cache import aget_user_accounts
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = '/api/events/'
+HEARTBEAT = 25  # seconds between keep-alive comments on idle streams
+PING = b': ping\n\n'
+QUEUE_SIZE = 100  # messages waiting per stream before it is told to resync
+DEFAULT_EVENT_BROKER = {'BACKEND': 'bank.events.LocalBroker', 'OPTIONS': {}}
+HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),  # no proxy buffering
+]
+
+
+def _event(kind: str, data) -> dict:
+    return {'event': kind, 'data': data}
+
+
+def notify(account, balance, entries=()) -> None:
+    """
+    Push ``account``'s new ``balance`` and its log ``entries`` to the
+    account holder once the current transaction commits. ``account`` must
+    carry ``account_holder_id`` (a locked row does).
+    """
+    events = [_event('balance', {
+        'account': account.pk, 'account_number': account.account_number, 'balance': f"{balance:.2f}",
+    })]
+    for entry in entries:
+        events.append(_event('log', {
+            'account': account.pk, 'action': entry.action, 'status': entry.status,
+            'details': entry.details, 'timestamp': entry.timestamp.isoformat(),
+        }))
+    holder = account.account_holder_id
+    transaction.on_commit(lambda: get_broker().publish({holder: events}))
+
+
+class Stream:
+    """ Messages waiting for one open stream; ``asyncio.Queue`` costs four deques and an event per stream """
+    __slots__ = ('pending', 'waiter')
+
+    def __init__(self):
+        self.pending = []
+        self.waiter = None
+
+    def put(self, message: bytes) -> None:
+        self.pending.append(message)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def get(self) -> bytes:
+        while not self.pending:
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.pending.pop(0)
+
+
+class Hub:
+    """ The open streams of this process, by user; owned by the event loop serving them """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.streams = defaultdict(set)
+        self.loop = None
+        self._ids = itertools.count(1)
+        self._tasks = ()
+
+    def subscribe(self, user_id: int) -> Stream:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self._tasks = (loop.create_task(get_broker().listen(self)), loop.create_task(self._heartbeat()))
+        stream = Stream()
+        self.streams[user_id].add(stream)
+        return stream
+
+    def unsubscribe(self, user_id: int, stream: Stream) -> None:
+        streams = self.streams.get(user_id)
+        if streams is not None:
+            streams.discard(stream)
+            if not streams:
+                del self.streams[user_id]
+
+    def publish(self, user_id: int, events: list) -> None:
+        """ Deliver ``events`` to ``user_id``'s streams; callable from any thread """
+        if user_id not in self.streams or self.loop is None or self.loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.deliver(user_id, events)
+        else:
+            self.loop.call_soon_threadsafe(self.deliver, user_id, events)
+
+    def deliver(self, user_id: int, events: list) -> None:
+        streams = self.streams.get(user_id)
+        if not streams:
+            return
+        messages = [self.encode(event['event'], event['data']) for event in events]
+        for stream in streams:
+            if len(stream.pending) + len(messages) > self.queue_size:
+                # a stream that does not keep up gets a fresh start instead of an unbounded backlog
+                stream.pending.clear()
+                stream.put(self.encode('resync', {}))
+            else:
+                for message in messages:
+                    stream.put(message)
+
+    async def _heartbeat(self) -> None:
+        # one timer for all streams instead of one per stream
+        while True:
+            await asyncio.sleep(HEARTBEAT)
+            for streams in list(self.streams.values()):
+                for stream in streams:
+                    if not stream.pending:
+                        stream.put(PING)
+
+    def encode(self, kind: str, data) -> bytes:
+        return f"id: {next(self._ids)}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+hub = Hub()
+
+
+class Broker(ABC):
+    """ Carries events from the process whose transaction committed to the processes holding the streams """
+
+    @abstractmethod
+    def publish(self, events: dict) -> None:
+        """ ``{user_id: [event, ...]}``, called after commit in any thread """
+
+    async def listen(self, hub: Hub) -> None:
+        """ Feed events published elsewhere into ``hub``; runs on the streams' event loop """
+
+
+class LocalBroker(Broker):
+    """ Deliver within this process only """
+
+    def publish(self, events):
+        for user_id, user_events in events.items():
+            hub.publish(user_id, user_events)
+
+
+class RedisBroker(Broker):
+    """ Redis pub/sub on one channel that every process subscribes to once """
+
+    def __init__(self, url: str = 'redis://127.0.0.1:6379/0', channel: str = 'bank:events'):
+        self.url = url
+        self.channel = channel
+        self._client = None
+
+    def publish(self, events):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(self.channel, json.dumps({str(user_id): data for user_id, data in events.items()}))
+
+    async def listen(self, hub):
+        import redis.asyncio
+
+        while True:
+            try:
+                client = redis.asyncio.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        for user_id, user_events in json.loads(message['data']).items():
+                            hub.deliver(int(user_id), user_events)
+            except redis.RedisError:
+                logger.exception("Event subscription to %s failed, reconnecting", self.url)
+                await asyncio.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = getattr(settings, 'BANK_EVENT_BROKER', DEFAULT_EVENT_BROKER)
+                _broker = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def reset_broker(**kwargs) -> None:
+    global _broker
+    if kwargs.get('setting', 'BANK_EVENT_BROKER') == 'BANK_EVENT_BROKER':
+        _broker = None
+
+
+setting_changed.connect(reset_broker)
+
+
+# the stream
+
+async def _user_id(scope) -> int:
+    """ The id of the user ``async_views.authenticate`` finds: session or, with ``BANK_JWT``, a bearer token """
+    request = ASGIRequest(scope, io.BytesIO())
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    user = await authenticate(request)
+    return user.pk if user is not None else None
+
+
+async def _snapshot(user_id: int) -> bytes:
+    return hub.encode('accounts', [
+        {'account': account.pk, 'account_number': account.account_number,
+         'account_type': account.account_type, 'balance': f"{account.balance:.2f}"}
+        for account in await aget_user_accounts(user_id)
+    ])
+
+
+async def _refuse(send, status: int, detail: str) -> None:
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
+
+
+async def event_stream(scope, receive, send) -> None:
+    """ ASGI app: the events of the authenticated user's accounts as ``text/event-stream`` """
+    if scope['method'] != 'GET':
+        return await _refuse(send, 405, f"Method \"{scope['method']}\" not allowed.")
+    # only the id is kept: whatever a stream's frame references lives as long as the connection
+    user_id = await _user_id(scope)
+    if user_id is None:
+        return await _refuse(send, 403, 'Authentication credentials were not provided.')
+    stream = hub.subscribe(user_id)
+    task = asyncio.current_task()
+
+    async def watch():
+        # the only way to learn that an idle client went away
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        task.cancel()
+
+    watcher = asyncio.get_running_loop().create_task(watch())
+    try:
+        snapshot = await _snapshot(user_id)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': HEADERS})
+        await send({'type': 'http.response.body', 'body': snapshot, 'more_body': True})
+        del snapshot
+        while True:
+            await send({'type': 'http.response.body', 'body': await stream.get(), 'more_body': True})
+    except (asyncio.CancelledError, OSError):
+        pass
+    finally:
+        hub.unsubscribe(user_id, stream)
+        watcher.cancel()
+
+
+def with_event_stream(application):
+    """ Serve ``EVENTS_PATH`` with ``event_stream`` and everything else with ``application`` """
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await event_stream(scope, receive, send)
+        return await application(scope, receive, send)
+    return router
@@ -0,0 +1,28 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+    Filters a queryset by query parameters declared on the view::
+
+        filter_params = {'status': ('status', choice(ActionStatus))}
+
+    maps ``?status=failure`` to ``.filter(status=2)`` (parsers are in
+    bank/params.py). Only declared parameters are applied, each one should
+    hit an indexed column.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        lookups, errors = {}, {}
+        for param, (lookup, parse) in getattr(view, 'filter_params', {}).items():
+            raw = request.query_params.get(param)
+            if raw in (None, ''):
+                continue
+            try:
+                lookups[lookup] = parse(raw)
+            except ValueError as e:
+                errors[param] = [str(e)]
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups) if lookups else queryset
@@ -0,0 +1,24 @@
+"""
+Password hashers with a configurable cost, used by the ``fast`` auth
+profile (app/authprofiles.py). They keep the algorithm names of the Django
+hashers they derive from: stored hashes verify either way, and
+``must_update`` rehashes a password to the configured cost on the next
+successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """ PBKDF2-SHA256 at ``BANK_PBKDF2_ITERATIONS`` """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'BANK_PBKDF2_ITERATIONS', 100_000)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """ Argon2id with OWASP's minimum memory cost (19 MiB) and one lane instead of Django's 100 MiB x 8 """
+    time_cost = 2
+    memory_cost = 19 * 1024
+    parallelism = 1
@@ -0,0 +1,125 @@
+"""
+``Idempotency-Key`` support for the mutating account API.
+
+A request carrying the header runs inside one transaction together with
+the insert of its ``IdempotencyKey`` row, and the response is stored on
+that row before the commit. So a balance change and its stored response
+commit (or roll back) together, and retries after a timeout get the
+stored response back from a unique-index lookup, without touching any
+balances.
+
+The unique (user, key) constraint doubles as the lock for concurrent
+duplicates: their insert waits on the first request's uncommitted row and
+then fails, after which the now committed response is replayed. Keys
+expire after ``BANK_IDEMPOTENCY_TTL`` seconds; ``purge_idempotency_keys``
+deletes expired rows through the ``expires_at`` index.
+"""
+import datetime
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def ttl() -> datetime.timedelta:
+    return datetime.timedelta(seconds=getattr(settings, 'BANK_IDEMPOTENCY_TTL', 24 * 3600))
+
+
+def fingerprint(request) -> str:
+    try:
+        body = request.body
+    except RawPostDataException:  # stream already consumed (multipart), hash the parsed data instead
+        body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def replay(record: IdempotencyKey, request_fingerprint: str) -> Response:
+    if record.fingerprint != request_fingerprint:
+        return Response(
+            {'detail': f'{HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.status_code is None:
+        return Response({'detail': 'A request with this key is still in progress.'}, status=status.HTTP_409_CONFLICT)
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def lookup(user, key: str):
+    """ The live record for ``key``; an expired one is deleted and treated as absent """
+    record = IdempotencyKey.objects.filter(user_id=user.pk, key=key).first()
+    if record is not None and record.expires_at <= timezone.now():
+        IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=timezone.now()).delete()
+        return None
+    return record
+
+
+def idempotent(view):
+    """ Decorator for viewset methods: honour the ``Idempotency-Key`` header """
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({'detail': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        request_fingerprint = fingerprint(request)
+        record = lookup(request.user, key)
+        if record is not None:
+            return replay(record, request_fingerprint)
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user_id=request.user.pk, key=key, fingerprint=request_fingerprint,
+                        expires_at=timezone.now() + ttl(),
+                    )
+            except IntegrityError:
+                # a concurrent duplicate held the key and has finished by now
+                record = IdempotencyKey.objects.filter(user_id=request.user.pk, key=key).first()
+                if record is None:  # ...and rolled back, the client may retry
+                    return Response({'detail': 'A request with this key just failed, retry it.'},
+                                    status=status.HTTP_409_CONFLICT)
+                return replay(record, request_fingerprint)
+
+            response = view(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                # not a result worth replaying: roll back the key so a retry runs again
+                transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
+    return wrapper
+
+
+def purge_expired(batch_size: int = 10000) -> int:
+    """ Delete expired keys in index-ordered batches """
+    deleted = 0
+    now = timezone.now()
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now)
+                   .order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
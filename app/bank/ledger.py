@@ -0,0 +1,101 @@
+"""
+Double-entry ledger helpers: writing entries, point-in-time balances from
+snapshots, and the set-based balance computation shared by the
+``snapshot_balances`` and ``reconcile`` commands.
+"""
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .analytics import roll_up
+from .enums import Direction
+from .models import BalanceSnapshot, BankAccount, LedgerEntry
+
+# snapshots only cover entries older than this, so transactions still in
+# flight when the snapshot is taken are not skipped
+SNAPSHOT_LAG = datetime.timedelta(seconds=60)
+ZERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=15, decimal_places=2))
+SIGNED_AMOUNT = Sum(Case(
+    When(direction=Direction.CREDIT.value, then=F("amount")),
+    default=-F("amount"),
+    output_field=DecimalField(max_digits=15, decimal_places=2),
+))
+
+
+def entry(account, direction: Direction, amount, transfer_id) -> LedgerEntry:
+    return LedgerEntry(account=account, direction=direction.value, amount=amount, transfer_id=transfer_id)
+
+
+def record(entries: list) -> None:
+    """ Write ledger rows and their daily rollups; must be called inside the transaction that changes the balances """
+    LedgerEntry.objects.bulk_create(entries)
+    roll_up(entries)
+
+
+def record_opening(accounts: list) -> None:
+    """ Credit the initial balance of freshly created accounts """
+    record([entry(account, Direction.CREDIT, account.balance, uuid.uuid4()) for account in accounts if account.balance])
+
+
+def balance_as_of(account, when) -> Decimal:
+    """
+    Ledger balance at ``when``: the latest snapshot taken at or before that
+    moment plus the entries written after it, found with a range scan on the
+    (account, id) index instead of replaying the full history.
+    """
+    entries = LedgerEntry.objects.filter(account=account, created_at__lte=when)
+    snapshot = BalanceSnapshot.objects.filter(account=account, as_of__lte=when).order_by("-as_of").first()
+    base = Decimal("0.00")
+    if snapshot is not None:
+        base = snapshot.balance
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+    return base + (entries.aggregate(total=SIGNED_AMOUNT)["total"] or 0)
+
+
+def with_ledger_balance(accounts, up_to_entry: int = None):
+    """
+    Annotate an account queryset with ``ledger_balance`` (latest snapshot +
+    entries after it) and ``ledger_last_entry``, computed by the database in
+    one statement.
+    """
+    latest = BalanceSnapshot.objects.filter(account=OuterRef("pk")).order_by("-as_of")
+    accounts = accounts.annotate(
+        snapshot_balance=Coalesce(Subquery(latest.values("balance")[:1]), ZERO),
+        snapshot_last=Coalesce(Subquery(latest.values("last_entry_id")[:1]), Value(0)),
+    )
+    entries = LedgerEntry.objects.filter(account=OuterRef("pk"), id__gt=OuterRef("snapshot_last"))
+    if up_to_entry is not None:
+        entries = entries.filter(id__lte=up_to_entry)
+    totals = entries.order_by().values("account").annotate(total=SIGNED_AMOUNT, last=Max("id"))
+    return accounts.annotate(
+        ledger_balance=F("snapshot_balance") + Coalesce(Subquery(totals.values("total")), ZERO),
+        ledger_last_entry=Coalesce(Subquery(totals.values("last")), F("snapshot_last")),
+    )
+
+
+def snapshot_accounts(account_ids: list) -> int:
+    """ Store a new snapshot for every account in ``account_ids`` that has new entries """
+    as_of = timezone.now() - SNAPSHOT_LAG
+    last_entry = LedgerEntry.objects.filter(created_at__lte=as_of).aggregate(last=Max("id"))["last"] or 0
+    rows = with_ledger_balance(BankAccount.objects.filter(pk__in=account_ids), last_entry).values_list(
+        "pk", "ledger_balance", "ledger_last_entry", "snapshot_last",
+    )
+    snapshots = [
+        BalanceSnapshot(account_id=pk, balance=balance, last_entry_id=last, as_of=as_of)
+        for pk, balance, last, previous in rows
+        if last != previous
+    ]
+    BalanceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def mismatches(account_ids: list) -> list:
+    """ ``(account_id, balance, ledger_balance)`` for accounts whose balance disagrees with the ledger """
+    rows = with_ledger_balance(BankAccount.objects.filter(pk__in=account_ids)).values_list(
+        "pk", "balance", "ledger_balance",
+    )
+    return [(pk, balance, ledger) for pk, balance, ledger in rows if balance != ledger]
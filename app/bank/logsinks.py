@@ -0,0 +1,186 @@
+"""
+Pluggable destinations for audit log rows written through ``LogEntry.log``.
+
+The sink is configured with the ``BANK_LOG_SINK`` setting::
+
+    BANK_LOG_SINK = {
+        "BACKEND": "bank.logsinks.BufferedSink",
+        "OPTIONS": {"batch_size": 500, "flush_interval": 1.0, "on_commit": True},
+    }
+
+``on_commit`` turns any sink into a transactional outbox: entries emitted
+inside a transaction are handed to the sink only when it commits and are
+discarded when it rolls back.
+"""
+import atexit
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_SINK = {"BACKEND": "bank.logsinks.SyncSink", "OPTIONS": {}}
+
+
+class LogSink(ABC):
+    def __init__(self, on_commit: bool = False):
+        self.on_commit = on_commit
+
+    def emit(self, entries: list) -> None:
+        if self.on_commit:
+            transaction.on_commit(lambda: self.write(entries))
+        else:
+            self.write(entries)
+
+    @abstractmethod
+    def write(self, entries: list) -> None:
+        """ Store ``entries`` """
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SyncSink(LogSink):
+    """ Insert immediately on the caller's connection (and transaction) """
+
+    def write(self, entries):
+        from .models import LogEntry
+        if len(entries) == 1:
+            entries[0].save(force_insert=True)
+        else:
+            LogEntry.objects.bulk_create(entries)
+
+
+class BufferedSink(LogSink):
+    """
+    Collect entries in memory and insert them with bulk_create from a
+    background thread, whenever ``batch_size`` entries are waiting or
+    ``flush_interval`` seconds have passed. Pending entries are flushed on
+    interpreter shutdown.
+
+    Entries are written on the writer thread's own connection, so without
+    ``on_commit`` they survive a rollback of the code that emitted them.
+
+    A batch that fails is put back for the next flush up to ``max_retries``
+    times (the database may be briefly away). After that it is split until
+    the rows that fail on their own are found; those are dropped and logged
+    in full, so one bad row cannot hold back everything logged after it.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 1.0, max_buffer: int = 100_000,
+                 max_retries: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self._failures = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bank-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, entries):
+        with self._lock:
+            self._buffer.extend(entries)
+            if len(self._buffer) > self.max_buffer:
+                dropped = len(self._buffer) - self.max_buffer
+                del self._buffer[:dropped]
+                logger.error("Audit log buffer full, dropped %d oldest entries", dropped)
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+            if self._failures < self.max_retries:
+                try:
+                    self._save(pending)
+                except DatabaseError:
+                    self._failures += 1
+                    logger.exception("Failed to write %d audit log entries, will retry", len(pending))
+                    with self._lock:
+                        self._buffer[:0] = pending
+                    return
+            else:
+                for entry, error in self._save_each(pending):
+                    logger.error(
+                        "Dropped audit log entry that cannot be written (%s): action=%s status=%s account=%s "
+                        "timestamp=%s details=%r", error, entry.action, entry.status, entry.account_id,
+                        entry.timestamp, entry.details,
+                    )
+            self._failures = 0
+
+    def _save(self, entries):
+        from .models import LogEntry
+        with transaction.atomic():
+            LogEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+
+    def _save_each(self, entries) -> list:
+        """ Write ``entries`` in halves of halves; returns ``(entry, error)`` for those that fail on their own """
+        try:
+            self._save(entries)
+            return []
+        except DatabaseError as error:
+            if len(entries) == 1:
+                return [(entries[0], error)]
+        middle = len(entries) // 2
+        return self._save_each(entries[:middle]) + self._save_each(entries[middle:])
+
+    def close(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self._wakeup.set()
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+            self.flush()
+        finally:
+            connection.close()
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> LogSink:
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                config = getattr(settings, "BANK_LOG_SINK", DEFAULT_LOG_SINK)
+                _sink = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _sink
+
+
+def reset_sink(**kwargs) -> None:
+    global _sink
+    if kwargs.get("setting", "BANK_LOG_SINK") != "BANK_LOG_SINK":
+        return
+    with _sink_lock:
+        if _sink is not None:
+            _sink.close()
+        _sink = None
+
+
+setting_changed.connect(reset_sink)
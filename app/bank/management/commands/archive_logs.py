@@ -0,0 +1,127 @@
+import datetime
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from bank.models import LogEntry
+
+COLUMNS = ["id", "action", "status", "timestamp", "details", "account_id"]
+
+
+def month_start(value: datetime.datetime) -> datetime.datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime.datetime) -> datetime.datetime:
+    return (value + datetime.timedelta(days=32)).replace(day=1)
+
+
+def encode(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive audit log entries month by month into compressed files and delete them from the database. "
+        "Each month is streamed with a server-side iterator, so memory use does not depend on table size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-months", type=int, default=12,
+                            help="Keep this many most recent months (including the current one) in the database.")
+        parser.add_argument("--before", help="Archive everything before this month instead (YYYY-MM).")
+        parser.add_argument("--output-dir", default=str(settings.BASE_DIR / "archive"))
+        parser.add_argument("--format", choices=["jsonl", "columnar"], default="jsonl",
+                            help="jsonl: one gzipped JSON object per line; columnar: one gzipped file per column.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Write the archives but do not delete rows.")
+
+    def handle(self, *args, **options):
+        cutoff = self.cutoff(options)
+        first = LogEntry.objects.filter(timestamp__lt=cutoff).aggregate(first=Min("timestamp"))["first"]
+        if first is None:
+            self.stdout.write("Nothing to archive.")
+            return
+
+        output_dir = Path(options["output_dir"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        start = month_start(first)
+        while start < cutoff:
+            end = next_month(start)
+            rows = LogEntry.objects.filter(timestamp__gte=start, timestamp__lt=end)
+            last_id = rows.aggregate(last=Max("id"))["last"]
+            if last_id is None:
+                start = end
+                continue
+            # late writers cannot slip rows into the month between archiving and deleting
+            rows = rows.filter(id__lte=last_id)
+            name = f"logs-{start:%Y-%m}"
+            if options["format"] == "jsonl":
+                count = self.write_jsonl(rows, output_dir / f"{name}.jsonl.gz", options["chunk_size"])
+            else:
+                count = self.write_columnar(rows, output_dir / name, options["chunk_size"])
+            if not options["dry_run"]:
+                self.delete(rows, options["chunk_size"])
+            self.stdout.write(f"{start:%Y-%m}: archived {count} entries")
+            start = end
+
+    def cutoff(self, options) -> datetime.datetime:
+        if options["before"]:
+            try:
+                month = datetime.datetime.strptime(options["before"], "%Y-%m")
+            except ValueError:
+                raise CommandError("--before must look like YYYY-MM")
+            return timezone.make_aware(month, datetime.timezone.utc)
+        cutoff = month_start(timezone.now())
+        for _ in range(max(options["keep_months"] - 1, 0)):
+            cutoff = month_start(cutoff - datetime.timedelta(days=1))
+        return cutoff
+
+    def stream(self, rows, chunk_size):
+        return rows.order_by("id").values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+
+    def write_jsonl(self, rows, path: Path, chunk_size: int) -> int:
+        count = 0
+        tmp = path.with_name(path.name + ".part")
+        with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+            for row in self.stream(rows, chunk_size):
+                fh.write(json.dumps(dict(zip(COLUMNS, map(encode, row)))) + "\n")
+                count += 1
+        os.replace(tmp, path)
+        return count
+
+    def write_columnar(self, rows, path: Path, chunk_size: int) -> int:
+        count = 0
+        tmp = path.with_name(path.name + ".part")
+        tmp.mkdir(exist_ok=True)
+        files = [gzip.open(tmp / f"{column}.gz", "wt", encoding="utf-8") for column in COLUMNS]
+        try:
+            for row in self.stream(rows, chunk_size):
+                for fh, value in zip(files, row):
+                    fh.write(json.dumps(encode(value)) + "\n")
+                count += 1
+        finally:
+            for fh in files:
+                fh.close()
+        if path.exists():
+            for old in path.iterdir():
+                old.unlink()
+            path.rmdir()
+        os.replace(tmp, path)
+        return count
+
+    def delete(self, rows, chunk_size: int) -> None:
+        """ Delete in primary key batches to keep each transaction short """
+        while True:
+            ids = list(rows.order_by("id").values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                return
+            with transaction.atomic():
+                LogEntry.objects.filter(id__in=ids).delete()
@@ -0,0 +1,88 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from bank.benchmarks import compare, load_scenarios
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+class Command(BaseCommand):
+    help = (
+        "Run bank benchmark scenarios against a throwaway test database and print JSON results. "
+        "With --baseline, compare against an earlier run and fail on regressions above --max-regression."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenarios", nargs="*", help="Scenarios to run (default: all).")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--iterations", type=int, default=200, help="Operations per thread / per scenario.")
+        parser.add_argument(
+            "--scale", type=int, default=0,
+            help="Number of rows to seed, 1000 to 10000000 (scenario specific default).",
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file as well.")
+        parser.add_argument("--keepdb", action="store_true", help="Keep the benchmark database afterwards.")
+        parser.add_argument("--baseline", help="JSON output of an earlier run to compare against.")
+        parser.add_argument(
+            "--max-regression", type=float, default=0.2,
+            help="Allowed slowdown against the baseline, as a fraction (default 0.2).",
+        )
+
+    def handle(self, *args, **options):
+        available = load_scenarios()
+        names = options["scenarios"] or list(available)
+        unknown = set(names) - set(available)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}. Available: {', '.join(available)}")
+
+        if connection.vendor == "sqlite":
+            # threads cannot share the in-memory test database, use a file
+            connection.settings_dict["TEST"]["NAME"] = str(settings.BASE_DIR / "bench.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            # the synthetic traffic pays far faster than any velocity rule allows
+            with override_settings(BANK_VELOCITY_RULES=[]):
+                results = {name: available[name](options) for name in names}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        output = json.dumps({
+            "meta": {
+                "revision": revision(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "vendor": connection.vendor,
+                **{key: options[key] for key in ("threads", "iterations", "scale")},
+            },
+            "scenarios": results,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+        self.stdout.write(output)
+        if options["baseline"]:
+            self.check_baseline(options["baseline"], results, options["max_regression"])
+
+    def check_baseline(self, path: str, results: dict, limit: float) -> None:
+        with open(path) as fh:
+            baseline = json.load(fh)["scenarios"]
+        regressions = [change for change in compare(baseline, results) if change[3] > limit]
+        for name, old, new, change in regressions:
+            self.stderr.write(f"{name}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+        if regressions:
+            raise CommandError(f"{len(regressions)} metrics regressed by more than {limit:.0%} against {path}")
@@ -0,0 +1,32 @@
+import json
+
+from django.core.checks import Tags
+from django.core.management.base import BaseCommand, CommandError
+
+from bank.tasks import REGISTRY, enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue a background task, e.g. from cron: "
+        "enqueue_task accrue_interest period=2026-10. Values are read as JSON when they parse."
+    )
+    # the URL checks would import every view, which queueing a task never needs
+    requires_system_checks = [Tags.models]
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(REGISTRY))
+        parser.add_argument("payload", nargs="*", metavar="key=value")
+
+    def handle(self, *args, **options):
+        payload = {}
+        for item in options["payload"]:
+            key, separator, raw = item.partition("=")
+            if not separator:
+                raise CommandError(f"Expected key=value, got {item!r}")
+            try:
+                payload[key] = json.loads(raw)
+            except ValueError:
+                payload[key] = raw
+        task = enqueue(options["name"], **payload)
+        self.stdout.write(self.style.SUCCESS(f"Queued {task}."))
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bank.benchmarks import summarize
+
+
+async def read_response(reader) -> tuple:
+    """ Read one HTTP/1.1 response, return its status and whether the connection stays open """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    version, status = status_line.split()[:2]
+    status = int(status)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return status, False
+    if version == b"HTTP/1.0":
+        return status, headers.get("connection", "").lower() == "keep-alive"
+    return status, headers.get("connection", "").lower() != "close"
+
+
+async def connection_worker(url, headers: str, count: int, samples: list, errors: list):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request = f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n{headers}\r\n".encode()
+    reader = writer = None
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        samples.append(time.perf_counter() - start)
+        if status >= 400:
+            errors.append(f"HTTP {status}")
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url: str, headers: str, concurrency: int, total: int) -> dict:
+    samples, errors = [], []
+    per_connection, extra = divmod(total, concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        connection_worker(url, headers, per_connection + (i < extra), samples, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "error_kinds": sorted(set(errors)),
+        "elapsed_s": elapsed,
+        "requests_per_s": len(samples) / elapsed,
+        "latency": summarize(samples),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Open N concurrent keep-alive connections against running servers and compare throughput and tail "
+        "latency, e.g. WSGI ('gunicorn app.wsgi -w 4') against ASGI ('uvicorn app.asgi:application --workers 4'). "
+        "Raise the open file limit (ulimit -n) before using a concurrency of 1000 or more."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="+", help="Server base URLs, e.g. wsgi=http://127.0.0.1:8000")
+        parser.add_argument("--path", default="/api/async/accounts/")
+        parser.add_argument("--concurrency", type=int, default=1000)
+        parser.add_argument("--requests", type=int, default=20000)
+        parser.add_argument("--session", help="sessionid cookie of a logged in user.")
+
+    def handle(self, *args, **options):
+        headers = f"Cookie: sessionid={options['session']}\r\n" if options["session"] else ""
+        results = {}
+        for target in options["targets"]:
+            name, sep, base = target.partition("=")
+            if not sep or name.startswith("http"):
+                name, base = target, target
+            if not base.startswith("http://"):
+                raise CommandError(f"Only plain http:// targets are supported, got {base!r}")
+            url = base.rstrip("/") + options["path"]
+            results[name] = asyncio.run(run_load(url, headers, options["concurrency"], options["requests"]))
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from bank.analytics import rebuild_rollups
+from bank.management.commands.reconcile import run_chunks
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily analytics rollups of every account from the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = sum(run_chunks(rebuild_rollups, options["chunk_size"], options["workers"]))
+        self.stdout.write(f"Wrote {written} rollup(s).")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from bank import velocity
+
+
+class Command(BaseCommand):
+    help = "Recompute the velocity limit counters in the cache from the ledger (after changing BANK_VELOCITY_RULES)."
+
+    def handle(self, *args, **options):
+        if not velocity.rules():
+            self.stdout.write("No velocity rules configured.")
+            return
+        written = velocity.rebuild()
+        self.stdout.write(f"Rebuilt {written} counter(s) of {len(velocity.rules())} velocity rule(s).")
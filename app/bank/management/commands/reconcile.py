@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bank import ledger
+from bank.models import BankAccount
+
+
+def account_chunks(chunk_size: int):
+    ids = BankAccount.objects.order_by("pk").values_list("pk", flat=True)
+    chunk = []
+    for pk in ids.iterator(chunk_size=chunk_size):
+        chunk.append(pk)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_chunks(func, chunk_size: int, workers: int) -> list:
+    """ Apply ``func`` to chunks of account ids on a thread pool, one DB connection per thread """
+    if workers <= 1:
+        return [func(chunk) for chunk in account_chunks(chunk_size)]
+
+    def task(chunk):
+        try:
+            return func(chunk)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(task, account_chunks(chunk_size)))
+
+
+class Command(BaseCommand):
+    help = "Verify every account's balance against its ledger (latest snapshot + later entries)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        results = run_chunks(ledger.mismatches, options["chunk_size"], options["workers"])
+        mismatches = [row for chunk in results for row in chunk]
+        for pk, balance, ledger_balance in mismatches:
+            self.stderr.write(f"account {pk}: balance {balance} != ledger {ledger_balance}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} account(s) do not match the ledger")
+        self.stdout.write(self.style.SUCCESS("All balances match the ledger."))
@@ -0,0 +1,30 @@
+import os
+
+from django.core.checks import Tags
+from django.core.management.base import BaseCommand
+
+from bank.standing import StandingOrderRunner
+
+
+class Command(BaseCommand):
+    help = "Pay due standing orders in batches on a process pool; safe to run on several nodes at once."
+    # the URL checks would import every view; a runner serves none
+    requires_system_checks = [Tags.models]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes; 1 pays in this process.")
+        parser.add_argument("--batch-size", type=int, help="Orders per batch (default BANK_STANDING_ORDER_BATCH).")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait between polls when no order is due.")
+        parser.add_argument("--once", action="store_true", help="Exit once no order is due instead of polling.")
+
+    def handle(self, *args, **options):
+        runner = StandingOrderRunner(options["processes"], options["batch_size"], options["poll_interval"])
+        try:
+            counts = runner.run(once=options["once"])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Paid: {counts['paid']}, failed: {counts['failed']}, batches: {counts['batches']}."
+        ))
@@ -0,0 +1,29 @@
+import os
+
+from django.core.checks import Tags
+from django.core.management.base import BaseCommand
+
+from bank.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (interest accrual, profile pictures, statements) on a process pool."
+    # the URL checks would import every view; a worker serves none
+    requires_system_checks = [Tags.models]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes; 1 runs tasks in this process.")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait between polls when no task is due.")
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due instead of polling.")
+
+    def handle(self, *args, **options):
+        worker = Worker(options["processes"], options["poll_interval"])
+        try:
+            counts = worker.run(once=options["once"])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {counts['done']}, retried: {counts['retried']}, failed: {counts['failed']}."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from bank import ledger
+from bank.management.commands.reconcile import run_chunks
+
+
+class Command(BaseCommand):
+    help = "Store a ledger balance snapshot for every account with entries since its last snapshot. Run periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = sum(run_chunks(ledger.snapshot_accounts, options["chunk_size"], options["workers"]))
+        self.stdout.write(f"Created {created} snapshot(s).")
@@ -0,0 +1,322 @@
+"""
+Prometheus-style metrics: per-view request latency, DB query count/time,
+cache hits, serializer time and timings of the bank operations.
+
+Metrics live in plain in-process counters and histograms. With
+``BANK_METRICS_DIR`` set, each worker process also writes a snapshot to
+``<dir>/<pid>.json`` every ``BANK_METRICS_FLUSH_INTERVAL`` seconds from a
+background thread, and ``/metrics`` sums the snapshots of all workers, so
+any worker can answer the scrape. Point the directory at an empty location
+per deployment (e.g. wipe it when the server starts); snapshots of exited
+workers keep counting, as counters should.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = {}
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [[list(labels), value if isinstance(value, float) else list(value)]
+                      for labels, value in self.values.items()]
+        return {"kind": self.kind, "help": self.documentation, "labels": list(self.labels), "values": values}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Histogram(Metric):
+    """ Stores per-bucket (not cumulative) counts followed by the sum of observations """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+def timed(histogram: Histogram, label: str, errors: Counter = None):
+    """ Record the duration of every call under ``label``, and failed calls in ``errors`` """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(label)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, label)
+        return wrapper
+    return decorator
+
+
+# the _count series doubles as the per-status response counter
+REQUEST_SECONDS = Histogram(
+    "bank_http_request_seconds", "Request latency by view, method and status.", ["view", "method", "status"],
+)
+DB_QUERIES = Counter("bank_db_queries_total", "SQL queries run while serving a view.", ["view"])
+DB_QUERY_SECONDS = Counter("bank_db_query_seconds_total", "Time spent in SQL queries by view.", ["view"])
+CACHE_LOOKUPS = Counter("bank_cache_lookups_total", "Account cache lookups by result.", ["result"])
+CACHE_SECONDS = Counter("bank_cache_lookup_seconds_total", "Time spent in account cache lookups.")
+SERIALIZER_SECONDS = Histogram("bank_serializer_seconds", "Time to produce serializer .data.", ["serializer"])
+OPERATION_SECONDS = Histogram("bank_operation_seconds", "Duration of bank operations.", ["operation"])
+OPERATION_ERRORS = Counter("bank_operation_errors_total", "Bank operations that raised.", ["operation"])
+VELOCITY_REJECTIONS = Counter(
+    "bank_velocity_rejections_total", "Withdrawals and transfers refused by a velocity rule.", ["rule"],
+)
+LOG_SECONDS = Histogram(
+    "bank_log_emit_seconds", "Time to hand audit log entries to the log sink.", ["call"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1),
+)
+
+
+def snapshot() -> dict:
+    return {name: metric.snapshot() for name, metric in REGISTRY.items()}
+
+
+def reset() -> None:
+    for metric in REGISTRY.values():
+        metric.reset()
+
+
+# multi-process snapshots
+
+def metrics_dir():
+    path = getattr(settings, "BANK_METRICS_DIR", None)
+    return Path(path) if path else None
+
+
+class SnapshotWriter:
+    """ Background thread that persists this process's metrics; restarted after a fork """
+
+    def __init__(self):
+        self.pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        if self.pid == os.getpid():
+            return
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            interval = getattr(settings, "BANK_METRICS_FLUSH_INTERVAL", 1.0)
+            threading.Thread(target=self._run, args=(interval,), name="bank-metrics", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self) -> None:
+        directory = metrics_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f"{os.getpid()}.json"
+        temporary = target.with_suffix(".tmp")
+        temporary.write_text(json.dumps(snapshot()))
+        os.replace(temporary, target)
+
+
+writer = SnapshotWriter()
+
+
+def collect() -> dict:
+    """ This process's live metrics merged with the latest snapshots of every other worker """
+    merged = snapshot()
+    directory = metrics_dir()
+    if directory is None or not directory.is_dir():
+        return merged
+    own = f"{os.getpid()}.json"
+    for path in directory.glob("*.json"):
+        if path.name == own:
+            continue
+        try:
+            other = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # being replaced or truncated, picked up on the next scrape
+        for name, metric in other.items():
+            _merge(merged.setdefault(name, {**metric, "values": []}), metric)
+    return merged
+
+
+def _merge(into: dict, other: dict) -> None:
+    values = {tuple(labels): value for labels, value in into["values"]}
+    for labels, value in other["values"]:
+        labels = tuple(labels)
+        if labels not in values:
+            values[labels] = value
+        elif isinstance(value, list):
+            values[labels] = [a + b for a, b in zip(values[labels], value)]
+        else:
+            values[labels] += value
+    into["values"] = [[list(labels), value] for labels, value in values.items()]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(metrics: dict) -> str:
+    """ Prometheus text exposition format 0.0.4 """
+    lines = []
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric["values"], key=lambda item: item[0]):
+            if metric["kind"] == "histogram":
+                cumulative = 0
+                for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                    cumulative += count
+                    bucket = _labels(metric["labels"], labels, 'le="%s"' % bound)
+                    lines.append(f"{name}_bucket{bucket} {cumulative}")
+                lines.append(f"{name}_sum{_labels(metric['labels'], labels)} {value[-1]}")
+                lines.append(f"{name}_count{_labels(metric['labels'], labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(metric['labels'], labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# request instrumentation
+
+_request_queries = contextvars.ContextVar("bank_metrics_queries", default=None)
+
+
+class _QueryTimer:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _request_queries.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.count += 1
+        timer.seconds += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs) -> None:
+    """
+    Installed once per connection (``connection_created``) rather than with
+    ``execute_wrapper()`` on every request, which would cost more than the
+    rest of the middleware together. Queries outside a request pass through.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _time_query)
+
+
+connection_created.connect(install_query_timer)
+
+
+class MetricsMiddleware:
+    """ Records latency, status and DB usage per resolved view """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.snapshots = metrics_dir() is not None
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _record(self, request, response, start: float, queries: _QueryTimer) -> None:
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else "<unmatched>"
+        REQUEST_SECONDS.observe(elapsed, view, request.method, response.status_code)
+        if queries.count:
+            DB_QUERIES.inc(view, amount=queries.count)
+            DB_QUERY_SECONDS.inc(view, amount=queries.seconds)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if self.snapshots:
+            writer.ensure_started()
+        queries = _QueryTimer()
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, start, queries)
+        return response
+
+    async def __acall__(self, request):
+        if self.snapshots:
+            writer.ensure_started()
+        queries = _QueryTimer()
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, start, queries)
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0002_logentry_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logentry',
+            name='account',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='log_entries', to='bank.bankaccount'),
+        ),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['timestamp'], name='bank_log_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['action', 'status', 'timestamp'], name='bank_log_action_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['account', 'timestamp'], name='bank_log_account_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0003_logentry_account_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankaccount',
+            index=models.Index(fields=['account_type', 'balance'], name='bank_acct_type_balance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bankaccount',
+            index=models.Index(fields=['balance'], name='bank_acct_balance_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:41
+
+import uuid
+
+import bank.enums
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_existing_accounts(apps, schema_editor):
+    """
+    One opening entry per account that already holds money, dated at its
+    last balance change, so the ledger reconciles with the balances
+    """
+    BankAccount = apps.get_model('bank', 'BankAccount')
+    LedgerEntry = apps.get_model('bank', 'LedgerEntry')
+    credit, debit = bank.enums.Direction.CREDIT.value, bank.enums.Direction.DEBIT.value
+    accounts = BankAccount.objects.using(schema_editor.connection.alias).exclude(balance=0)
+    LedgerEntry.objects.using(schema_editor.connection.alias).bulk_create((
+        LedgerEntry(account_id=account_id, transfer_id=uuid.uuid4(), direction=credit if balance > 0 else debit,
+                    amount=abs(balance), created_at=updated)
+        for account_id, balance, updated in accounts.values_list('pk', 'balance', 'date_updated').iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0004_bankaccount_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('last_entry_id', models.BigIntegerField()),
+                ('as_of', models.DateTimeField()),
+                ('account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='bank.bankaccount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'as_of'], name='bank_snapshot_account_ts_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transfer_id', models.UUIDField(db_index=True)),
+                ('direction', models.SmallIntegerField(choices=[(1, 'Debit'), (2, 'Credit')])),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='bank.bankaccount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'id'], name='bank_ledger_account_id_idx'), models.Index(fields=['account', 'created_at'], name='bank_ledger_account_ts_idx')],
+            },
+        ),
+        migrations.RunPython(open_existing_accounts, migrations.RunPython.noop),
+    ]
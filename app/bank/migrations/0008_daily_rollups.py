@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:29
+
+from decimal import Decimal
+
+import bank.enums
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+
+def roll_up_existing_entries(apps, schema_editor):
+    """ The rollups of the ledger written so far, as ``analytics.rebuild_rollups`` computes them """
+    LedgerEntry = apps.get_model('bank', 'LedgerEntry')
+    DailyRollup = apps.get_model('bank', 'DailyRollup')
+    zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=17, decimal_places=2))
+    credit = Q(direction=bank.enums.Direction.CREDIT.value)
+    rows = (
+        LedgerEntry.objects.using(schema_editor.connection.alias)
+        .values('account_id', day=TruncDate('created_at', tzinfo=timezone.get_default_timezone()))
+        .annotate(
+            credited=Coalesce(Sum('amount', filter=credit), zero),
+            debited=Coalesce(Sum('amount', filter=~credit), zero),
+            credits=Count('pk', filter=credit),
+            debits=Count('pk', filter=~credit),
+        )
+        .order_by()
+    )
+    DailyRollup.objects.using(schema_editor.connection.alias).bulk_create(
+        (DailyRollup(**row) for row in rows.iterator()), batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0007_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('credited', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('debited', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('credits', models.PositiveIntegerField(default=0)),
+                ('debits', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='bank.bankaccount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='bank_rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'day'), name='bank_rollup_account_day_uniq')],
+            },
+        ),
+        migrations.RunPython(roll_up_existing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:40
+
+import bank.enums
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0008_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankaccount',
+            name='account_type',
+            field=models.CharField(choices=bank.enums.AccountType.choices, max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='direction',
+            field=models.SmallIntegerField(choices=bank.enums.Direction.choices),
+        ),
+        migrations.AlterField(
+            model_name='logentry',
+            name='action',
+            field=models.IntegerField(choices=bank.enums.ActionType.choices),
+        ),
+        migrations.AlterField(
+            model_name='logentry',
+            name='status',
+            field=models.IntegerField(choices=bank.enums.ActionStatus.choices),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='status',
+            field=models.SmallIntegerField(choices=bank.enums.TaskStatus.choices, default=1),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:50
+
+import bank.enums
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0009_callable_choices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandingOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('frequency', models.CharField(choices=bank.enums.Frequency.choices, default='M', max_length=1)),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('next_run_at', models.DateTimeField()),
+                ('active', models.BooleanField(default=True)),
+                ('claim_id', models.UUIDField(blank=True, null=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.SmallIntegerField(blank=True, choices=bank.enums.ActionStatus.choices, null=True)),
+                ('last_error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('from_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standing_orders', to='bank.bankaccount')),
+                ('to_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bank.bankaccount')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('active', True)), fields=['next_run_at'], name='bank_standing_due_idx')],
+            },
+        ),
+    ]
@@ -3,22 +3,46 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin
 )
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.conf import settings
-from .enums import AccountType, ActionStatus, ActionType
+from django.utils import timezone
+from .enums import AccountType, ActionStatus, ActionType, Direction, Frequency, TaskStatus
+from .logsinks import get_sink
+from .metrics import LOG_SECONDS, timed
 
 class LogEntry(models.Model):
-    action = models.IntegerField(choices=[(tag.value, str(tag)) for tag in ActionType])
-    status = models.IntegerField(choices=[(tag.value, str(tag)) for tag in ActionStatus])
-    timestamp = models.DateTimeField(auto_now_add=True)
+    action = models.IntegerField(choices=ActionType.choices)
+    status = models.IntegerField(choices=ActionStatus.choices)
+    # set when the entry is built, not when a (possibly buffered) sink saves it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     details = models.TextField(blank=True, null=True)
+    account = models.ForeignKey(
+        'BankAccount', on_delete=models.SET_NULL, related_name='log_entries',
+        blank=True, null=True, db_index=False,  # covered by the (account, timestamp) index
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='bank_log_timestamp_idx'),
+            models.Index(fields=['action', 'status', 'timestamp'], name='bank_log_action_status_ts_idx'),
+            models.Index(fields=['account', 'timestamp'], name='bank_log_account_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.action:<15} | {self.timestamp.strftime('%Y-%m-%d %H:%M:%S'):^20} | {self.details}"
 
     @classmethod
-    def log(cls, action: ActionType, status: ActionStatus, details: str = "") -> None:
-        cls.objects.create(action=action, status=status.value, details=details)
+    @timed(LOG_SECONDS, "log")
+    def log(cls, action: ActionType, status: ActionStatus, details: str = "", account=None) -> 'LogEntry':
+        entry = cls(action=action.value, status=status.value, details=details, account=account)
+        get_sink().emit([entry])
+        return entry
+
+    @classmethod
+    @timed(LOG_SECONDS, "log_many")
+    def log_many(cls, entries: list) -> None:
+        get_sink().emit(entries)
 
 
 class CustomUserManager(BaseUserManager):
@@ -52,6 +76,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # both written by the process_profile_picture task, see bank/tasks.py
+    profile_thumbnail = models.ImageField(upload_to='profile_pics/thumbs/', blank=True, null=True, editable=False)
 
     objects = CustomUserManager()
 
@@ -78,52 +104,190 @@ class BankAccount(models.Model):
     account_holder = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bank_accounts')
     account_type = models.CharField(
         max_length=3,
-        choices=[(tag.value, str(tag)) for tag in AccountType],
+        choices=AccountType.choices,
     )
     bank_name = models.CharField(max_length=100)
     balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account_type', 'balance'], name='bank_acct_type_balance_idx'),
+            models.Index(fields=['balance'], name='bank_acct_balance_idx'),
+        ]
+
     def __str__(self):
         return f"{self.account_holder.username} - {self.account_number} ({self.account_type})"
 
-    def deposit(self, amount: float):
-        log = f"{amount:.2f} -> {self.account_number}"
-        if amount <= 0:
-            error = "Deposit should be positive!"
-            LogEntry.log(ActionType.DEPOSIT, ActionStatus.FAILURE, ' '.join((log, f"error: {error}")))
-            raise ValueError(error)
+    def save(self, *args, **kwargs):
+        # update_fields means an UPDATE, even on an unsaved BankAccount(pk=...) stand-in
+        opening = self._state.adding and kwargs.get('update_fields') is None and self.balance
+        super().save(*args, **kwargs)
+        if opening:
+            from .ledger import record_opening
+            record_opening([self])
 
-        self.balance += amount
-        self.save()
-        LogEntry.log(ActionType.DEPOSIT, ActionStatus.FAILURE, log)
-        return self
+    def deposit(self, amount: float):
+        from .services import deposit
+        return deposit(self, amount)
 
     def withdraw(self, amount: float):
-        log = f"{self.account_number} -> {amount:.2f}"
-        if amount <= 0:
-            error = "Withdrawal amount should be positive!"
-            LogEntry.log(ActionType.WITHDRAWAL, ActionStatus.FAILURE, ' '.join((log, f"error: {error}")))
-            raise ValueError(error)
-        if amount > self.balance:
-            error = "Insufficient funds!"
-            LogEntry.log(ActionType.WITHDRAWAL, ActionStatus.FAILURE, ' '.join((log, f"error: {error}")))
-            raise ValueError(error)
-
-        self.balance -= amount
-        self.save()
-        LogEntry.log(ActionType.WITHDRAWAL, ActionStatus.FAILURE, log)
-        return self
+        from .services import withdraw
+        return withdraw(self, amount)
 
     def transfer(self, to_account, amount: float) -> None:
-        log = f"{self.account_number} -> {amount:.2f} -> {to_account.account_number}"
-        LogEntry.log(ActionType.TRANSFER, ActionStatus.PENDING, log)
-        try: self.withdraw(amount)
-        except ValueError as e:
-            LogEntry.log(ActionType.TRANSFER, ActionStatus.FAILURE, log)
-            raise e
-        else:
-            to_account.deposit(amount)
-            LogEntry.log(ActionType.TRANSFER, ActionStatus.SUCCESS, log)
- 
\ No newline at end of file
+        from .services import transfer
+        transfer(self, to_account, amount)
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only journal of balance changes. A transfer writes a DEBIT on the
+    source and a CREDIT on the target sharing one ``transfer_id`` (one for
+    all legs of a bulk transfer); deposits and withdrawals write a single row.
+    """
+    account = models.ForeignKey(BankAccount, on_delete=models.PROTECT, related_name='ledger_entries', db_index=False)
+    transfer_id = models.UUIDField(db_index=True)
+    direction = models.SmallIntegerField(choices=Direction.choices)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'id'], name='bank_ledger_account_id_idx'),
+            models.Index(fields=['account', 'created_at'], name='bank_ledger_account_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transfer_id} | {Direction(self.direction)} {self.amount} | account {self.account_id}"
+
+
+class BalanceSnapshot(models.Model):
+    """ Ledger balance of an account including every entry up to ``last_entry_id`` """
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='balance_snapshots', db_index=False)
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+    last_entry_id = models.BigIntegerField()
+    as_of = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'as_of'], name='bank_snapshot_account_ts_idx'),
+        ]
+
+
+class DailyRollup(models.Model):
+    """
+    Ledger totals of one account for one day (in ``TIME_ZONE``), kept
+    current by ``ledger.record()``; see bank/analytics.py
+    """
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='daily_rollups', db_index=False)
+    day = models.DateField()
+    credited = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    debited = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    credits = models.PositiveIntegerField(default=0)
+    debits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'day'], name='bank_rollup_account_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='bank_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.day}: +{self.credited} -{self.debited}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a mutating API call made with an ``Idempotency-Key`` header,
+    replayed for retries of the same request until ``expires_at``. A row
+    with no ``status_code`` belongs to a request still in flight.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='bank_idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='bank_idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} -> {self.status_code}"
+
+
+class Task(models.Model):
+    """
+    A unit of background work for ``run_worker``: the registered handler
+    ``name`` called with ``payload`` as keyword arguments. A RUNNING task
+    is leased to a worker until ``locked_until``; after that it counts as
+    abandoned and is claimed again.
+    """
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.SmallIntegerField(
+        choices=TaskStatus.choices, default=TaskStatus.QUEUED.value,
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='bank_task_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({TaskStatus(self.status)})"
+
+
+class StandingOrder(models.Model):
+    """
+    A recurring transfer of ``amount`` paid by ``run_standing_orders`` at
+    ``next_run_at``, then every ``frequency`` counted from ``starts_at``
+    until ``ends_at``. A claimed order is leased to one runner (``claim_id``)
+    until ``locked_until``; see bank/standing.py
+    """
+    from_account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='standing_orders')
+    to_account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    frequency = models.CharField(max_length=1, choices=Frequency.choices, default=Frequency.MONTHLY.value)
+    starts_at = models.DateTimeField(default=timezone.now)
+    ends_at = models.DateTimeField(blank=True, null=True)
+    next_run_at = models.DateTimeField()
+    active = models.BooleanField(default=True)
+    claim_id = models.UUIDField(blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_run_at = models.DateTimeField(blank=True, null=True)
+    last_status = models.SmallIntegerField(choices=ActionStatus.choices, blank=True, null=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_run_at'], condition=models.Q(active=True), name='bank_standing_due_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.next_run_at is None:
+            self.next_run_at = self.starts_at
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.amount} {self.from_account_id} -> {self.to_account_id} ({Frequency(self.frequency)})"
@@ -0,0 +1,13 @@
+""" HTML pages, served by the ``full`` app profile only """
+from django.urls import path
+from bank.views import home, register, login_view, profile, account, dashboard, custom_logout
+
+urlpatterns = [
+    path('', home, name='home'),
+    path('register/', register, name='register'),
+    path('login/', login_view, name='login'),
+    path('profile/', profile, name='profile'),
+    path('account/', account, name='account'),
+    path('dashboard/', dashboard, name='dashboard'),
+    path('logout/', custom_logout, name='logout'),
+]
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination: each page continues with ``WHERE id > last``
+    on an indexed column instead of an OFFSET, so deep pages cost the same as
+    the first one.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class LogEntryPagination(KeysetPagination):
+    # newest first, served by the timestamp / (action, status, timestamp) indexes
+    ordering = '-timestamp'
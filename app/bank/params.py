@@ -0,0 +1,59 @@
+"""
+Parsers for query parameters and task payloads: each takes the raw string
+and returns the value or raises ValueError. Kept free of DRF, so modules
+the worker imports (bank/tasks.py) do not load it.
+"""
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def choice(enum):
+    """ Accept either the stored value (``4``, ``SAV``) or the member name (``transfer``) """
+    by_key = {str(tag.value).lower(): tag.value for tag in enum}
+    by_key.update({tag.name.lower(): tag.value for tag in enum})
+
+    def parse(raw):
+        try:
+            return by_key[raw.lower()]
+        except KeyError:
+            raise ValueError(f"expected one of {', '.join(tag.name.lower() for tag in enum)}")
+    return parse
+
+
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)  # what every backend's BIGINT column can compare against
+
+
+def integer(raw):
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError("expected an integer")
+    if value not in INTEGER_RANGE:
+        raise ValueError("integer out of range")
+    return value
+
+
+def decimal(raw):
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValueError("expected a decimal number")
+    if not value.is_finite():
+        raise ValueError("expected a finite decimal number")
+    return value
+
+
+def moment(raw):
+    """ ISO datetime or date; naive values are read in the current time zone """
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ValueError("expected an ISO 8601 date or datetime")
+        value = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
@@ -0,0 +1,79 @@
+"""
+Query budgets: a test helper that fails when a block of code runs more SQL
+queries than allowed, and a middleware that counts queries per request.
+
+The middleware is only installed when ``DEBUG`` or ``BANK_QUERY_BUDGET_STRICT``
+is on. It then reports ``X-Query-Count`` / ``X-Query-Time-Ms`` headers and
+checks the per-URL-name limits in ``BANK_QUERY_BUDGETS``: over budget it logs
+a warning, or raises ``QueryBudgetExceeded`` in strict mode (tests).
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(limit: int, using: str = 'default', label: str = 'block'):
+    """ ``with query_budget(3): ...`` fails if the block runs more than 3 queries """
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+    if len(captured) > limit:
+        queries = '\n'.join(f'  {query["sql"]}' for query in captured.captured_queries)
+        raise QueryBudgetExceeded(f'{label} ran {len(captured)} queries, budget is {limit}:\n{queries}')
+
+
+class QueryBudgetMixin:
+    """ TestCase mixin: ``with self.assertQueryBudget(2): self.client.get(...)`` """
+
+    def assertQueryBudget(self, limit: int, using: str = 'default'):
+        return query_budget(limit, using, label=self.id())
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class QueryCountMiddleware:
+    def __init__(self, get_response):
+        self.strict = getattr(settings, 'BANK_QUERY_BUDGET_STRICT', False)
+        if not (settings.DEBUG or self.strict):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = getattr(settings, 'BANK_QUERY_BUDGETS', {})
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connections['default'].execute_wrapper(counter):
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(counter.count)
+        response['X-Query-Time-Ms'] = f'{counter.seconds * 1000:.2f}'
+
+        match = request.resolver_match
+        budget = self.budgets.get(match.url_name) if match else None
+        if budget is not None and counter.count > budget:
+            message = f'{request.method} {request.path} ({match.url_name}) ran {counter.count} queries, budget is {budget}'
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
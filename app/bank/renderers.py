@@ -0,0 +1,25 @@
+"""
+``ORJSONRenderer``: a drop-in for DRF's ``JSONRenderer`` (compact,
+``ensure_ascii=False``, U+2028/U+2029 escaped) encoding with orjson,
+several times faster on large list responses. Types orjson does not
+handle natively, and datetimes (which DRF formats its own way), go
+through DRF's encoder; indented output is left to ``JSONRenderer``.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (not self.compact or self.ensure_ascii or self.encoder_class is not JSONEncoder
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=OPTIONS)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,96 @@
+"""
+Primary/replica database routing.
+
+Reads go to a replica only while a read-only request is being served
+(GET/HEAD/OPTIONS, marked by ``ReplicaRoutingMiddleware``), which covers the
+log listing and account list/retrieve endpoints. Everything else - writes,
+management commands, balance mutations in ``bank.services`` - uses the
+primary. After a write the client gets a short-lived cookie that pins its
+following requests to the primary, so it always reads its own writes
+despite replication lag.
+"""
+import contextvars
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'bank_primary_until'
+
+_use_replicas = contextvars.ContextVar('bank_use_replicas', default=False)
+
+
+def _target(alias: str) -> tuple:
+    config = connections[alias].settings_dict
+    return config['ENGINE'], str(config['NAME']), config.get('HOST', ''), config.get('PORT', '')
+
+
+def replica_aliases() -> list:
+    """ Configured replicas, minus any that point at the primary itself (e.g. test mirrors) """
+    primary = _target(DEFAULT_DB_ALIAS)
+    return [alias for alias in settings.DATABASES if alias.startswith('replica') and _target(alias) != primary]
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get():
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # anything written during the request is read back from the primary
+        _use_replicas.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """ Allows replica reads for safe requests that are not pinned to the primary """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'BANK_REPLICA_STICKY_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _replicas_allowed(self, request) -> bool:
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return False
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) < time.time()
+        except ValueError:
+            return True
+
+    def _pin_after_write(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.0f}',
+                                max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replicas.set(self._replicas_allowed(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+        return self._pin_after_write(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replicas.set(self._replicas_allowed(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+        return self._pin_after_write(request, response)
@@ -0,0 +1,284 @@
+"""
+Synthetic datasets for perf environments and benchmarks: users, their
+accounts (with opening ledger entries and their daily rollups) and audit
+log history.
+
+Users and accounts are written in chunks with ``bulk_create`` (their keys
+are needed); the append-only log and ledger tables skip model instances
+altogether and take raw rows through ``COPY ... FROM STDIN`` on PostgreSQL
+or ``executemany`` elsewhere.
+
+Faker is slow per call, so a small corpus of names and companies is
+generated once and rows are assembled from it, and every user shares a
+single password hash computed up front. Large runs are split by user range
+across a process pool, each worker on its own connection.
+"""
+import datetime
+import io
+import multiprocessing
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .analytics import rollup_day
+from .enums import AccountType, ActionStatus, ActionType, Direction
+from .models import BankAccount, CustomUser, DailyRollup, LedgerEntry, LogEntry
+
+CHUNK = 10_000
+CORPUS_SIZE = 1_000
+PASSWORD = "seed-password"
+ZERO = Decimal("0.00")
+
+
+class Corpus:
+    """ Faker output drawn once per process and recombined for every row """
+
+    def __init__(self, seed: int = 0):
+        from faker import Faker
+
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.first_names = [fake.first_name()[:30] for _ in range(CORPUS_SIZE)]
+        self.last_names = [fake.last_name()[:30] for _ in range(CORPUS_SIZE)]
+        self.companies = [fake.company()[:100] for _ in range(CORPUS_SIZE)]
+        self.sentences = [fake.sentence() for _ in range(CORPUS_SIZE)]
+
+
+class Dataset:
+    def __init__(self, tag: str, counts: dict, elapsed: float = 0.0):
+        self.tag = tag
+        self.counts = counts
+        self.elapsed = elapsed
+
+    def users(self):
+        return CustomUser.objects.filter(username__startswith=f"{self.tag}-").order_by("pk")
+
+    def accounts(self):
+        return BankAccount.objects.filter(account_number__startswith=self.tag).order_by("pk")
+
+    @property
+    def rows(self) -> int:
+        return sum(self.counts.values())
+
+
+def _adapter(field):
+    """
+    Cheap per-column conversion to what the driver expects, instead of
+    Field.get_db_prep_save per value. Decimals must already carry the
+    field's scale; every driver Django supports adapts them natively.
+    """
+    internal_type = field.get_internal_type()
+    if internal_type == "DateTimeField":
+        # values from stored_now() are already in storage form
+        return None
+    if internal_type == "UUIDField" and not connection.features.has_native_uuid_field:
+        return lambda value: value.hex
+    return None
+
+
+def stored_now() -> datetime.datetime:
+    """ The current time as the backend stores it (naive UTC without time zone support) """
+    now = timezone.now()
+    if settings.USE_TZ and not connection.features.supports_timezones:
+        return now.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return now
+
+
+def insert_rows(model, columns: list, rows) -> int:
+    """
+    Append raw rows (tuples of ``columns``, given as field names) to
+    ``model``'s table without building model instances: COPY on PostgreSQL,
+    chunked ``executemany`` elsewhere. Datetimes must be derived from
+    ``stored_now()``. Returns the number of rows written.
+    """
+    fields = [model._meta.get_field(name) for name in columns]
+    adapters = [(index, adapter) for index, adapter in enumerate(map(_adapter, fields)) if adapter]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_sql = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+
+    def prepared():
+        for row in rows:
+            if adapters:
+                row = list(row)
+                for index, adapter in adapters:
+                    row[index] = adapter(row[index])
+            yield row
+
+    written = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+            sql = f"COPY {table} ({column_sql}) FROM STDIN"
+            if is_psycopg3:
+                with cursor.cursor.copy(sql) as copy:
+                    for row in prepared():
+                        copy.write_row(row)
+                        written += 1
+            else:
+                buffer = io.StringIO()
+                for row in prepared():
+                    buffer.write("\t".join(r"\N" if value is None else _escape(value) for value in row) + "\n")
+                    written += 1
+                buffer.seek(0)
+                cursor.cursor.copy_expert(sql, buffer)
+            return written
+        sql = f"INSERT INTO {table} ({column_sql}) VALUES ({', '.join(['%s'] * len(fields))})"
+        chunk = []
+        for row in prepared():
+            chunk.append(row)
+            if len(chunk) == CHUNK:
+                cursor.executemany(sql, chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            cursor.executemany(sql, chunk)
+            written += len(chunk)
+    return written
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def seed_logs(count: int, account_ids: list, days: int = 365, rnd: random.Random = None, details=("seed",)) -> int:
+    """ Insert ``count`` log rows for random accounts, spread evenly over the last ``days`` days """
+    rnd = rnd or random.Random(0)
+    now = stored_now()
+    step = datetime.timedelta(days=days) / max(count, 1)
+    columns = (
+        rnd.choices([tag.value for tag in ActionType], k=count),
+        rnd.choices([tag.value for tag in ActionStatus], k=count),
+        (now - step * i for i in range(count)),
+        rnd.choices(details, k=count),
+        rnd.choices(account_ids, k=count),
+    )
+    return insert_rows(LogEntry, ["action", "status", "timestamp", "details", "account"], zip(*columns))
+
+
+def seed_range(tag: str, start: int, stop: int, accounts_per_user: int, logs_per_account: int,
+               password: str, seed: int = 0) -> dict:
+    """ Create users ``start``..``stop`` of a dataset with their accounts, opening ledger entries and logs """
+    corpus = Corpus(seed)
+    rnd = random.Random(seed * 1_000_003 + start)
+    account_types = [tag.value for tag in AccountType]
+    counts = {"users": 0, "accounts": 0, "ledger_entries": 0, "rollups": 0, "logs": 0}
+    users_per_chunk = CHUNK // max(accounts_per_user, 1)
+
+    for offset in range(start, stop, users_per_chunk):
+        end = min(offset + users_per_chunk, stop)
+        now = stored_now()
+        usernames = [f"{tag}-{i}" for i in range(offset, end)]
+        with transaction.atomic():
+            counts["users"] += insert_rows(CustomUser, [
+                "username", "email", "first_name", "last_name", "password",
+                "is_active", "is_staff", "is_superuser", "date_joined",
+            ], (
+                (username, f"{username}@seed.example.com", first_name, last_name, password, True, False, False, now)
+                for username, first_name, last_name in zip(
+                    usernames,
+                    rnd.choices(corpus.first_names, k=len(usernames)),
+                    rnd.choices(corpus.last_names, k=len(usernames)),
+                )
+            ))
+            # keys come back through the unique username instead of per-row RETURNING
+            user_ids = dict(CustomUser.objects.filter(username__in=usernames).values_list("username", "pk"))
+
+            accounts = [
+                (f"{tag}{i * accounts_per_user + n:012d}", user_ids[username], Decimal(rnd.randint(0, 10_000_00)) / 100)
+                for i, username in zip(range(offset, end), usernames)
+                for n in range(accounts_per_user)
+            ]
+            counts["accounts"] += insert_rows(BankAccount, [
+                "account_number", "account_holder", "account_type", "bank_name", "balance",
+                "date_created", "date_updated",
+            ], (
+                (number, holder, account_type, bank_name, balance, now, now)
+                for (number, holder, balance), account_type, bank_name in zip(
+                    accounts,
+                    rnd.choices(account_types, k=len(accounts)),
+                    rnd.choices(corpus.companies, k=len(accounts)),
+                )
+            ))
+            account_ids = dict(BankAccount.objects.filter(
+                account_number__in=[number for number, _, _ in accounts],
+            ).values_list("account_number", "pk"))
+
+            counts["ledger_entries"] += insert_rows(
+                LedgerEntry, ["account", "transfer_id", "direction", "amount", "created_at"],
+                (
+                    (account_ids[number], uuid.UUID(int=rnd.getrandbits(128)), Direction.CREDIT.value, balance, now)
+                    for number, _, balance in accounts if balance
+                ),
+            )
+            today = rollup_day(timezone.now())
+            counts["rollups"] += insert_rows(
+                DailyRollup, ["account", "day", "credited", "debited", "credits", "debits"],
+                ((account_ids[number], today, balance, ZERO, 1, 0) for number, _, balance in accounts if balance),
+            )
+            if account_ids and logs_per_account:
+                counts["logs"] += seed_logs(
+                    len(account_ids) * logs_per_account, list(account_ids.values()), rnd=rnd, details=corpus.sentences,
+                )
+    return counts
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """ Drop the secondary indexes of ``models`` during a bulk load and build each once at the end """
+    indexes = [(model, index) for model in models for index in model._meta.indexes]
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+
+def _seed_range_in_worker(args) -> dict:
+    try:
+        return seed_range(*args)
+    finally:
+        connections.close_all()
+
+
+def seed_bank(users: int, accounts_per_user: int = 2, logs_per_account: int = 0, workers: int = 1,
+              seed: int = 0, password: str = PASSWORD, defer_indexes: bool = False) -> Dataset:
+    """
+    Seed ``users`` users. With ``workers > 1`` user ranges are spread over
+    forked processes; SQLite serialises their writes, so parallelism pays
+    off on PostgreSQL. ``defer_indexes`` rebuilds the log and ledger indexes
+    after the load instead of maintaining them row by row, which is much
+    faster for large loads but leaves those tables unindexed meanwhile.
+    """
+    tag = uuid.uuid4().hex[:8]
+    password_hash = make_password(password)
+    start = timezone.now()
+    with deferred_indexes(LogEntry, LedgerEntry) if defer_indexes else nullcontext():
+        counts = _seed(tag, users, accounts_per_user, logs_per_account, workers, seed, password_hash)
+    return Dataset(tag, counts, (timezone.now() - start).total_seconds())
+
+
+def _seed(tag, users, accounts_per_user, logs_per_account, workers, seed, password_hash) -> dict:
+    if workers <= 1:
+        return seed_range(tag, 0, users, accounts_per_user, logs_per_account, password_hash, seed)
+    step = max(CHUNK // max(accounts_per_user, 1), -(-users // (workers * 4)))
+    ranges = [
+        (tag, first, min(first + step, users), accounts_per_user, logs_per_account, password_hash, seed)
+        for first in range(0, users, step)
+    ]
+    # children must not inherit open connections
+    connections.close_all()
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as pool:
+        results = list(pool.map(_seed_range_in_worker, ranges))
+    return {key: sum(result[key] for result in results) for key in results[0]}
@@ -1,17 +1,146 @@
+import time
+from decimal import Decimal
 from rest_framework import serializers
-from .models import CustomUser, BankAccount, LogEntry
+from .analytics import PERIODS, TOP_HOLDERS, report_range
+from .metrics import SERIALIZER_SECONDS
+from .params import decimal
+from .enums import TaskStatus
+from .models import CustomUser, BankAccount, LogEntry, Task
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+    """ Records how long building ``.data`` for a list of objects takes """
+
+    @property
+    def data(self):
+        start = time.perf_counter()
+        data = super().data
+        SERIALIZER_SECONDS.observe(time.perf_counter() - start, f"{type(self.child).__name__}[]")
+        return data
+
+class TimedSerializerMixin:
+    """ Records how long building ``.data`` takes; pair with ``Meta.list_serializer_class = TimedListSerializer`` """
+
+    @property
+    def data(self):
+        start = time.perf_counter()
+        data = super().data
+        SERIALIZER_SECONDS.observe(time.perf_counter() - start, type(self).__name__)
+        return data
+
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'username', 'first_name', 'last_name', 'profile_picture']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'email', 'username', 'first_name', 'last_name', 'profile_picture', 'profile_thumbnail']
 
-class BankAccountSerializer(serializers.ModelSerializer):
+class BankAccountSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = BankAccount
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
 
-class LogEntrySerializer(serializers.ModelSerializer):
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # the opening balance is journaled on create, later changes only through the services
+            fields['balance'].read_only = True
+        return fields
+
+class LogEntrySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = LogEntry
-        fields = '__all__'
\ No newline at end of file
+        list_serializer_class = TimedListSerializer
+        fields = '__all__'
+
+class TaskSerializer(serializers.ModelSerializer):
+    status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = ['id', 'name', 'status', 'attempts', 'result', 'created_at', 'finished_at']
+
+    def get_status(self, task):
+        return str(TaskStatus(task.status)).lower()
+
+class BulkTransferSerializer(serializers.Serializer):
+    """
+    ``{"legs": [{"from_account": "...", "to_account": "...", "amount": "12.50"}, ...]}``
+
+    Only the shape of each leg is validated here (both accounts and a
+    finite decimal amount); whether an amount is positive and covered and
+    whether the accounts exist is checked per leg by the bulk transfer
+    service, so one bad leg does not reject the whole file.
+    """
+    MAX_LEGS = 10000
+
+    legs = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_LEGS)
+
+    def validate_legs(self, legs):
+        parsed = []
+        for index, leg in enumerate(legs):
+            try:
+                parsed.append((str(leg["from_account"]), str(leg["to_account"]), decimal(str(leg["amount"]))))
+            except KeyError as e:
+                raise serializers.ValidationError(f"Leg {index} is missing {e.args[0]!r}.")
+            except ValueError as e:
+                raise serializers.ValidationError(f"Leg {index} amount: {e}.")
+        return parsed
+
+class AmountSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal("0.01"))
+
+class AccountTransferSerializer(AmountSerializer):
+    to_account = serializers.CharField(max_length=20)
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """ ``?period=day|week|month|year&since=YYYY-MM-DD&until=YYYY-MM-DD`` (``holder`` and ``top`` for admins) """
+    period = serializers.ChoiceField(choices=PERIODS, default='month')
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    holder = serializers.IntegerField(required=False)
+    top = serializers.IntegerField(min_value=1, max_value=100, default=TOP_HOLDERS)
+
+    def validate(self, attrs):
+        # domyślne until (dziś) trzeba uzupełnić przed porównaniem, inaczej since z przyszłości kończy się 500
+        try:
+            attrs['since'], attrs['until'] = report_range(attrs['period'], attrs.get('since'), attrs.get('until'))
+        except ValueError:
+            raise serializers.ValidationError({'since': ['must not be after until']})
+        return attrs
+
+def money():
+    return serializers.DecimalField(max_digits=17, decimal_places=2)
+
+class TypeTotalsSerializer(serializers.Serializer):
+    account_type = serializers.CharField()
+    accounts = serializers.IntegerField()
+    balance = money()
+    share = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)  # % of the total balance
+    inflow = money()
+    outflow = money()
+
+class FlowSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    inflow = money()
+    outflow = money()
+    net = money()
+    running_net = money()
+    closing_balance = money()
+    transactions = serializers.IntegerField()
+    active_accounts = serializers.IntegerField()
+
+class HolderRankSerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    account_holder = serializers.IntegerField()
+    username = serializers.CharField()
+    accounts = serializers.IntegerField()
+    total = money()
+
+class AnalyticsSerializer(serializers.Serializer):
+    period = serializers.CharField()
+    since = serializers.DateField()
+    until = serializers.DateField()
+    opening_balance = money()
+    by_type = TypeTotalsSerializer(many=True)
+    flows = FlowSerializer(many=True)
+    top_holders = HolderRankSerializer(many=True, required=False)
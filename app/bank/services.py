@@ -0,0 +1,244 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import events, ledger
+from .cache import invalidate_accounts
+from .enums import ActionStatus, ActionType, Direction
+from .metrics import OPERATION_ERRORS, OPERATION_SECONDS, timed
+from .models import BankAccount, LogEntry
+from .velocity import Tally
+from .writequeue import serialized
+
+CENT = Decimal("0.01")
+BALANCE_FIELDS = ["balance", "date_updated"]
+
+
+def to_amount(amount) -> Decimal:
+    """ Normalise a float/str/Decimal amount to a two-place Decimal """
+    try:
+        value = Decimal(str(amount))
+        if value.is_finite():
+            return value.quantize(CENT)  # InvalidOperation past the context's precision
+    except InvalidOperation:
+        pass
+    raise ValueError(f"Invalid amount: {amount!r}")
+
+
+def _lock(*accounts: BankAccount) -> dict:
+    """
+    Lock the given accounts with SELECT ... FOR UPDATE in primary key order,
+    so two transfers going in opposite directions can never deadlock.
+    """
+    pks = sorted({account.pk for account in accounts})
+    locked = BankAccount.objects.select_for_update().filter(pk__in=pks).order_by("pk")
+    return {account.pk: account for account in locked}
+
+
+def _moved(account: BankAccount, locked: BankAccount) -> bool:
+    """
+    Whether the locked row belongs to another holder than the copy the caller
+    checked ownership on: an account reassigned in between is not paid from
+    """
+    return account.account_holder_id is not None and locked.account_holder_id != account.account_holder_id
+
+
+def _apply(account: BankAccount, locked: BankAccount, delta: Decimal) -> None:
+    """ Push a balance delta to the database with an F() expression and mirror it in memory """
+    account.balance = F("balance") + delta
+    account.save(update_fields=BALANCE_FIELDS)
+    account.balance = locked.balance + delta
+    invalidate_accounts(locked.account_holder_id)
+
+
+@timed(OPERATION_SECONDS, "deposit", OPERATION_ERRORS)
+@serialized
+def deposit(account: BankAccount, amount) -> BankAccount:
+    amount = to_amount(amount)
+    log = f"{amount:.2f} -> {account.account_number}"
+    if amount <= 0:
+        error = "Deposit should be positive!"
+        LogEntry.log(ActionType.DEPOSIT, ActionStatus.FAILURE, ' '.join((log, f"error: {error}")), account)
+        raise ValueError(error)
+
+    with transaction.atomic():
+        locked = _lock(account)[account.pk]
+        _apply(account, locked, amount)
+        ledger.record([ledger.entry(account, Direction.CREDIT, amount, uuid.uuid4())])
+        entry = LogEntry.log(ActionType.DEPOSIT, ActionStatus.SUCCESS, log, account)
+        events.notify(locked, account.balance, [entry])
+    return account
+
+
+@timed(OPERATION_SECONDS, "withdraw", OPERATION_ERRORS)
+@serialized
+def withdraw(account: BankAccount, amount) -> BankAccount:
+    amount = to_amount(amount)
+    log = f"{account.account_number} -> {amount:.2f}"
+    error = None
+    if amount <= 0:
+        error = "Withdrawal amount should be positive!"
+    else:
+        with transaction.atomic():
+            locked = _lock(account)[account.pk]
+            if _moved(account, locked):
+                error = "Account holder has changed!"
+            elif amount > locked.balance:
+                error = "Insufficient funds!"
+            else:
+                tally = Tally([locked])
+                error = tally.allow(locked, amount)
+            if not error:
+                _apply(account, locked, -amount)
+                ledger.record([ledger.entry(account, Direction.DEBIT, amount, uuid.uuid4())])
+                entry = LogEntry.log(ActionType.WITHDRAWAL, ActionStatus.SUCCESS, log, account)
+                events.notify(locked, account.balance, [entry])
+                tally.commit()
+
+    if error:
+        LogEntry.log(ActionType.WITHDRAWAL, ActionStatus.FAILURE, ' '.join((log, f"error: {error}")), account)
+        raise ValueError(error)
+    return account
+
+
+@timed(OPERATION_SECONDS, "transfer", OPERATION_ERRORS)
+@serialized
+def transfer(from_account: BankAccount, to_account: BankAccount, amount) -> None:
+    """
+    Move ``amount`` between two accounts in a single transaction.
+
+    Both rows are locked up front, balances are changed with F() expressions
+    (so a concurrent writer can never be overwritten by a stale in-memory
+    value) and all audit rows are written with one bulk insert. Failures are
+    logged after the transaction has been rolled back.
+    """
+    amount = to_amount(amount)
+    log = f"{from_account.account_number} -> {amount:.2f} -> {to_account.account_number}"
+    error = None
+    if amount <= 0:
+        error = "Transfer amount should be positive!"
+    elif from_account.pk == to_account.pk:
+        error = "Cannot transfer to the same account!"
+    else:
+        with transaction.atomic():
+            locked = _lock(from_account, to_account)
+            if _moved(from_account, locked[from_account.pk]):
+                error = "Account holder has changed!"
+            elif amount > locked[from_account.pk].balance:
+                error = "Insufficient funds!"
+            else:
+                tally = Tally([locked[from_account.pk]])
+                error = tally.allow(locked[from_account.pk], amount)
+            if not error:
+                _apply(from_account, locked[from_account.pk], -amount)
+                _apply(to_account, locked[to_account.pk], amount)
+                transfer_id = uuid.uuid4()
+                ledger.record([
+                    ledger.entry(from_account, Direction.DEBIT, amount, transfer_id),
+                    ledger.entry(to_account, Direction.CREDIT, amount, transfer_id),
+                ])
+                withdrawn, deposited, transferred = entries = [
+                    LogEntry(action=ActionType.WITHDRAWAL.value, status=ActionStatus.SUCCESS.value,
+                             details=f"{from_account.account_number} -> {amount:.2f}", account=from_account),
+                    LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value,
+                             details=f"{amount:.2f} -> {to_account.account_number}", account=to_account),
+                    LogEntry(action=ActionType.TRANSFER.value, status=ActionStatus.SUCCESS.value,
+                             details=log, account=from_account),
+                ]
+                LogEntry.log_many(entries)
+                events.notify(locked[from_account.pk], from_account.balance, [withdrawn, transferred])
+                events.notify(locked[to_account.pk], to_account.balance, [deposited])
+                tally.commit()
+
+    if error:
+        LogEntry.log(ActionType.TRANSFER, ActionStatus.FAILURE, ' '.join((log, f"error: {error}")), from_account)
+        raise ValueError(error)
+
+
+@timed(OPERATION_SECONDS, "bulk_transfer", OPERATION_ERRORS)
+@serialized
+def bulk_transfer(legs) -> list:
+    """
+    Apply many ``(from_number, to_number, amount)`` transfer legs at once.
+
+    All involved accounts are loaded and locked with a single query, funds
+    are checked in memory leg by leg, and the resulting balances are written
+    back with one bulk_update. All legs share one ledger ``transfer_id`` and
+    the velocity limits count them as one payment per source (their amounts
+    still add up). A leg is logged like ``transfer()``: WITHDRAWAL and
+    TRANSFER rows on the source, DEPOSIT on the target, or one failed
+    TRANSFER row. A failing leg does not stop the others; the per-leg
+    outcome is returned in order.
+    """
+    numbers = {number for source, target, _ in legs for number in (source, target)}
+    results, logs, entries = [], [], []
+    paid = defaultdict(list)  # account number -> log entries of its successful legs
+    with transaction.atomic():
+        accounts = {
+            account.account_number: account
+            for account in BankAccount.objects.select_for_update()
+            .filter(account_number__in=numbers).order_by("pk")
+        }
+        balances = {number: account.balance for number, account in accounts.items()}
+        tally = Tally((accounts[source] for source, _, _ in legs if source in accounts), batch=True)
+        transfer_id = uuid.uuid4()
+
+        for index, (source, target, amount) in enumerate(legs):
+            error = None
+            try:
+                amount = to_amount(amount)
+            except ValueError as e:
+                error = str(e)
+            else:
+                if amount <= 0:
+                    error = "Transfer amount should be positive!"
+                elif source not in accounts or target not in accounts:
+                    error = "Unknown account!"
+                elif source == target:
+                    error = "Cannot transfer to the same account!"
+                elif amount > balances[source]:
+                    error = "Insufficient funds!"
+                else:
+                    error = tally.allow(accounts[source], amount)
+
+            log = f"{source} -> {amount} -> {target}" if error else f"{source} -> {amount:.2f} -> {target}"
+            if error:
+                results.append({"index": index, "status": "failure", "error": error})
+                logs.append(LogEntry(action=ActionType.TRANSFER.value, status=ActionStatus.FAILURE.value,
+                                     details=' '.join((log, f"error: {error}")), account=accounts.get(source)))
+                continue
+            balances[source] -= amount
+            balances[target] += amount
+            entries.append(ledger.entry(accounts[source], Direction.DEBIT, amount, transfer_id))
+            entries.append(ledger.entry(accounts[target], Direction.CREDIT, amount, transfer_id))
+            results.append({"index": index, "status": "success"})
+            withdrawn, deposited, transferred = leg = [
+                LogEntry(action=ActionType.WITHDRAWAL.value, status=ActionStatus.SUCCESS.value,
+                         details=f"{source} -> {amount:.2f}", account=accounts[source]),
+                LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value,
+                         details=f"{amount:.2f} -> {target}", account=accounts[target]),
+                LogEntry(action=ActionType.TRANSFER.value, status=ActionStatus.SUCCESS.value,
+                         details=log, account=accounts[source]),
+            ]
+            logs.extend(leg)
+            paid[source].extend((withdrawn, transferred))
+            paid[target].append(deposited)
+
+        now = timezone.now()
+        changed = []
+        for number, account in accounts.items():
+            if balances[number] != account.balance:
+                account.balance, account.date_updated = balances[number], now
+                changed.append(account)
+        BankAccount.objects.bulk_update(changed, BALANCE_FIELDS)
+        invalidate_accounts(*(account.account_holder_id for account in changed))
+        for account in changed:
+            events.notify(account, account.balance, paid[account.account_number])
+        ledger.record(entries)
+        LogEntry.log_many(logs)
+        tally.commit()
+    return results
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_accounts
+from .models import BankAccount
+
+
+def _holder_may_change(update_fields) -> bool:
+    # balance changes made by bank.services save with update_fields and invalidate themselves
+    return update_fields is None or 'account_holder' in update_fields or 'account_holder_id' in update_fields
+
+
+@receiver(pre_save, sender=BankAccount)
+def account_saving(sender, instance, update_fields=None, raw=False, **kwargs):
+    # the previous holder's cached list still holds the account when it moves to someone else
+    instance._previous_holder_id = None
+    if not raw and instance.pk is not None and _holder_may_change(update_fields):
+        instance._previous_holder_id = (
+            BankAccount.objects.filter(pk=instance.pk).values_list('account_holder_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=BankAccount)
+def account_saved(sender, instance, update_fields=None, **kwargs):
+    if _holder_may_change(update_fields):
+        invalidate_accounts(instance.account_holder_id, getattr(instance, '_previous_holder_id', None))
+
+
+@receiver(post_delete, sender=BankAccount)
+def account_deleted(sender, instance, **kwargs):
+    invalidate_accounts(instance.account_holder_id)
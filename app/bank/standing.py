@@ -0,0 +1,208 @@
+"""
+Standing orders: recurring transfers paid in batches by
+``manage.py run_standing_orders``.
+
+A runner claims a batch of due orders by writing a fresh lease token
+(``claim_id``) and ``locked_until`` onto them: with
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the backend has it, elsewhere
+(SQLite) with one UPDATE whose WHERE re-checks that the orders are still
+due and unclaimed. It then pays the whole batch with ``bulk_transfer`` (one
+lock query, one balance update, one ledger and one log insert) and moves
+every order on to its next run in the same transaction. That transaction
+starts by touching the orders that still carry its token, so a runner
+whose lease ran out and was taken over pays nothing: any number of
+runners on any number of nodes can share the table without paying an
+order twice. A runner that dies leaves its batch to be claimed again once
+the lease expires.
+
+A failed payment (insufficient funds, a velocity limit) is recorded on the
+order and skipped like a paid one; missed runs (the runner was down) are
+paid once, not caught up.
+"""
+import calendar
+import datetime
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .enums import ActionStatus, Frequency
+from .models import StandingOrder
+from .services import bulk_transfer
+from .tasks import fork_pool
+
+STEPS = {
+    Frequency.DAILY.value: datetime.timedelta(days=1),
+    Frequency.WEEKLY.value: datetime.timedelta(weeks=1),
+}
+
+
+def lease() -> datetime.timedelta:
+    return datetime.timedelta(seconds=getattr(settings, 'BANK_STANDING_ORDER_LEASE', 300))
+
+
+def occurrence(starts_at: datetime.datetime, frequency: str, n: int) -> datetime.datetime:
+    """ The ``n``-th run after ``starts_at``; monthly runs keep the local day of month, or the month's last day """
+    if frequency in STEPS:
+        return starts_at + STEPS[frequency] * n
+    local = timezone.localtime(starts_at)
+    year, month = divmod(local.month - 1 + n, 12)
+    year, month = local.year + year, month + 1
+    return local.replace(year=year, month=month, day=min(local.day, calendar.monthrange(year, month)[1]))
+
+
+def next_run(order: StandingOrder, after: datetime.datetime) -> datetime.datetime:
+    """ The first run of ``order`` later than ``after`` """
+    if order.frequency in STEPS:
+        n = max((after - order.starts_at) // STEPS[order.frequency] + 1, 0)
+    else:
+        start = timezone.localtime(order.starts_at)
+        after_local = timezone.localtime(after)
+        n = max((after_local.year - start.year) * 12 + after_local.month - start.month, 0)
+    while occurrence(order.starts_at, order.frequency, n) <= after:
+        n += 1
+    return occurrence(order.starts_at, order.frequency, n)
+
+
+def claim(limit: int) -> uuid.UUID:
+    """ Lease up to ``limit`` due orders under a new token; ``None`` when nothing is due """
+    now = timezone.now()
+    due = StandingOrder.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now), active=True, next_run_at__lte=now,
+    ).order_by('next_run_at', 'id')
+    token = uuid.uuid4()
+    claimed = dict(claim_id=token, locked_until=now + lease())
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            count = StandingOrder.objects.filter(pk__in=ids).update(**claimed)
+    else:
+        # one statement: the outer filter is evaluated again under the write lock
+        count = due.filter(pk__in=Subquery(due.values('pk')[:limit])).update(**claimed)
+    return token if count else None
+
+
+def pay(token: uuid.UUID) -> dict:
+    """ Pay the orders still leased under ``token`` and schedule their next runs, all in one transaction """
+    now = timezone.now()
+    counts = {'paid': 0, 'failed': 0}
+    with transaction.atomic():
+        # the first write waits for (PostgreSQL) or takes (SQLite) the orders' write locks,
+        # so a runner that has lost its lease finds nothing here
+        if not StandingOrder.objects.filter(claim_id=token).update(last_run_at=now):
+            return counts
+        orders = list(
+            StandingOrder.objects.filter(claim_id=token)
+            .select_related('from_account', 'to_account').order_by('next_run_at', 'id')
+        )
+        results = bulk_transfer([
+            (order.from_account.account_number, order.to_account.account_number, order.amount) for order in orders
+        ])
+        for order, result in zip(orders, results):
+            failed = result['status'] == 'failure'
+            counts['failed' if failed else 'paid'] += 1
+            order.last_status = (ActionStatus.FAILURE if failed else ActionStatus.SUCCESS).value
+            order.last_error = result.get('error', '')[:255]
+            following = next_run(order, max(now, order.next_run_at))
+            if order.ends_at is not None and following > order.ends_at:
+                order.active = False
+            else:
+                order.next_run_at = following
+            order.claim_id = order.locked_until = None
+        _reschedule(orders)
+    return counts
+
+
+def _reschedule(orders: list) -> None:
+    """
+    Write the paid orders' schedules and outcomes back with one executemany;
+    ``bulk_update()`` compiles a CASE per column over the whole batch, which
+    costs more than paying it
+    """
+    quote = connection.ops.quote_name
+    columns = {name: StandingOrder._meta.get_field(name) for name in
+               ('next_run_at', 'active', 'last_status', 'last_error', 'claim_id', 'locked_until')}
+    sql = (
+        f"UPDATE {quote(StandingOrder._meta.db_table)} SET "
+        + ", ".join(f"{quote(field.column)} = %s" for field in columns.values())
+        + f" WHERE {quote(StandingOrder._meta.pk.column)} = %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (*(field.get_db_prep_save(getattr(order, name), connection) for name, field in columns.items()), order.pk)
+            for order in orders
+        ])
+
+
+def run_due(batch_size: int) -> dict:
+    """ Claim and pay one batch; ``None`` when nothing is due """
+    token = claim(batch_size)
+    return pay(token) if token else None
+
+
+class StandingOrderRunner:
+    """
+    Pays due standing orders batch by batch on ``processes`` forked
+    processes (inline when ``processes`` is 1), each claiming its own
+    batches; see ``tasks.Worker``.
+    """
+
+    def __init__(self, processes: int = 1, batch_size: int = None, poll_interval: float = 1.0):
+        self.processes = max(processes, 1)
+        self.batch_size = batch_size or getattr(settings, 'BANK_STANDING_ORDER_BATCH', 500)
+        self.poll_interval = poll_interval
+        self.pool = None
+
+    def _submit(self) -> Future:
+        if self.pool is not None:
+            return self.pool.submit(run_due, self.batch_size)
+        future = Future()
+        future.set_result(run_due(self.batch_size))
+        return future
+
+    def run(self, once: bool = False) -> dict:
+        """ Pay orders until interrupted, or with ``once`` until none is due; returns counts """
+        counts = {'paid': 0, 'failed': 0, 'batches': 0}
+
+        def collect(futures) -> tuple:
+            """ (batches paid, whether some runner found nothing due) """
+            batches, idle = 0, False
+            for future in futures:
+                result = future.result()
+                if result is None:
+                    idle = True
+                    continue
+                batches += 1
+                counts['paid'] += result['paid']
+                counts['failed'] += result['failed']
+            counts['batches'] += batches
+            return batches, idle
+
+        if self.processes > 1:
+            self.pool = fork_pool(self.processes)
+        running = set()
+        try:
+            while True:
+                while len(running) < self.processes:
+                    running.add(self._submit())
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                batches, idle = collect(finished)
+                if not idle:
+                    continue
+                # nothing left to claim: let the others finish, then look once more before stopping or waiting
+                more, _ = collect(running)
+                running = set()
+                if batches or more:
+                    continue
+                if once:
+                    return counts
+                time.sleep(self.poll_interval)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
@@ -0,0 +1,285 @@
+"""
+Database-backed background tasks, run by ``manage.py run_worker``.
+
+``enqueue()`` inserts a ``Task`` row in the caller's transaction, so a task
+becomes visible to workers only once the work that scheduled it commits,
+and disappears with it on a rollback. Workers claim due tasks with
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the backend has it, and with a
+conditional UPDATE per task elsewhere (SQLite). A claim is a lease of
+``BANK_TASK_LEASE`` seconds: a task whose worker died is claimed again once
+the lease runs out, so handlers must be safe to run twice. Failing tasks
+are retried with exponential backoff until ``max_attempts``.
+
+Handlers are plain functions registered with ``@task("name")``; they take
+the JSON payload as keyword arguments and return a JSON-serialisable
+result.
+"""
+import datetime
+import gc
+import io
+import multiprocessing
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from decimal import Decimal
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.db.models import F, Max, Min, Q, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import ledger
+from .cache import invalidate_accounts
+from .enums import AccountType, ActionStatus, ActionType, Direction, TaskStatus
+from .exports import LOG_COLUMNS, export_file, statement_entries
+from .params import moment
+from .models import BankAccount, CustomUser, LedgerEntry, LogEntry, Task
+
+REGISTRY = {}
+RETRY_DELAY = 10  # seconds before the first retry, doubled for every further attempt
+INTEREST_CHUNK = 1000
+PICTURE_SIZE = (1024, 1024)
+THUMBNAIL_SIZE = (128, 128)
+OUTCOMES = {TaskStatus.DONE.value: 'done', TaskStatus.FAILED.value: 'failed', TaskStatus.QUEUED.value: 'retried'}
+
+
+def task(name: str):
+    """ Register the decorated function as the handler of tasks called ``name`` """
+    def decorator(func):
+        REGISTRY[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name: str, owner_id: int = None, run_after=None, max_attempts: int = 3, **payload) -> Task:
+    """ Queue ``name`` with ``payload``; ``owner_id`` is the user allowed to see the task through the API """
+    if name not in REGISTRY:
+        raise LookupError(f"Unknown task {name!r}")
+    return Task.objects.create(
+        name=name, payload=payload, user_id=owner_id, max_attempts=max_attempts, run_after=run_after or timezone.now(),
+    )
+
+
+def lease() -> datetime.timedelta:
+    return datetime.timedelta(seconds=getattr(settings, 'BANK_TASK_LEASE', 600))
+
+
+def claim(limit: int) -> list:
+    """ Lease up to ``limit`` due tasks (queued, or running with an expired lease) and return their ids """
+    now = timezone.now()
+    due = Task.objects.filter(
+        Q(status=TaskStatus.QUEUED.value) | Q(status=TaskStatus.RUNNING.value, locked_until__lt=now),
+        run_after__lte=now,
+    ).order_by('run_after', 'id')
+    claimed = dict(status=TaskStatus.RUNNING.value, locked_until=now + lease(), attempts=F('attempts') + 1)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Task.objects.filter(pk__in=ids).update(**claimed)
+        return ids
+    # no row locks: whoever flips a candidate out of the state it was read in owns it
+    ids = []
+    for pk, status, locked_until in due.values_list('pk', 'status', 'locked_until')[:limit]:
+        if Task.objects.filter(pk=pk, status=status, locked_until=locked_until).update(**claimed):
+            ids.append(pk)
+    return ids
+
+
+def run_task(pk: int) -> int:
+    """ Run a claimed task and record its result, or schedule a retry when it fails """
+    task = Task.objects.get(pk=pk)
+    try:
+        handler = REGISTRY.get(task.name)
+        if handler is None:
+            raise LookupError(f"Unknown task {task.name!r}")
+        result = handler(**task.payload)
+    except Exception:
+        if task.attempts >= task.max_attempts:
+            outcome = dict(status=TaskStatus.FAILED.value, finished_at=timezone.now())
+        else:
+            delay = datetime.timedelta(seconds=RETRY_DELAY * 2 ** (task.attempts - 1))
+            outcome = dict(status=TaskStatus.QUEUED.value, run_after=timezone.now() + delay)
+        Task.objects.filter(pk=pk).update(locked_until=None, error=traceback.format_exc(), **outcome)
+        return outcome['status']
+    Task.objects.filter(pk=pk).update(
+        status=TaskStatus.DONE.value, locked_until=None, result=result, error='', finished_at=timezone.now(),
+    )
+    return TaskStatus.DONE.value
+
+
+def fork_pool(processes: int) -> ProcessPoolExecutor:
+    """ A pool of ``processes`` forked children, all started before this process reconnects """
+    # children must not inherit open connections; with fork the pool
+    # starts all of them on the first submit, before we reconnect
+    connections.close_all()
+    # what is loaded by now stays shared with the children copy-on-write
+    # as long as their garbage collections do not touch it
+    gc.freeze()
+    pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'))
+    pool.submit(int).result()
+    return pool
+
+
+class Worker:
+    """
+    Claims tasks as capacity frees up and runs them on ``processes`` forked
+    processes (inline when ``processes`` is 1). Each child keeps its own
+    database connection for its lifetime.
+    """
+
+    def __init__(self, processes: int = 1, poll_interval: float = 1.0):
+        self.processes = max(processes, 1)
+        self.poll_interval = poll_interval
+        self.pool = None
+
+    def _submit(self, pk: int) -> Future:
+        if self.pool is not None:
+            return self.pool.submit(run_task, pk)
+        future = Future()
+        future.set_result(run_task(pk))
+        return future
+
+    def run(self, once: bool = False) -> dict:
+        """ Process tasks until interrupted, or with ``once`` until none is due; returns counts by status """
+        counts = {'done': 0, 'failed': 0, 'retried': 0}
+        if self.processes > 1:
+            self.pool = fork_pool(self.processes)
+        running = set()
+        try:
+            while True:
+                if len(running) < self.processes:
+                    running.update(self._submit(pk) for pk in claim(self.processes - len(running)))
+                if not running:
+                    if once:
+                        return counts
+                    time.sleep(self.poll_interval)
+                    continue
+                finished, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    counts[OUTCOMES[future.result()]] += 1
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+
+# savings interest
+
+def interest_run_id(period: str) -> uuid.UUID:
+    """ ``transfer_id`` shared by every ledger entry of one accrual period """
+    return uuid.uuid5(uuid.NAMESPACE_URL, f'bank:interest:{period}')
+
+
+@task('accrue_interest')
+def accrue_interest(period: str, rate: str = None, chunk_size: int = INTEREST_CHUNK) -> dict:
+    """
+    Monthly interest on savings accounts for ``period`` (e.g. ``2026-10``) at
+    ``rate`` percent a year: fans out one ``accrue_interest_chunk`` task per
+    primary key range, so the pool works through them in parallel.
+    """
+    rate = str(rate or getattr(settings, 'BANK_SAVINGS_INTEREST_RATE', '0'))
+    bounds = BankAccount.objects.filter(account_type=AccountType.SAVINGS.value).aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return {'chunks': 0}
+    with transaction.atomic():
+        chunks = [
+            enqueue('accrue_interest_chunk', period=period, rate=rate, first=first, stop=first + chunk_size)
+            for first in range(bounds['first'], bounds['last'] + 1, chunk_size)
+        ]
+    return {'chunks': len(chunks)}
+
+
+@task('accrue_interest_chunk')
+def accrue_interest_chunk(period: str, rate: str, first: int, stop: int) -> dict:
+    """
+    Credit a month of interest to the savings accounts with ``first <= pk <
+    stop`` in one set-based UPDATE. Accounts already holding an entry of
+    this period's run are skipped, so a retried chunk never pays twice.
+    """
+    run_id = interest_run_id(period)
+    interest = Round(F('balance') * Value(Decimal(rate) / 1200), 2)
+    with transaction.atomic():
+        accounts = (
+            BankAccount.objects.select_for_update()
+            .filter(pk__gte=first, pk__lt=stop, account_type=AccountType.SAVINGS.value, balance__gt=0)
+            .exclude(pk__in=LedgerEntry.objects.filter(transfer_id=run_id).values('account'))
+        )
+        credits = [
+            row for row in accounts.annotate(interest=interest)
+            .values_list('pk', 'account_number', 'account_holder_id', 'interest')
+            if row[3] > 0
+        ]
+        if not credits:
+            return {'accounts': 0, 'interest': '0.00'}
+        BankAccount.objects.filter(pk__in=[pk for pk, *_ in credits]).update(
+            balance=F('balance') + interest, date_updated=timezone.now(),
+        )
+        ledger.record([
+            LedgerEntry(account_id=pk, direction=Direction.CREDIT.value, amount=amount, transfer_id=run_id)
+            for pk, _, _, amount in credits
+        ])
+        LogEntry.log_many([
+            LogEntry(action=ActionType.INTEREST.value, status=ActionStatus.SUCCESS.value,
+                     details=f"{amount:.2f} -> {number} ({period})", account_id=pk)
+            for pk, number, _, amount in credits
+        ])
+        invalidate_accounts(*{holder for _, _, holder, _ in credits})
+    return {'accounts': len(credits), 'interest': f"{sum(amount for *_, amount in credits):.2f}"}
+
+
+# profile pictures
+
+def _jpeg(image, size) -> ContentFile:
+    copy = image.copy()
+    copy.thumbnail(size)
+    buffer = io.BytesIO()
+    copy.save(buffer, 'JPEG', quality=85, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+@task('process_profile_picture')
+def process_profile_picture(user_id: int) -> dict:
+    """
+    Replace an uploaded profile picture with a copy at most ``PICTURE_SIZE``
+    (EXIF rotation applied, stored as JPEG) and add a ``THUMBNAIL_SIZE``
+    thumbnail. The full-size upload is deleted afterwards.
+    """
+    from PIL import Image, ImageOps
+
+    user = CustomUser.objects.only('profile_picture', 'profile_thumbnail').get(pk=user_id)
+    original = user.profile_picture.name
+    if not original:
+        return {'skipped': 'no profile picture'}
+    with user.profile_picture.open('rb') as handle:
+        image = ImageOps.exif_transpose(Image.open(handle))
+        image = image.convert('RGB')
+    stem = PurePosixPath(original).stem
+    user.profile_picture.save(f'{stem}.jpg', _jpeg(image, PICTURE_SIZE), save=False)
+    user.profile_thumbnail.save(f'{stem}.jpg', _jpeg(image, THUMBNAIL_SIZE), save=False)
+    # the guard leaves a picture uploaded meanwhile alone (it has a task of its own)
+    if not CustomUser.objects.filter(pk=user_id, profile_picture=original).update(
+        profile_picture=user.profile_picture.name, profile_thumbnail=user.profile_thumbnail.name,
+    ):
+        default_storage.delete(user.profile_picture.name)
+        default_storage.delete(user.profile_thumbnail.name)
+        return {'skipped': 'picture changed'}
+    default_storage.delete(original)
+    return {'picture': user.profile_picture.name, 'thumbnail': user.profile_thumbnail.name, 'size': list(image.size)}
+
+
+# statements
+
+@task('render_statement')
+def render_statement(account_id: int, fmt: str = 'ndjson', since: str = None, until: str = None) -> dict:
+    """ Write an account statement to storage; the task's ``download`` endpoint serves it """
+    account = BankAccount.objects.only('account_number').get(pk=account_id)
+    entries = statement_entries(account, since and moment(since), until and moment(until))
+    with export_file(entries, LOG_COLUMNS, fmt) as rendered:
+        name = default_storage.save(f'statements/{account.account_number}-{uuid.uuid4().hex}.{fmt}', rendered)
+    return {'file': name, 'filename': f'statement-{account.account_number}.{fmt}', 'format': fmt}
@@ -1,6 +1,43 @@
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
 from faker import Faker
-from django.test import TestCase
-from .models import CustomUser, BankAccount, AccountType, LogEntry
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app.databases import database_from_url
+from . import analytics, events, ledger, metrics, standing, tasks, velocity
+from .enums import ActionStatus, ActionType, Direction, Frequency, TaskStatus
+from .cache import get_user_accounts
+from .logsinks import BufferedSink, get_sink
+from .routers import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .benchmarks import compare, load_scenarios
+from .seeding import seed_bank
+from .services import bulk_transfer, transfer, withdraw
+from .standing import StandingOrderRunner
+from .writequeue import get_write_queue
+from .querybudget import QueryBudgetExceeded, QueryBudgetMixin, query_budget
+from .models import (
+    CustomUser, BankAccount, AccountType, DailyRollup, IdempotencyKey, LedgerEntry, LogEntry, StandingOrder, Task,
+)
 
 faker = Faker()
 
@@ -36,5 +73,1264 @@ class BankAccountTest(TestCase):
         bank_account_1.transfer(bank_account_2, 1000.0)
         logs = LogEntry.objects.all()
         self.assertGreater(len(logs), 0)
-        for log in logs: print(log)
 
+
+class TransferServiceTest(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email=faker.email(),
+            username=faker.user_name(),
+            password=faker.password(length=20),
+        )
+        self.source = BankAccount.objects.create(
+            account_number="1" * 20, account_holder=user,
+            account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100,
+        )
+        self.target = BankAccount.objects.create(
+            account_number="2" * 20, account_holder=user,
+            account_type=AccountType.SAVINGS.value, bank_name="Bank", balance=0,
+        )
+
+    def test_transfer_moves_money_and_logs_once(self):
+        LogEntry.objects.all().delete()
+        self.source.transfer(self.target, 40.5)
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("59.50"))
+        self.assertEqual(self.target.balance, Decimal("40.50"))
+        self.assertEqual(
+            list(LogEntry.objects.order_by("id").values_list("action", "status")),
+            [(ActionType.WITHDRAWAL.value, ActionStatus.SUCCESS.value),
+             (ActionType.DEPOSIT.value, ActionStatus.SUCCESS.value),
+             (ActionType.TRANSFER.value, ActionStatus.SUCCESS.value)],
+        )
+        self.assertEqual(
+            list(LogEntry.objects.order_by("id").values_list("account", flat=True)),
+            [self.source.pk, self.target.pk, self.source.pk],
+        )
+
+    def test_insufficient_funds_changes_nothing(self):
+        LogEntry.objects.all().delete()
+        with self.assertRaises(ValueError):
+            self.source.transfer(self.target, 100.01)
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("100.00"))
+        self.assertEqual(self.target.balance, Decimal("0.00"))
+        self.assertEqual(
+            list(LogEntry.objects.values_list("action", "status")),
+            [(ActionType.TRANSFER.value, ActionStatus.FAILURE.value)],
+        )
+
+    def test_transfer_uses_stale_instance_safely(self):
+        stale = BankAccount.objects.get(pk=self.source.pk)
+        self.source.deposit(50)
+        stale.transfer(self.target, 120)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("30.00"))
+
+
+class BulkTransferApiTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(
+            email=faker.email(), username="admin", password=faker.password(length=20),
+        )
+        self.accounts = [
+            BankAccount.objects.create(
+                account_number=str(i) * 20, account_holder=self.admin,
+                account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100,
+            )
+            for i in range(1, 4)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_bulk_transfer_reports_each_leg(self):
+        a, b, c = (account.account_number for account in self.accounts)
+        response = self.client.post("/api/accounts/bulk-transfer/", {"legs": [
+            {"from_account": a, "to_account": b, "amount": "60.00"},
+            {"from_account": a, "to_account": c, "amount": "60.00"},
+            {"from_account": b, "to_account": c, "amount": "160.00"},
+            {"from_account": a, "to_account": "missing", "amount": "1"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["succeeded"], 2)
+        self.assertEqual([r["status"] for r in response.data["results"]],
+                         ["success", "failure", "success", "failure"])
+        balances = dict(BankAccount.objects.values_list("account_number", "balance"))
+        self.assertEqual(balances, {a: Decimal("40.00"), b: Decimal("0.00"), c: Decimal("260.00")})
+        self.assertEqual(LogEntry.objects.filter(action=ActionType.TRANSFER.value).count(), 4)
+        # the receiving side sees its credits in its own log, as with a single transfer
+        self.assertEqual(
+            sorted(LogEntry.objects.filter(action=ActionType.DEPOSIT.value).values_list("account__account_number", "details")),
+            sorted([(b, f"60.00 -> {b}"), (c, f"160.00 -> {c}")]),
+        )
+        self.assertEqual(LogEntry.objects.filter(action=ActionType.WITHDRAWAL.value, account=self.accounts[0]).count(), 1)
+
+    def test_payroll_passes_the_default_velocity_limits(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        source = self.accounts[0].account_number
+        payees = BankAccount.objects.bulk_create(
+            BankAccount(account_number=f"{i:020d}", account_holder=self.admin,
+                        account_type=AccountType.CHECKING.value, bank_name="Bank")
+            for i in range(25)
+        )
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                results = bulk_transfer([(source, payee.account_number, "1.00") for payee in payees])
+            self.assertEqual({result["status"] for result in results}, {"success"})
+        self.accounts[0].refresh_from_db()
+        self.assertEqual(self.accounts[0].balance, Decimal("50.00"))
+
+    def test_non_finite_amounts_fail_their_leg(self):
+        a, b, _ = (account.account_number for account in self.accounts)
+        legs = [(a, b, amount) for amount in ("NaN", "sNaN", "Infinity", "1e40", "5.00")]
+        self.assertEqual([r["status"] for r in bulk_transfer(legs)], ["failure"] * 4 + ["success"])
+        response = self.client.post("/api/accounts/bulk-transfer/", {"legs": [
+            {"from_account": a, "to_account": b, "amount": "NaN"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_transfer_requires_admin(self):
+        user = CustomUser.objects.create_user(email=faker.email(), username="plain", password="x" * 12)
+        self.client.force_authenticate(user)
+        response = self.client.post("/api/accounts/bulk-transfer/", {"legs": []}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class LogSinkTest(TestCase):
+    def test_a_sink_without_write_is_refused(self):
+        with self.settings(BANK_LOG_SINK={"BACKEND": "bank.logsinks.LogSink", "OPTIONS": {}}):
+            with self.assertRaises(TypeError):
+                get_sink()
+
+    def test_buffered_sink_batches_until_flush(self):
+        config = {"BACKEND": "bank.logsinks.BufferedSink", "OPTIONS": {"batch_size": 1000, "flush_interval": 3600}}
+        with self.settings(BANK_LOG_SINK=config):
+            LogEntry.objects.all().delete()
+            for _ in range(5):
+                LogEntry.log(ActionType.DEPOSIT, ActionStatus.SUCCESS, "buffered")
+            self.assertEqual(LogEntry.objects.count(), 0)
+            get_sink().flush()
+            self.assertEqual(LogEntry.objects.filter(details="buffered").count(), 5)
+
+    def test_buffered_sink_drops_only_the_rows_that_keep_failing(self):
+        sink = BufferedSink(flush_interval=3600, max_retries=1)
+        self.addCleanup(sink.close)
+        LogEntry.objects.all().delete()
+        bad = LogEntry(action=None, status=ActionStatus.SUCCESS.value, details="bad")
+        sink.write([LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value, details="good")
+                    for _ in range(3)] + [bad])
+        with self.assertLogs("bank.logsinks", "ERROR"):
+            sink.flush()  # retried once as a whole
+        self.assertEqual(LogEntry.objects.count(), 0)
+        with self.assertLogs("bank.logsinks", "ERROR") as logs:
+            sink.flush()
+        self.assertEqual(LogEntry.objects.filter(details="good").count(), 3)
+        self.assertIn("details='bad'", logs.output[-1])
+        sink.write([LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value, details="next")])
+        sink.flush()
+        self.assertTrue(LogEntry.objects.filter(details="next").exists())
+
+    def test_outbox_mode_writes_only_on_commit(self):
+        config = {"BACKEND": "bank.logsinks.SyncSink", "OPTIONS": {"on_commit": True}}
+        with self.settings(BANK_LOG_SINK=config):
+            LogEntry.objects.all().delete()
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                LogEntry.log(ActionType.DEPOSIT, ActionStatus.SUCCESS, "rolled back")
+                raise RuntimeError
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    LogEntry.log(ActionType.DEPOSIT, ActionStatus.SUCCESS, "committed")
+                self.assertEqual(LogEntry.objects.count(), 0)
+            self.assertEqual(list(LogEntry.objects.values_list("details", flat=True)), ["committed"])
+
+
+class ArchiveLogsTest(TestCase):
+    def test_archive_streams_old_months_and_deletes_them(self):
+        LogEntry.objects.all().delete()
+        old = timezone.now() - datetime.timedelta(days=400)
+        LogEntry.objects.bulk_create([
+            LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value, details="old", timestamp=old),
+            LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value, details="new"),
+        ])
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command("archive_logs", "--keep-months", "3", "--output-dir", tmp, stdout=io.StringIO())
+            [archive] = Path(tmp).glob("logs-*.jsonl.gz")
+            with gzip.open(archive, "rt") as fh:
+                rows = [json.loads(line) for line in fh]
+        self.assertEqual([row["details"] for row in rows], ["old"])
+        self.assertEqual(list(LogEntry.objects.values_list("details", flat=True)), ["new"])
+
+
+class ApiPaginationFilterTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(
+            email=faker.email(), username="admin", password=faker.password(length=20),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        LogEntry.objects.all().delete()
+
+    def test_logs_are_cursor_paginated_newest_first(self):
+        now = timezone.now()
+        LogEntry.objects.bulk_create(
+            LogEntry(action=ActionType.DEPOSIT.value, status=ActionStatus.SUCCESS.value,
+                     details=str(i), timestamp=now - datetime.timedelta(minutes=i))
+            for i in range(5)
+        )
+        page = self.client.get("/api/logs/", {"page_size": 2}).data
+        self.assertEqual([row["details"] for row in page["results"]], ["0", "1"])
+        self.assertIsNone(page["previous"])
+        page = self.client.get(page["next"]).data
+        self.assertEqual([row["details"] for row in page["results"]], ["2", "3"])
+
+    def test_log_filters(self):
+        LogEntry.log(ActionType.TRANSFER, ActionStatus.FAILURE, "keep")
+        LogEntry.log(ActionType.TRANSFER, ActionStatus.SUCCESS, "skip")
+        LogEntry.log(ActionType.DEPOSIT, ActionStatus.FAILURE, "skip")
+        response = self.client.get("/api/logs/", {"action": "transfer", "status": "FAILURE",
+                                                  "since": "2000-01-01"})
+        self.assertEqual([row["details"] for row in response.data["results"]], ["keep"])
+        response = self.client.get("/api/logs/", {"action": "nope", "until": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"action", "until"})
+
+    def test_account_filters(self):
+        for i, (kind, balance) in enumerate([("SAV", 10), ("SAV", 500), ("CHK", 500)]):
+            BankAccount.objects.create(account_number=str(i) * 20, account_holder=self.admin,
+                                       account_type=kind, bank_name="Bank", balance=balance)
+        response = self.client.get("/api/accounts/", {"type": "savings", "balance_min": "100"})
+        self.assertEqual([row["account_number"] for row in response.data["results"]], ["1" * 20])
+
+    def test_out_of_range_filters_are_rejected(self):
+        for params in ({"holder": "9" * 23}, {"balance_min": "NaN"}, {"balance_max": "Infinity"}):
+            response = self.client.get("/api/accounts/", params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(response.data), set(params))
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(
+            email=faker.email(), username="admin", password=faker.password(length=20),
+        )
+        self.account = BankAccount.objects.create(
+            account_number="7" * 20, account_holder=self.admin,
+            account_type=AccountType.CHECKING.value, bank_name="Bank", balance=0,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_log_export_streams_ndjson(self):
+        LogEntry.objects.all().delete()
+        self.account.deposit(10)
+        self.account.withdraw(3)
+        response = self.client.get("/api/logs/export/", {"action": "deposit"})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([(row["action"], row["details"]) for row in rows],
+                         [(ActionType.DEPOSIT.value, f"10.00 -> {self.account.account_number}")])
+
+    def test_statement_streams_csv_for_owner_only(self):
+        self.account.deposit(10)
+        response = self.client.get(f"/api/accounts/{self.account.pk}/statement/", {"fmt": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,action,status,timestamp,details,account_id")
+        self.assertEqual(len(lines), 2)
+
+        other = CustomUser.objects.create_user(email=faker.email(), username="other", password="x" * 12)
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/api/accounts/{self.account.pk}/statement/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_export_uses_async_iterator_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get("/api/logs/export/")
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertTrue(body.endswith(b"\n"))
+
+
+class LedgerTest(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email=faker.email(), username="ledger", password="x" * 12)
+        self.a = BankAccount.objects.create(account_number="3" * 20, account_holder=user,
+                                            account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100)
+        self.b = BankAccount.objects.create(account_number="4" * 20, account_holder=user,
+                                            account_type=AccountType.SAVINGS.value, bank_name="Bank")
+
+    def test_transfer_writes_balanced_entries(self):
+        self.a.transfer(self.b, 30)
+        entries = LedgerEntry.objects.exclude(account=self.a, direction=Direction.CREDIT.value, amount=100)
+        self.assertEqual(sorted(entries.values_list("account", "direction", "amount")),
+                         sorted([(self.a.pk, Direction.DEBIT.value, Decimal("30.00")),
+                                 (self.b.pk, Direction.CREDIT.value, Decimal("30.00"))]))
+        self.assertEqual(len(set(entries.values_list("transfer_id", flat=True))), 1)
+
+    def test_balance_as_of_uses_snapshot_and_later_entries(self):
+        self.a.withdraw(10)
+        LedgerEntry.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(ledger.snapshot_accounts([self.a.pk, self.b.pk]), 1)
+        self.a.deposit(5)
+        self.assertEqual(ledger.balance_as_of(self.a, timezone.now()), Decimal("95.00"))
+        self.assertEqual(ledger.balance_as_of(self.a, timezone.now() - datetime.timedelta(minutes=30)),
+                         Decimal("90.00"))
+
+    def test_reconcile_flags_balance_changed_outside_ledger(self):
+        self.a.transfer(self.b, 12.34)
+        call_command("reconcile", "--workers", "1", stdout=io.StringIO())
+        BankAccount.objects.filter(pk=self.b.pk).update(balance=1)
+        with self.assertRaises(CommandError):
+            call_command("reconcile", "--workers", "1", stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_admin_edits_cannot_change_balances(self):
+        admin = CustomUser.objects.create_superuser(email=faker.email(), username="auditor", password="x" * 12)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.patch(f"/api/accounts/{self.a.pk}/", {"balance": "1000000.00", "bank_name": "Other"},
+                                format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["balance"], "100.00")
+        response = client.post("/api/accounts/", {
+            "account_number": "5" * 20, "account_holder": admin.pk, "account_type": AccountType.SAVINGS.value,
+            "bank_name": "Bank", "balance": "25.00",
+        }, format="json")
+        self.assertEqual(response.data["balance"], "25.00")  # journaled as the opening balance
+        self.assertEqual(ledger.mismatches(list(BankAccount.objects.values_list("pk", flat=True))), [])
+        self.client.force_login(admin)
+        self.assertNotContains(self.client.get(f"/admin/bank/bankaccount/{self.a.pk}/change/"), 'name="balance"')
+
+
+class AccountCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="cached", password="x" * 12)
+        self.account = BankAccount.objects.create(account_number="5" * 20, account_holder=self.user,
+                                                  account_type=AccountType.SAVINGS.value, bank_name="Bank")
+
+    def test_api_list_is_served_from_cache_and_invalidated_on_commit(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get("/api/accounts/").data["results"][0]["balance"], "0.00")
+        with self.assertNumQueries(0):
+            client.get("/api/accounts/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.deposit(25)
+        self.assertEqual(client.get("/api/accounts/").data["results"][0]["balance"], "25.00")
+        self.assertEqual(client.get(f"/api/accounts/{self.account.pk}/").data["balance"], "25.00")
+
+    def test_account_page_fragment_follows_admin_edits(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get("/account/"), "0.00 PLN")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.balance = Decimal("7.00")
+            self.account.save()
+        self.assertContains(self.client.get("/account/"), "7.00 PLN")
+
+    def test_moving_an_account_invalidates_both_holders(self):
+        other = CustomUser.objects.create_user(email=faker.email(), username="heir", password="x" * 12)
+        for update_fields in (None, ["account_holder"]):
+            previous = self.account.account_holder
+            self.assertEqual([account.pk for account in get_user_accounts(previous.pk)], [self.account.pk])
+            self.assertEqual(get_user_accounts(other.pk), [])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.account.account_holder = other
+                self.account.save(update_fields=update_fields)
+            self.assertEqual(get_user_accounts(previous.pk), [])
+            self.assertEqual([account.pk for account in get_user_accounts(other.pk)], [self.account.pk])
+            other = previous
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="async", password="x" * 12)
+        self.admin = CustomUser.objects.create_superuser(email=faker.email(), username="root", password="x" * 12)
+        self.account = BankAccount.objects.create(account_number="6" * 20, account_holder=self.user,
+                                                  account_type=AccountType.SAVINGS.value, bank_name="Bank",
+                                                  balance=5)
+
+    async def test_account_endpoints_for_owner(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/api/async/accounts/")
+        self.assertEqual(response.json()["results"][0]["balance"], "5.00")
+        response = await self.async_client.get(f"/api/async/accounts/{self.account.pk}/")
+        self.assertEqual(response.json()["account_number"], "6" * 20)
+        response = await self.async_client.get("/api/async/logs/")
+        self.assertEqual(response.status_code, 403)
+
+    async def test_logs_keyset_for_staff(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get("/api/async/logs/", {"limit": 1})
+        first = response.json()
+        self.assertEqual(len(first["results"]), 1)
+        response = await self.async_client.get("/api/async/logs/", {"before": first["next_before"]})
+        self.assertTrue(all(row["id"] < first["results"][0]["id"] for row in response.json()["results"]))
+        response = await self.async_client.get("/api/async/logs/", {"before": "9" * 23})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "before: integer out of range")
+
+    async def test_account_page_renders_async(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/account/")
+        self.assertContains(response, "5.00 PLN")
+
+
+@override_settings(BANK_QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email=faker.email(), username="root", password="x" * 12)
+        holders = [
+            CustomUser.objects.create(email=f"holder{i}@example.com", username=f"holder{i}")
+            for i in range(10)
+        ]
+        for i, holder in enumerate(holders):
+            BankAccount.objects.create(account_number=f"{i:020d}", account_holder=holder,
+                                       account_type=AccountType.CHECKING.value, bank_name="Bank", balance=i)
+        self.client.force_login(self.admin)
+
+    def test_list_endpoints_stay_within_budget(self):
+        for url in ["/api/users/", "/api/accounts/", "/api/logs/", "/api/async/accounts/",
+                    "/admin/bank/bankaccount/"]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn("X-Query-Count", response)
+
+    def test_admin_changelist_does_not_query_per_row(self):
+        with self.assertQueryBudget(5):
+            self.client.get("/admin/bank/bankaccount/")
+
+    def test_budget_overrun_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                list(BankAccount.objects.all())
+                list(LogEntry.objects.all())
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        patcher = mock.patch("bank.routers.replica_aliases", return_value=["replica1"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, method, cookies=None):
+        seen = {}
+
+        def view(request):
+            seen["before_write"] = self.router.db_for_read(LogEntry)
+            self.router.db_for_write(BankAccount)
+            seen["after_write"] = self.router.db_for_read(LogEntry)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_requests_read_from_replica_until_they_write(self):
+        seen, response = self.route("get")
+        self.assertEqual(seen, {"before_write": "replica1", "after_write": "default"})
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.router.db_for_read(LogEntry), "default")
+
+    def test_account_cache_is_filled_from_the_primary(self):
+        user = CustomUser.objects.create_user(email=faker.email(), username="lagging", password="x" * 12)
+        cache.clear()
+        self.addCleanup(cache.clear)  # the user's id comes back in later tests
+
+        def view(request):
+            # "replica1" is not a configured database, so any read routed to it would fail
+            return HttpResponse(str(len(get_user_accounts(user.pk))))
+
+        self.assertEqual(ReplicaRoutingMiddleware(view)(RequestFactory().get("/")).content, b"0")
+
+    def test_writes_pin_following_reads_to_primary(self):
+        seen, response = self.route("post")
+        self.assertEqual(seen["before_write"], "default")
+        pinned_until = response.cookies[STICKY_COOKIE].value
+        seen, _ = self.route("get", {STICKY_COOKIE: pinned_until})
+        self.assertEqual(seen["before_write"], "default")
+
+
+class SqliteWriteModeTest(TransactionTestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email=faker.email(), username=faker.user_name(), password="x")
+        self.account = BankAccount.objects.create(
+            account_number="Q0000000000000000001", account_holder=user,
+            account_type=AccountType.CHECKING.value, bank_name="Test", balance=Decimal("100.00"),
+        )
+
+    def test_fast_profile_options(self):
+        with mock.patch.dict("os.environ", {"DATABASE_SQLITE_PROFILE": "fast"}):
+            options = database_from_url("sqlite:///bank.db")["OPTIONS"]
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL;", options["init_command"])
+        self.assertEqual(database_from_url("sqlite:///bank.db")["OPTIONS"], {})
+
+    @override_settings(BANK_WRITE_QUEUE=True)
+    def test_services_run_on_writer_thread(self):
+        write_queue = get_write_queue()
+        with mock.patch("bank.services.invalidate_accounts") as invalidate:
+            invalidate.side_effect = lambda *ids: self.assertTrue(write_queue.in_writer_thread())
+            self.account.deposit(50)
+        self.assertEqual(invalidate.call_count, 1)
+        with self.assertRaises(ValueError):
+            self.account.withdraw(1000)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("150.00"))
+        statuses = set(LogEntry.objects.filter(account=self.account).values_list("action", "status"))
+        self.assertIn((ActionType.DEPOSIT.value, ActionStatus.SUCCESS.value), statuses)
+        self.assertIn((ActionType.WITHDRAWAL.value, ActionStatus.FAILURE.value), statuses)
+
+
+class BenchmarkSuiteTest(TestCase):
+    options = {"threads": 1, "iterations": 2, "scale": 0}
+
+    def test_seed_bank(self):
+        data = seed_bank(users=3, accounts_per_user=2, logs_per_account=5, password="secret")
+        self.assertEqual(data.counts["users"], 3)
+        self.assertEqual(data.accounts().count(), 6)
+        self.assertEqual(LogEntry.objects.filter(account__in=data.accounts()).count(), 30)
+        self.assertTrue(data.users()[0].check_password("secret"))
+        self.assertEqual(data.users()[0].bank_accounts.count(), 2)
+        # opening balances are journaled, so the seeded data reconciles
+        self.assertEqual(ledger.mismatches(list(data.accounts().values_list("pk", flat=True))), [])
+
+    def test_seed_bank_command(self):
+        out = io.StringIO()
+        call_command("seed_bank", users=4, logs_per_account=1, stdout=out)
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(CustomUser.objects.filter(email__endswith="@seed.example.com").count(), 4)
+        # the indexes are only dropped when asked for with --defer-indexes
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, LogEntry._meta.db_table)
+        self.assertTrue({index.name for index in LogEntry._meta.indexes} <= set(constraints))
+
+    def test_http_scenarios_report_queries(self):
+        scenarios = load_scenarios()
+        result = scenarios["api_logs"]({**self.options, "scale": 200})
+        self.assertEqual(result["first_page"]["latency"]["count"], 2)
+        self.assertLessEqual(result["first_page"]["queries"], 3)
+        self.assertNotIn("error", scenarios["account_page"]({**self.options, "scale": 200}))
+
+    def test_compare_flags_regressions(self):
+        baseline = {"s": {"latency": {"p95_ms": 10.0}, "ops_per_s": 100.0, "money_conserved": True}}
+        current = {"s": {"latency": {"p95_ms": 15.0}, "ops_per_s": 50.0, "money_conserved": True}}
+        self.assertEqual(sorted(compare(baseline, current)), [
+            ("s.latency.p95_ms", 10.0, 15.0, 0.5),
+            ("s.ops_per_s", 100.0, 50.0, 0.5),
+        ])
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.staff = CustomUser.objects.create_user(email=faker.email(), username="metrics-staff", password="x", is_staff=True)
+        self.account = BankAccount.objects.create(
+            account_number="M0000000000000000001", account_holder=self.staff,
+            account_type=AccountType.CHECKING.value, bank_name="Test", balance=Decimal("10.00"),
+        )
+        self.client.force_login(self.staff)
+
+    def test_requests_operations_and_serializers_are_recorded(self):
+        self.assertEqual(self.client.get("/api/accounts/").status_code, 200)
+        self.account.deposit(5)
+        with self.assertRaises(ValueError):
+            self.account.withdraw(1000)
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('bank_http_request_seconds_count{view="bankaccount-list",method="GET",status="200"} 1', body)
+        self.assertRegex(body, r'bank_db_queries_total\{view="bankaccount-list"\} [1-9]')
+        self.assertIn('bank_serializer_seconds_count{serializer="BankAccountSerializer[fast]"} 1', body)
+        self.assertIn('bank_operation_seconds_count{operation="deposit"} 1', body)
+        self.assertIn('bank_operation_errors_total{operation="withdraw"} 1.0', body)
+        # user created, deposit, failed withdrawal
+        self.assertIn('bank_log_emit_seconds_count{call="log"} 3', body)
+
+    def test_snapshots_of_other_workers_are_summed(self):
+        metrics.OPERATION_ERRORS.inc("transfer")
+        with tempfile.TemporaryDirectory() as directory, override_settings(BANK_METRICS_DIR=directory):
+            other = metrics.snapshot()
+            Path(directory, "999999.json").write_text(json.dumps(other))
+            metrics.writer.flush()  # this process's own file is replaced by the live values
+            body = metrics.render(metrics.collect())
+        self.assertIn('bank_operation_errors_total{operation="transfer"} 2.0', body)
+
+    def test_metrics_need_internal_ip_or_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 403)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="idem", password="x" * 12)
+        self.source, self.target = (
+            BankAccount.objects.create(
+                account_number=str(i) * 20, account_holder=self.user,
+                account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100,
+            )
+            for i in (7, 8)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, path, data, key):
+        return self.client.post(path, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def as_staff(self):
+        admin = CustomUser.objects.create_superuser(email=faker.email(), username="teller", password="x" * 12)
+        self.client.force_authenticate(admin)
+
+    def test_retried_deposit_is_applied_once(self):
+        self.as_staff()
+        path = f"/api/accounts/{self.source.pk}/deposit/"
+        first = self.post(path, {"amount": "25.00"}, "dep-1")
+        retry = self.post(path, {"amount": "25.00"}, "dep-1")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("125.00"))
+        self.assertEqual(self.post(path, {"amount": "25.00"}, "dep-2").json()["balance"], "150.00")
+
+    def test_rejected_transfer_is_replayed_without_running_again(self):
+        path = f"/api/accounts/{self.source.pk}/transfer/"
+        data = {"to_account": self.target.account_number, "amount": "500.00"}
+        self.assertEqual(self.post(path, data, "t-1").status_code, 400)
+        failures = LogEntry.objects.filter(action=ActionType.TRANSFER.value, status=ActionStatus.FAILURE.value)
+        self.assertEqual(failures.count(), 1)
+        self.assertEqual(self.post(path, data, "t-1").status_code, 400)
+        self.assertEqual(failures.count(), 1)
+
+    def test_key_reused_for_a_different_request(self):
+        path = f"/api/accounts/{self.source.pk}/withdraw/"
+        self.post(path, {"amount": "1.00"}, "w-1")
+        self.assertEqual(self.post(path, {"amount": "2.00"}, "w-1").status_code, 422)
+
+    def test_holders_cannot_deposit(self):
+        response = self.post(f"/api/accounts/{self.source.pk}/deposit/", {"amount": "1000000.00"}, "mint")
+        self.assertEqual(response.status_code, 403)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("100.00"))
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        self.as_staff()
+        path = f"/api/accounts/{self.source.pk}/deposit/"
+        self.post(path, {"amount": "1.00"}, "old")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertNotIn("Idempotent-Replayed", self.post(path, {"amount": "1.00"}, "old"))
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("102.00"))
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        call_command("purge_idempotency_keys", stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_other_users_accounts_are_not_reachable(self):
+        other = CustomUser.objects.create_user(email=faker.email(), username="other", password="x" * 12)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.post(f"/api/accounts/{self.source.pk}/withdraw/", {"amount": "1"}, "k").status_code, 404)
+
+    def test_money_moves_check_ownership_in_the_database(self):
+        self.addCleanup(cache.clear)
+        self.assertEqual(self.client.get("/api/accounts/").data["results"][0]["id"], self.source.pk)  # cached
+        heir = CustomUser.objects.create_user(email=faker.email(), username="heir", password="x" * 12)
+        BankAccount.objects.filter(pk=self.source.pk).update(account_holder=heir)  # no signal: the cache is stale
+        for action in ("withdraw", "transfer"):
+            data = {"amount": "1.00", "to_account": self.target.account_number}
+            self.assertEqual(self.post(f"/api/accounts/{self.source.pk}/{action}/", data, action).status_code, 404)
+        self.assertEqual(self.client.get(f"/api/accounts/{self.source.pk}/statement/").status_code, 404)
+        # a copy read before the account moved is not paid from either
+        with self.assertRaisesMessage(ValueError, "Account holder has changed!"):
+            withdraw(self.source, 1)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("100.00"))
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="saver", password="x" * 12)
+        self.savings, self.checking = (
+            BankAccount.objects.create(
+                account_number=str(i) * 20, account_holder=self.user,
+                account_type=account_type.value, bank_name="Bank", balance=1200,
+            )
+            for i, account_type in ((1, AccountType.SAVINGS), (2, AccountType.CHECKING))
+        )
+
+    def test_interest_is_accrued_once_per_period(self):
+        for _ in range(2):
+            tasks.enqueue("accrue_interest", period="2026-10", rate="12.00")
+            self.assertEqual(tasks.Worker().run(once=True)["failed"], 0)
+        self.savings.refresh_from_db()
+        self.checking.refresh_from_db()
+        self.assertEqual(self.savings.balance, Decimal("1212.00"))
+        self.assertEqual(self.checking.balance, Decimal("1200.00"))
+        self.assertEqual(LogEntry.objects.filter(action=ActionType.INTEREST.value).count(), 1)
+        self.assertEqual(ledger.mismatches([self.savings.pk, self.checking.pk]), [])
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        def broken():
+            raise RuntimeError("boom")
+
+        with mock.patch.dict(tasks.REGISTRY, {"broken": broken}):
+            task = tasks.enqueue("broken", max_attempts=2)
+            self.assertEqual(tasks.Worker().run(once=True), {"done": 0, "failed": 0, "retried": 1})
+            task.refresh_from_db()
+            self.assertEqual(task.status, TaskStatus.QUEUED.value)
+            self.assertGreater(task.run_after, timezone.now())
+            self.assertEqual(tasks.claim(10), [])
+            Task.objects.update(run_after=timezone.now())
+            tasks.Worker().run(once=True)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (TaskStatus.FAILED.value, 2))
+        self.assertIn("RuntimeError: boom", task.error)
+
+    def test_expired_lease_is_claimed_again(self):
+        task = tasks.enqueue("accrue_interest", period="2026-10")
+        self.assertEqual(tasks.claim(10), [task.pk])
+        self.assertEqual(tasks.claim(10), [])
+        Task.objects.update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(tasks.claim(10), [task.pk])
+
+    def test_profile_picture_is_resized_off_the_request_path(self):
+        from PIL import Image
+
+        upload = io.BytesIO()
+        Image.new("RGB", (3000, 2000), "red").save(upload, "PNG")
+        response = self.client.post("/register/", {
+            "username": "pictured", "email": faker.email(), "first_name": "A", "last_name": "B",
+            "password1": "x" * 12, "password2": "x" * 12,
+            "profile_picture": SimpleUploadedFile("me.png", upload.getvalue(), content_type="image/png"),
+        })
+        self.assertEqual(response.status_code, 302)
+        user = CustomUser.objects.get(username="pictured")
+        self.assertTrue(Task.objects.filter(name="process_profile_picture", payload={"user_id": user.pk}).exists())
+
+        tasks.Worker().run(once=True)
+        user.refresh_from_db()
+        with Image.open(user.profile_picture.path) as picture, Image.open(user.profile_thumbnail.path) as thumbnail:
+            self.assertEqual(picture.size, (1024, 683))
+            self.assertEqual(thumbnail.size, (128, 85))
+        self.assertFalse((Path(self.media.name) / "profile_pics" / "me.png").exists())
+
+    def test_statement_rendered_in_background(self):
+        self.savings.deposit(10)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(f"/api/accounts/{self.savings.pk}/statement/?fmt=csv")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "queued")
+        self.assertEqual(client.get(f"/api/tasks/{response.json()['id']}/download/").status_code, 409)
+
+        tasks.Worker().run(once=True)
+        self.assertEqual(client.get(response["Location"]).json()["status"], "done")
+        download = client.get(f"/api/tasks/{response.json()['id']}/download/")
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(b"".join(download.streaming_content), b"".join(
+            client.get(f"/api/accounts/{self.savings.pk}/statement/?fmt=csv").streaming_content
+        ))
+
+        other = CustomUser.objects.create_user(email=faker.email(), username="nosy", password="x" * 12)
+        client.force_authenticate(other)
+        self.assertEqual(client.get(response["Location"]).status_code, 404)
+
+
+class LoginThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="guarded", password="right-password")
+
+    def login(self, username, password, **extra):
+        return self.client.post("/login/", {"username": username, "password": password}, **extra)
+
+    @override_settings(BANK_LOGIN_THROTTLE={"username": (2, 300)})
+    def test_username_is_locked_after_failures_without_hashing(self):
+        for _ in range(2):
+            self.assertContains(self.login("guarded", "wrong"), "Invalid credentials")
+        with mock.patch("django.contrib.auth.backends.ModelBackend.authenticate") as check:
+            response = self.login("guarded", "right-password")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        check.assert_not_called()
+        # the lock is per username, other users on the same address are unaffected
+        CustomUser.objects.create_user(email=faker.email(), username="neighbour", password="pw-neighbour")
+        self.assertEqual(self.login("neighbour", "pw-neighbour").status_code, 302)
+
+    @override_settings(BANK_LOGIN_THROTTLE={"ip": (3, 300), "username": (2, 300)})
+    def test_address_is_locked_across_usernames_and_success_resets_username(self):
+        self.login("guarded", "wrong")
+        self.assertEqual(self.login("guarded", "right-password").status_code, 302)
+        self.login("guarded", "wrong")
+        self.assertContains(self.login("guarded", "wrong"), "Invalid credentials")
+        self.assertEqual(self.login("nobody", "x").status_code, 429)
+        self.assertEqual(self.login("nobody", "x", REMOTE_ADDR="10.0.0.2").status_code, 200)
+
+    def test_fast_profile_rehashes_on_login(self):
+        from django.contrib.auth.hashers import get_hasher, identify_hasher
+        from app.authprofiles import AUTH_PROFILES
+
+        with override_settings(PASSWORD_HASHERS=AUTH_PROFILES["fast"]["PASSWORD_HASHERS"], BANK_PBKDF2_ITERATIONS=1000):
+            self.assertTrue(get_hasher().must_update(self.user.password))
+            self.assertEqual(self.login("guarded", "right-password").status_code, 302)
+            self.user.refresh_from_db()
+            self.assertEqual(type(identify_hasher(self.user.password)), type(get_hasher()))
+            self.assertFalse(get_hasher().must_update(self.user.password))
+
+    def test_auth_profiles_from_env(self):
+        from app.authprofiles import auth_from_env
+
+        with mock.patch.dict("os.environ", {"BANK_AUTH_PROFILE": "fast", "BANK_SESSION_ENGINE": "signed_cookies"}):
+            config = auth_from_env()
+        self.assertEqual(config["SESSION_ENGINE"], "django.contrib.sessions.backends.signed_cookies")
+        self.assertTrue(config["PASSWORD_HASHERS"][0].startswith("bank.hashers.Tuned"))
+        with mock.patch.dict("os.environ", {"BANK_AUTH_PROFILE": "cheap"}), self.assertRaises(ValueError):
+            auth_from_env()
+
+
+@skipUnless(settings.BANK_JWT, "djangorestframework-simplejwt is not installed")
+class JWTAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="bearer", password="token-password")
+        self.account = BankAccount.objects.create(
+            account_number="5" * 20, account_holder=self.user,
+            account_type=AccountType.CHECKING.value, bank_name="Bank", balance=10,
+        )
+        self.client = APIClient()
+        self.tokens = self.client.post("/api/token/", {"username": "bearer", "password": "token-password"}).json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_reads_need_no_session_or_user_query(self):
+        self.client.get("/api/accounts/")  # warms the account cache
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/api/accounts/").status_code, 200)
+            self.assertEqual(self.client.get(f"/api/accounts/{self.account.pk}/").status_code, 200)
+        self.assertEqual(len(queries), 0, [query["sql"] for query in queries])
+        self.assertEqual(self.client.get("/api/users/").status_code, 403)  # is_staff claim is False
+
+    def test_refresh_rotates_and_denies_the_old_token(self):
+        refreshed = self.client.post("/api/token/refresh/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertIn("refresh", refreshed.json())
+        self.assertEqual(self.client.post("/api/token/refresh/", {"refresh": self.tokens["refresh"]}).status_code, 401)
+
+    def test_revoked_tokens_are_rejected(self):
+        response = self.client.post("/api/token/revoke/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.client.get("/api/accounts/").status_code, 401)
+        self.assertEqual(self.client.post("/api/token/refresh/", {"refresh": self.tokens["refresh"]}).status_code, 401)
+
+    def test_demoted_user_loses_staff_on_refresh(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.post("/api/token/refresh/", {"refresh": self.tokens["refresh"]}).status_code, 401)
+
+
+class FastSerializerTest(TestCase):
+    def test_output_matches_model_serializers_exactly(self):
+        from rest_framework.renderers import JSONRenderer
+        from .fastserializers import FastSerializer
+        from .renderers import ORJSONRenderer
+        from .serializers import BankAccountSerializer, LogEntrySerializer
+
+        data = seed_bank(users=20, accounts_per_user=2, logs_per_account=3)
+        LogEntry.objects.create(action=ActionType.DEPOSIT.value, status=ActionStatus.PENDING.value,
+                                details="na\u2028ïve \"quoted\"", account=None)
+        for serializer_class, queryset in (
+            (BankAccountSerializer, data.accounts()),
+            (LogEntrySerializer, LogEntry.objects.order_by("pk")),
+        ):
+            fast = FastSerializer(serializer_class)
+            expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+            self.assertEqual(JSONRenderer().render(fast.serialize(fast.values(queryset))), expected)
+            self.assertEqual(ORJSONRenderer().render(fast.serialize(fast.values(queryset))), expected)
+
+    def test_list_endpoints_keep_their_pages(self):
+        staff = CustomUser.objects.create_user(email=faker.email(), username="lists", password="x", is_staff=True)
+        seed_bank(users=40, accounts_per_user=2, logs_per_account=1)
+        self.client.force_login(staff)
+        first = self.client.get("/api/logs/", {"page_size": 50}).json()
+        second = self.client.get(first["next"]).json()
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        self.assertIsNone(second["next"])
+        self.assertEqual(ids, list(LogEntry.objects.order_by("-timestamp").values_list("pk", flat=True)))
+
+
+class AnalyticsTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email=faker.email(), username="analyst", password="x" * 12)
+        self.a = BankAccount.objects.create(account_number="5" * 20, account_holder=self.user,
+                                            account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100)
+        self.b = BankAccount.objects.create(account_number="6" * 20, account_holder=self.user,
+                                            account_type=AccountType.SAVINGS.value, bank_name="Bank")
+
+    def rollups(self):
+        return sorted(DailyRollup.objects.values_list("account", "day", "credited", "debited", "credits", "debits"))
+
+    def test_rollups_follow_every_ledger_write(self):
+        self.a.deposit(50)
+        self.a.transfer(self.b, 30)
+        self.b.withdraw(10)
+        self.assertEqual(self.rollups(), [
+            (self.a.pk, timezone.localdate(), Decimal("150.00"), Decimal("30.00"), 2, 1),
+            (self.b.pk, timezone.localdate(), Decimal("30.00"), Decimal("10.00"), 1, 1),
+        ])
+        live = self.rollups()
+        self.assertEqual(analytics.rebuild_rollups([self.a.pk, self.b.pk]), 2)
+        self.assertEqual(self.rollups(), live)
+
+    def test_seeded_accounts_get_rollups(self):
+        data = seed_bank(users=5, accounts_per_user=2)
+        ids = list(data.accounts().values_list("pk", flat=True))
+        seeded = self.rollups()
+        self.assertEqual(data.counts["rollups"], DailyRollup.objects.filter(account__in=ids).count())
+        analytics.rebuild_rollups(ids)
+        self.assertEqual(self.rollups(), seeded)
+
+    def test_summary_buckets_running_balance_and_types(self):
+        today = timezone.localdate()
+        earlier = timezone.now() - datetime.timedelta(days=40)
+        # a back-dated deposit on b: 100 (a's opening) + 20 + 5 today
+        analytics.roll_up([LedgerEntry(account=self.b, direction=Direction.CREDIT.value, amount=Decimal("20.00"),
+                                       created_at=earlier)])
+        BankAccount.objects.filter(pk=self.b.pk).update(balance=20)
+        self.b.deposit(5)
+
+        report = analytics.holder_summary(self.user.pk, "day", since=today - datetime.timedelta(days=60))
+        self.assertEqual(report["opening_balance"], 0)
+        self.assertEqual([(row["period"], row["net"], row["closing_balance"]) for row in report["flows"]], [
+            (timezone.localdate(earlier), Decimal("20.00"), Decimal("20.00")),
+            (today, Decimal("105.00"), Decimal("125.00")),
+        ])
+        by_type = {row["account_type"]: row for row in report["by_type"]}
+        self.assertEqual(by_type[AccountType.SAVINGS.value]["balance"], Decimal("25.00"))
+        self.assertEqual(by_type[AccountType.SAVINGS.value]["inflow"], Decimal("25.00"))
+        self.assertEqual(by_type[AccountType.CHECKING.value]["share"], 80)
+
+        # a range that starts after the back-dated deposit opens with it
+        report = analytics.holder_summary(self.user.pk, "month", since=today - datetime.timedelta(days=7))
+        self.assertEqual(report["opening_balance"], Decimal("20.00"))
+        self.assertEqual(report["flows"][-1]["closing_balance"], Decimal("125.00"))
+
+    def test_api_scopes_reports_to_the_user(self):
+        other = CustomUser.objects.create_user(email=faker.email(), username="other", password="x" * 12)
+        BankAccount.objects.create(account_number="7" * 20, account_holder=other,
+                                   account_type=AccountType.BUSINESS.value, bank_name="Bank", balance=999)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/analytics/", {"period": "day", "holder": other.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row["balance"] for row in response.json()["by_type"]), ["0.00", "100.00"])
+        self.assertEqual(client.get("/api/analytics/", {"period": "hour"}).status_code, 400)
+        response = client.get("/api/analytics/", {"since": "2099-01-01"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"since": ["must not be after until"]})
+        self.assertEqual(client.get("/api/analytics/bank/").status_code, 403)
+
+        client.force_authenticate(CustomUser.objects.create_superuser(
+            email=faker.email(), username="boss", password="x" * 12))
+        data = client.get("/api/analytics/bank/", {"top": 1}).json()
+        self.assertEqual(data["top_holders"], [
+            {"rank": 1, "account_holder": other.pk, "username": "other", "accounts": 1, "total": "999.00"},
+        ])
+        self.assertEqual(sum(Decimal(row["balance"]) for row in data["by_type"]), Decimal("1099.00"))
+        self.assertEqual(client.get("/api/analytics/", {"holder": other.pk}).json()["by_type"][0]["balance"],
+                         "999.00")
+
+    def test_dashboard_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/dashboard/", {"period": "day"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "100.00 PLN")
+        response = self.client.get("/dashboard/", {"since": "2099-01-01"})
+        self.assertContains(response, "must not be after until", status_code=400)
+
+
+class StartupTest(TestCase):
+    def run_python(self, code: str, profile: str = "full") -> dict:
+        """ Run ``code`` in a fresh interpreter with the given app profile and return the JSON it prints """
+        env = {**os.environ, "BANK_APP_PROFILE": profile, "DATABASE_URL": "sqlite://",
+               "DJANGO_SETTINGS_MODULE": "app.settings"}
+        output = subprocess.run([sys.executable, "-c", code], env=env, cwd=settings.BASE_DIR,
+                                check=True, capture_output=True, text=True).stdout
+        return json.loads(output)
+
+    def test_api_profile_serves_only_the_api(self):
+        result = self.run_python(
+            "import json, sys, django\n"
+            "django.setup()\n"
+            "from django.apps import apps\n"
+            "from django.urls import NoReverseMatch, resolve, reverse\n"
+            "try:\n"
+            "    reverse('home')\n"
+            "    pages = True\n"
+            "except NoReverseMatch:\n"
+            "    pages = False\n"
+            "print(json.dumps({'admin': apps.is_installed('django.contrib.admin'), 'pages': pages,\n"
+            "                  'accounts': resolve('/api/accounts/').url_name}))\n",
+            profile="api",
+        )
+        self.assertEqual(result, {"admin": False, "pages": False, "accounts": "bankaccount-list"})
+
+    def test_routes_and_worker_skip_the_view_layer_until_used(self):
+        result = self.run_python(
+            "import json, sys, django\n"
+            "django.setup()\n"
+            "import app.urls, bank.tasks\n"
+            "before = sorted(m for m in ('bank.views', 'rest_framework.views') if m in sys.modules)\n"
+            "from django.urls import resolve\n"
+            "print(json.dumps({'before': before, 'login': resolve('/login/').url_name,\n"
+            "                  'after': 'bank.views' in sys.modules}))\n"
+        )
+        self.assertEqual(result, {"before": [], "login": "login", "after": True})
+
+    def test_app_profiles_from_env(self):
+        from app.appprofiles import apps_from_env
+
+        with mock.patch.dict("os.environ", {"BANK_APP_PROFILE": "api"}):
+            config = apps_from_env()
+        self.assertNotIn("django.contrib.admin", config["INSTALLED_APPS"])
+        self.assertNotIn("django.contrib.messages.middleware.MessageMiddleware", config["MIDDLEWARE"])
+        with mock.patch.dict("os.environ", {"BANK_APP_PROFILE": "slim"}), self.assertRaises(ValueError):
+            apps_from_env()
+
+    def test_choices_come_from_the_enums(self):
+        self.assertEqual(LogEntry._meta.get_field("action").choices, [(tag.value, str(tag)) for tag in ActionType])
+        self.assertEqual(BankAccount._meta.get_field("account_type").choices, AccountType.choices())
+
+
+@override_settings(BANK_VELOCITY_RULES=[{"scope": "account", "window": 60, "max_count": 2}])
+class VelocityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email=faker.email(), username=faker.user_name(), password="x" * 20)
+        self.source, self.other, self.target = BankAccount.objects.bulk_create(
+            BankAccount(account_number=str(digit) * 20, account_holder=self.user,
+                        account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100)
+            for digit in (1, 2, 3)
+        )
+
+    def test_count_limit_refuses_and_logs(self):
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                withdraw(self.source, 1)
+        with self.assertRaisesMessage(ValueError, "Velocity limit exceeded: at most 2 payments per minute per account!"):
+            withdraw(self.source, 1)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("98.00"))
+        self.assertEqual(LogEntry.objects.filter(account=self.source, status=ActionStatus.FAILURE.value).count(), 1)
+        # other accounts have counters of their own
+        transfer(self.other, self.target, 1)
+
+    @override_settings(BANK_VELOCITY_RULES=[{"scope": "user", "window": 24 * 3600, "max_amount": "50.00"}])
+    def test_user_amount_limit_spans_accounts_and_bulk_legs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer(self.source, self.target, 30)
+        with self.assertRaisesMessage(ValueError, "at most 50.00 per day per user"):
+            transfer(self.other, self.target, 30)
+        results = bulk_transfer([("1" * 20, "3" * 20, "15.00"), ("2" * 20, "3" * 20, "10.00")])
+        self.assertEqual([result["status"] for result in results], ["success", "failure"])
+
+    def test_a_bulk_transfer_is_one_payment_per_source(self):
+        legs = [("1" * 20, "3" * 20, "1.00")] * 5 + [("2" * 20, "3" * 20, "1.00")]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual({result["status"] for result in bulk_transfer(legs)}, {"success"})
+        with self.captureOnCommitCallbacks(execute=True):
+            withdraw(self.source, 1)
+        with self.assertRaisesMessage(ValueError, "Velocity limit exceeded"):
+            withdraw(self.source, 1)
+        # the ledger agrees once the counters are gone
+        cache.clear()
+        withdraw(self.other, 1)
+        with self.assertRaisesMessage(ValueError, "Velocity limit exceeded"):
+            withdraw(self.source, 1)
+
+    def test_counters_are_rebuilt_from_the_ledger(self):
+        withdraw(self.source, 1)  # not committed, so only the ledger knows about them
+        withdraw(self.source, 1)
+        cache.clear()
+        with self.assertRaisesMessage(ValueError, "Velocity limit exceeded"):
+            withdraw(self.source, 1)
+        # an account without payments gets zero counters, so its next check costs no query either
+        velocity.Tally([self.target])
+        with self.assertNumQueries(0):
+            self.assertIsNone(velocity.Tally([self.target]).allow(self.target, Decimal("1.00")))
+
+    def test_an_evicted_counter_is_rebuilt_not_read_as_zero(self):
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                withdraw(self.source, 1)
+        (count, _), _ = velocity._keys("account", self.source.pk, 60, time.time())
+        cache.delete(count)  # culled on its own, like locmem's MAX_ENTRIES does
+        with self.assertRaisesMessage(ValueError, "Velocity limit exceeded"):
+            withdraw(self.source, 1)
+        # a payment whose counter is gone when it commits leaves it to the next rebuild instead of restarting it
+        tally = velocity.Tally([self.other])
+        (count, paid), _ = velocity._keys("account", self.other.pk, 60, tally.now)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.assertIsNone(tally.allow(self.other, Decimal("1.00")))
+            tally.commit()
+            cache.delete_many([count, paid])
+        self.assertEqual(cache.get_many([count, paid]), {})
+
+    def test_previous_window_counts_by_its_overlap(self):
+        now = 600.0
+        tally = velocity.Tally([self.source], now=now)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.assertIsNone(tally.allow(self.source, Decimal("1.00")))
+                self.assertIsNone(tally.allow(self.source, Decimal("1.00")))
+                tally.commit()
+        self.assertIsNotNone(velocity.Tally([self.source], now=now + 30).allow(self.source, Decimal("1.00")))
+        # 90 s later half of the previous minute still overlaps: 2 * 0.5 + 1 fits
+        self.assertIsNone(velocity.Tally([self.source], now=now + 90).allow(self.source, Decimal("1.00")))
+        self.assertIsNotNone(velocity.Tally([self.source], now=now + 70).allow(self.source, Decimal("1.00")))
+
+
+class StandingOrderTest(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email=faker.email(), username=faker.user_name(), password="x" * 20)
+        self.source, self.target = BankAccount.objects.bulk_create(
+            BankAccount(account_number=str(digit) * 20, account_holder=user,
+                        account_type=AccountType.CHECKING.value, bank_name="Bank", balance=100)
+            for digit in (1, 2)
+        )
+        self.start = timezone.now() - datetime.timedelta(hours=1)
+
+    def order(self, amount="10.00", **kwargs) -> StandingOrder:
+        kwargs.setdefault("starts_at", self.start)
+        return StandingOrder.objects.create(
+            from_account=self.source, to_account=self.target, amount=Decimal(amount), **kwargs,
+        )
+
+    def test_runner_pays_due_orders_once(self):
+        monthly = self.order()
+        weekly = self.order("5.00", frequency=Frequency.WEEKLY.value)
+        self.order(starts_at=timezone.now() + datetime.timedelta(days=1))
+        with override_settings(BANK_VELOCITY_RULES=[]):
+            counts = StandingOrderRunner(batch_size=1).run(once=True)
+            self.assertEqual(counts, {"paid": 2, "failed": 0, "batches": 2})
+            self.assertEqual(StandingOrderRunner().run(once=True)["paid"], 0)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("85.00"))
+        self.assertEqual(LedgerEntry.objects.filter(account=self.source, direction=Direction.DEBIT.value).count(), 2)
+        monthly.refresh_from_db()
+        weekly.refresh_from_db()
+        self.assertEqual(monthly.next_run_at, standing.occurrence(self.start, Frequency.MONTHLY.value, 1))
+        self.assertEqual(weekly.next_run_at, self.start + datetime.timedelta(weeks=1))
+        self.assertEqual((monthly.last_status, monthly.claim_id), (ActionStatus.SUCCESS.value, None))
+
+    def test_a_lost_lease_pays_nothing(self):
+        self.order()
+        token = standing.claim(10)
+        self.assertIsNone(standing.claim(10))  # leased
+        StandingOrder.objects.update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        taken_over = standing.claim(10)
+        self.assertEqual(standing.pay(token), {"paid": 0, "failed": 0})
+        self.assertEqual(standing.pay(taken_over), {"paid": 1, "failed": 0})
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("90.00"))
+
+    def test_failed_payment_is_recorded_and_skipped(self):
+        order = self.order("500.00", frequency=Frequency.DAILY.value, ends_at=self.start + datetime.timedelta(hours=12))
+        self.assertEqual(standing.run_due(10), {"paid": 0, "failed": 1})
+        order.refresh_from_db()
+        self.assertEqual((order.last_status, order.last_error), (ActionStatus.FAILURE.value, "Insufficient funds!"))
+        self.assertFalse(order.active)  # the next run would be after ends_at
+        self.assertIsNone(standing.run_due(10))
+
+    def test_monthly_runs_keep_the_day_of_month(self):
+        tz = timezone.get_default_timezone()
+        order = StandingOrder(starts_at=datetime.datetime(2026, 1, 31, 9, 0, tzinfo=tz), frequency=Frequency.MONTHLY.value)
+        self.assertEqual(
+            [standing.occurrence(order.starts_at, order.frequency, n).date() for n in range(3)],
+            [datetime.date(2026, 1, 31), datetime.date(2026, 2, 28), datetime.date(2026, 3, 31)],
+        )
+        self.assertEqual(standing.next_run(order, order.starts_at).date(), datetime.date(2026, 2, 28))
+        self.assertEqual(standing.next_run(order, datetime.datetime(2026, 5, 1, tzinfo=tz)).date(),
+                         datetime.date(2026, 5, 31))
+
+
+class EventStreamTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.other = (
+            CustomUser.objects.create_user(email=faker.email(), username=name, password="x" * 12)
+            for name in ("events", "payee")
+        )
+        self.account, self.payee = BankAccount.objects.bulk_create(
+            BankAccount(account_number=str(digit) * 20, account_holder=holder,
+                        account_type=AccountType.CHECKING.value, bank_name="Bank", balance=10)
+            for digit, holder in ((1, self.user), (2, self.other))
+        )
+
+    async def open_stream(self, user=None) -> tuple:
+        """ Start ``event_stream`` for ``user`` (anonymous if None); returns (task, sent messages, disconnect) """
+        headers = []
+        if user is not None:
+            await self.async_client.aforce_login(user)
+            cookie = self.async_client.cookies[settings.SESSION_COOKIE_NAME]
+            headers.append((b"cookie", f"{cookie.key}={cookie.value}".encode()))
+        scope = {"type": "http", "method": "GET", "path": events.EVENTS_PATH, "query_string": b"", "headers": headers}
+        sent, disconnect = asyncio.Queue(), asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        task = asyncio.ensure_future(events.event_stream(scope, receive, sent.put))
+        return task, sent, disconnect
+
+    @staticmethod
+    async def body(sent) -> str:
+        return (await asyncio.wait_for(sent.get(), 5))["body"].decode()
+
+    async def test_holders_get_their_committed_changes(self):
+        task, sent, disconnect = await self.open_stream(self.user)
+        self.assertEqual((await sent.get())["status"], 200)
+        self.assertIn('"balance":"10.00"', await self.body(sent))
+        other_task, other_sent, other_disconnect = await self.open_stream(self.other)
+        await other_sent.get()
+        await self.body(other_sent)
+
+        def pay():
+            with self.captureOnCommitCallbacks(execute=True):
+                transfer(self.account, self.payee, 4)
+        await sync_to_async(pay)()
+
+        received = [await self.body(sent) for _ in range(3)]
+        self.assertIn('event: balance\ndata: {"account":%d,' % self.account.pk, received[0])
+        self.assertIn('"balance":"6.00"', received[0])
+        self.assertEqual([message.split("\n")[1] for message in received[1:]], ["event: log"] * 2)
+        self.assertIn('"balance":"14.00"', await self.body(other_sent))
+        self.assertTrue(sent.empty())
+
+        disconnect.set()
+        other_disconnect.set()
+        await asyncio.wait_for(asyncio.gather(task, other_task), 5)
+        self.assertNotIn(self.user.pk, events.hub.streams)
+
+    async def test_anonymous_stream_is_refused(self):
+        task, sent, _ = await self.open_stream()
+        await asyncio.wait_for(task, 5)
+        self.assertEqual((await sent.get())["status"], 403)
+
+    async def test_a_stream_that_falls_behind_is_told_to_resync(self):
+        hub = events.Hub(queue_size=2)
+        stream = hub.subscribe(self.user.pk)
+        hub.deliver(self.user.pk, [{"event": "balance", "data": {"balance": "1.00"}}] * 2)
+        hub.deliver(self.user.pk, [{"event": "balance", "data": {"balance": "2.00"}}])
+        self.assertEqual(len(stream.pending), 1)
+        self.assertIn(b"event: resync", await stream.get())
+
+    def test_a_broker_without_publish_is_refused(self):
+        with self.settings(BANK_EVENT_BROKER={"BACKEND": "bank.events.Broker", "OPTIONS": {}}):
+            with self.assertRaises(TypeError):
+                events.get_broker()
@@ -0,0 +1,84 @@
+"""
+Login throttling against credential stuffing and password guessing.
+
+Failed logins are counted in the cache per client IP and per username, in
+fixed windows (``BANK_LOGIN_THROTTLE``). Once either count reaches its
+limit, further attempts are refused before any password is hashed, so a
+flood of bad credentials costs a cache lookup each instead of a hasher
+run. A successful login clears the username's count. With several server
+processes the cache must be shared (``BANK_CACHE=redis`` or ``file``) for
+the limits to hold across all of them.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+
+# scope: (failed attempts, window in seconds)
+DEFAULT_LIMITS = {
+    'ip': (50, 300),
+    'username': (10, 300),
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'BANK_CACHE_ALIAS', 'default')]
+
+
+class LoginThrottle:
+    def limits(self) -> dict:
+        return {**DEFAULT_LIMITS, **getattr(settings, 'BANK_LOGIN_THROTTLE', {})}
+
+    def _windows(self, request, username):
+        """ (cache key, limit, seconds left in the window) for every scope that applies """
+        now = time.time()
+        idents = {
+            'ip': request.META.get('REMOTE_ADDR') if request is not None else None,
+            # hashed: usernames may hold characters cache backends reject in keys
+            'username': hashlib.sha256(username.lower().encode()).hexdigest() if username else None,
+        }
+        for scope, (limit, window) in self.limits().items():
+            if idents.get(scope):
+                key = f'bank:login:{scope}:{idents[scope]}:{int(now // window)}'
+                yield key, limit, int(window - now % window) + 1
+
+    def retry_after(self, request, username) -> int:
+        """ Seconds until ``username`` may try to log in again from this client, 0 if it may now """
+        windows = list(self._windows(request, username))
+        counts = _cache().get_many([key for key, _, _ in windows])
+        return max((left for key, limit, left in windows if counts.get(key, 0) >= limit), default=0)
+
+    def failed(self, request, username) -> None:
+        cache = _cache()
+        for key, _, left in self._windows(request, username):
+            cache.add(key, 0, left)
+            try:
+                cache.incr(key)
+            except ValueError:  # expired in between
+                cache.set(key, 1, left)
+
+    def succeeded(self, request, username) -> None:
+        _cache().delete_many([key for key, _, _ in self._windows(request, username) if ':username:' in key])
+
+
+throttle = LoginThrottle()
+
+
+class ThrottledModelBackend(ModelBackend):
+    """ ModelBackend that refuses throttled logins before checking the password """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if throttle.retry_after(request, username):
+            raise PermissionDenied  # stops authenticate() here, without trying other backends
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None:
+            throttle.failed(request, username)
+        else:
+            throttle.succeeded(request, username)
+        return user
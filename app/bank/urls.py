@@ -1,22 +1,19 @@
-from django.contrib import admin
-from django.urls import path, include
-from rest_framework.routers import DefaultRouter
-from bank.views import (
-    CustomUserViewSet, BankAccountViewSet, LogEntryViewSet,
-    home, register, login_view, profile, account, custom_logout
-)
+"""
+Routes of the bank app, registered lazily: every section is a resolver
+over a module name, and that module (with the views, DRF and the
+serializers behind it) is imported by the first request or ``reverse()``
+that needs it, not when the URLconf is loaded. Web servers import it all
+up front in the master process instead, see app/startup.py.
+"""
+from django.urls import path
+
+
+def lazy_include(module: str) -> tuple:
+    """ What ``include(module)`` returns, minus the import: ``path()`` builds a resolver that imports on use """
+    return (module, None, None)
 
-router = DefaultRouter()
-router.register(r'users', CustomUserViewSet)
-router.register(r'accounts', BankAccountViewSet)
-router.register(r'logs', LogEntryViewSet)
 
 urlpatterns = [
-    path('api/', include(router.urls)),
-    path('', home, name='home'),
-    path('register/', register, name='register'),
-    path('login/', login_view, name='login'),
-    path('profile/', profile, name='profile'),
-    path('account/', account, name='account'),
-    path('logout/', custom_logout, name='logout'),
-]
\ No newline at end of file
+    path('', lazy_include('bank.api_urls')),
+    path('', lazy_include('bank.page_urls')),
+]
@@ -0,0 +1,245 @@
+"""
+Velocity limits on money leaving accounts (withdrawals and transfers).
+
+``BANK_VELOCITY_RULES`` caps how often (``max_count``) and how much
+(``max_amount``) may be paid out of one account, or out of all accounts of
+one user (``scope``), within any ``window`` of seconds. A bulk transfer
+(payroll, a batch of standing orders) is one payment per source account
+for ``max_count``, all its legs share one ``transfer_id``; ``max_amount``
+still adds up every leg.
+
+Nothing is aggregated from the database per payment. Every (scope, window)
+pair keeps two integers per subject and fixed window in the cache: the
+number of payments and their sum in cents. The sliding total is the current
+window's count plus the previous one's, weighted by how much of it still
+overlaps the sliding window (the usual sliding window counter estimate,
+exact when payments are spread evenly). A check reads all counters of the
+involved accounts with one ``get_many`` inside the accounts' row locks, and
+successful payments are added with ``incr`` once their transaction commits.
+
+A counter that is in the cache is authoritative, even at zero; a missing
+one is unknown, never read as zero. Caches evict entries one by one (locmem
+culls at ``MAX_ENTRIES``, Redis under ``maxmemory``), so a check that misses
+any counter of a subject first rebuilds that subject's counters from the
+ledger's debit entries (one grouped query per window length, counting
+distinct ``transfer_id``), keeping the
+ones still cached. The same happens for every subject after a restart or
+flush, when a subject pays for the first time in a window, or ahead of
+traffic with ``manage.py rebuild_velocity``. A payment whose counter went
+missing before it was recorded is left to that rebuild: it is in the
+ledger by then. As with login throttling, several server processes need a
+shared cache (``BANK_CACHE=redis`` or ``file``) for the limits to hold
+across all of them.
+"""
+import datetime
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .enums import Direction
+from .metrics import VELOCITY_REJECTIONS
+from .models import LedgerEntry
+
+SCOPES = {'account': 'account_id', 'user': 'account__account_holder_id'}
+METRICS = ('n', 'c')  # payments, cents
+
+
+def _cache():
+    return caches[getattr(settings, 'BANK_CACHE_ALIAS', 'default')]
+
+
+def cents(amount) -> int:
+    return int(Decimal(str(amount)) * 100)
+
+
+def _period(seconds: int) -> str:
+    for unit, length in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds % length == 0:
+            count = seconds // length
+            return unit if count == 1 else f"{count} {unit}s"
+    return f"{seconds} seconds"
+
+
+class Rule(NamedTuple):
+    scope: str
+    window: int
+    max_count: int = None
+    max_amount: Decimal = None
+
+    @classmethod
+    def parse(cls, spec: dict) -> 'Rule':
+        if spec['scope'] not in SCOPES:
+            raise ValueError(f"Unknown velocity rule scope {spec['scope']!r}, expected one of {', '.join(SCOPES)}")
+        max_amount = spec.get('max_amount')
+        return cls(
+            spec['scope'], int(spec['window']), spec.get('max_count'),
+            Decimal(str(max_amount)) if max_amount is not None else None,
+        )
+
+    @property
+    def label(self) -> str:
+        limits = [f"{self.max_count} payments" if self.max_count is not None else None,
+                  f"{self.max_amount:.2f}" if self.max_amount is not None else None]
+        return f"{' / '.join(filter(None, limits))} per {_period(self.window)} per {self.scope}"
+
+
+def rules() -> list:
+    return [Rule.parse(spec) for spec in getattr(settings, 'BANK_VELOCITY_RULES', [])]
+
+
+def _key(scope: str, subject, window: int, bucket: int, metric: str) -> str:
+    return f'bank:velocity:{scope}:{subject}:{window}:{bucket}:{metric}'
+
+
+def _windows(active: list) -> set:
+    """ The distinct (scope, window) pairs the rules count in """
+    return {(rule.scope, rule.window) for rule in active}
+
+
+class Tally:
+    """
+    The sliding totals of a set of accounts, read with one cache round trip
+    (plus a rebuild of the subjects whose counters are missing).
+    ``allow()`` checks a payment against every rule and books it, so later
+    payments of the same transaction (bulk transfers) see it; with ``batch``
+    they all count as one payment per subject, only their amounts add up.
+    ``commit()`` adds the booked payments to the shared counters once the
+    transaction commits.
+    """
+
+    def __init__(self, accounts, active: list = None, now: float = None, batch: bool = False):
+        self.rules = rules() if active is None else active
+        self.now = time.time() if now is None else now
+        self.batch = batch
+        self.booked = defaultdict(lambda: [0, 0])  # (scope, subject, window) -> [count, cents]
+        self.subjects = {}
+        self.totals = {}
+        if not self.rules:
+            return
+        for account in accounts:
+            self.subjects[account.pk] = {'account': account.pk, 'user': account.account_holder_id}
+        names = {(scope, subjects[scope], window)
+                 for scope, window in _windows(self.rules) for subjects in self.subjects.values()}
+        keys = {name: _keys(*name, self.now) for name in names}
+        values = _cache().get_many([key for current, previous in keys.values() for key in (*current, *previous)])
+        missing = defaultdict(set)  # (scope, window) -> subjects
+        for (scope, subject, window), (current, previous) in keys.items():
+            if not all(key in values for key in (*current, *previous)):
+                missing[scope, window].add(subject)
+        for (scope, window), subjects in missing.items():
+            # counters that were still cached win over the rebuilt ones
+            values = {**_rebuild(scope, window, subjects, self.now, keep=True), **values}
+        for (scope, subject, window), (current, previous) in keys.items():
+            weight = 1 - (self.now % window) / window
+            for metric, now_key, before_key in zip(METRICS, current, previous):
+                self.totals[scope, subject, window, metric] = values[now_key] + values[before_key] * weight
+
+    def allow(self, account, amount: Decimal) -> str:
+        """ ``None`` and the payment booked, or the message of the first rule it would break """
+        subjects = self.subjects.get(account.pk)
+        if subjects is None:
+            return None
+        amount = cents(amount)
+        for rule in self.rules:
+            name = rule.scope, subjects[rule.scope], rule.window
+            count, paid = self.booked[name]
+            if rule.max_count is not None and self.totals[(*name, 'n')] + count + self._step(count) > rule.max_count:
+                return self._reject(rule)
+            if rule.max_amount is not None and self.totals[(*name, 'c')] + paid + amount > cents(rule.max_amount):
+                return self._reject(rule)
+        for name in {(scope, subjects[scope], window) for scope, window in _windows(self.rules)}:
+            self.booked[name][0] += self._step(self.booked[name][0])
+            self.booked[name][1] += amount
+        return None
+
+    def _step(self, count: int) -> int:
+        """ How much one more payment adds to a subject's booked ``count`` """
+        return 0 if self.batch and count else 1
+
+    def _reject(self, rule: Rule) -> str:
+        VELOCITY_REJECTIONS.inc(rule.label)
+        return f"Velocity limit exceeded: at most {rule.label}!"
+
+    def commit(self) -> None:
+        if self.booked:
+            transaction.on_commit(self._record)
+
+    def _record(self) -> None:
+        cache = _cache()
+        for (scope, subject, window), (count, paid) in self.booked.items():
+            current, _ = _keys(scope, subject, window, self.now)
+            for key, delta in zip(current, (count, paid)):
+                try:
+                    cache.incr(key, delta)
+                except ValueError:
+                    # evicted: creating it at ``delta`` would drop the earlier payments,
+                    # leave it missing so the next check rebuilds it from the ledger
+                    pass
+
+
+def _keys(scope: str, subject, window: int, now: float) -> tuple:
+    """ The (payments, cents) keys of the current and the previous window """
+    bucket = int(now // window)
+    return tuple(tuple(_key(scope, subject, window, bucket - offset, metric) for metric in METRICS)
+                 for offset in (0, 1))
+
+
+def _rebuild(scope: str, window: int, subjects, now: float, keep: bool) -> dict:
+    """
+    Compute the counters of the current and the previous window of
+    ``subjects`` (all with debits in them when ``None``) from the ledger;
+    subjects without debits get zeros. With ``keep`` counters still in the
+    cache are left alone, as they may already hold payments committed
+    after the ledger was read. Returns the computed counters.
+    """
+    bucket = int(now // window)
+    current = datetime.datetime.fromtimestamp(bucket * window, datetime.timezone.utc)
+    previous = current - datetime.timedelta(seconds=window)
+    recent = Q(created_at__gte=current)
+    rows = (
+        LedgerEntry.objects.filter(direction=Direction.DEBIT.value, created_at__gte=previous)
+        .values(subject=F(SCOPES[scope]))
+        .annotate(
+            count=Count('transfer_id', distinct=True, filter=recent), paid=Sum('amount', filter=recent),
+            previous_count=Count('transfer_id', distinct=True, filter=~recent),
+            previous_paid=Sum('amount', filter=~recent),
+        )
+        .order_by()
+    )
+    if subjects is not None:
+        rows = rows.filter(**{f'{SCOPES[scope]}__in': subjects})
+    counters = {}
+    for subject in subjects or ():
+        for keys in _keys(scope, subject, window, now):
+            counters.update(dict.fromkeys(keys, 0))
+    for row in rows:
+        (count, paid), (previous_count, previous_paid) = _keys(scope, row['subject'], window, now)
+        counters.update({
+            count: row['count'], paid: cents(row['paid'] or 0),
+            previous_count: row['previous_count'], previous_paid: cents(row['previous_paid'] or 0),
+        })
+    cache = _cache()
+    if keep:
+        for key, value in counters.items():
+            cache.add(key, value, 2 * window)
+    else:
+        cache.set_many(counters, 2 * window)
+    return counters
+
+
+def rebuild(active: list = None, now: float = None) -> int:
+    """
+    Recompute the counters of the current and the previous window of every
+    rule for every subject with debits in them from the ledger, e.g. after
+    the rules changed; checks rebuild missing subjects on their own.
+    Returns the number of counters written.
+    """
+    active = rules() if active is None else active
+    now = time.time() if now is None else now
+    return sum(len(_rebuild(scope, window, None, now, keep=False)) for scope, window in _windows(active))
@@ -1,45 +1,263 @@
 from rest_framework import permissions, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.reverse import reverse
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.forms import UserCreationForm  
 from django.contrib.auth.decorators import login_required
-from .models import CustomUser, BankAccount, LogEntry
-from .serializers import CustomUserSerializer, BankAccountSerializer, LogEntrySerializer
+from . import analytics, metrics
+from .cache import aaccounts_version, aget_user_accounts, get_user_accounts
+from .enums import AccountType, ActionStatus, ActionType, TaskStatus
+from .exports import FORMATS, LOG_COLUMNS, export_response, statement_entries
+from .fastserializers import FastSerializer
+from .params import choice, decimal, integer, moment
+from .models import CustomUser, BankAccount, LogEntry, Task
+from .pagination import LogEntryPagination
+from .idempotency import idempotent
+from .serializers import (
+    AnalyticsQuerySerializer, AnalyticsSerializer,
+    CustomUserSerializer, BankAccountSerializer, LogEntrySerializer, BulkTransferSerializer,
+    AmountSerializer, AccountTransferSerializer, TaskSerializer,
+)
+from .services import bulk_transfer, deposit, transfer, withdraw
+from .tasks import enqueue
+from .throttling import throttle
 from .forms import CustomUserCreationForm
 
 # API dla użytkowników (tylko administratorzy mogą zarządzać użytkownikami)
 class CustomUserViewSet(viewsets.ModelViewSet):
-    queryset = CustomUser.objects.all()
+    # tylko kolumny potrzebne serializerowi (bez hasła itp.)
+    queryset = CustomUser.objects.only(*CustomUserSerializer.Meta.fields)
     serializer_class = CustomUserSerializer
     permission_classes = [permissions.IsAdminUser]  # Tylko administratorzy mają dostęp
 
 
+def export_format(request):
+    fmt = request.query_params.get('fmt', 'ndjson')
+    if fmt not in FORMATS:
+        raise ValidationError({'fmt': [f"expected one of {', '.join(FORMATS)}"]})
+    return fmt
+
+
+class FastListMixin:
+    """ list() z wierszy .values() przez skompilowany FastSerializer - ten sam JSON bez budowania obiektów modelu """
+    fast_serializer = None
+
+    def fast_list(self, request):
+        rows = self.fast_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.fast_serializer.serialize(rows))
+        return self.get_paginated_response(self.fast_serializer.serialize(page))
+
+
 # API dla kont bankowych (zwykli użytkownicy widzą swoje konta, admini - wszystko)
-class BankAccountViewSet(viewsets.ModelViewSet):
+class BankAccountViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = BankAccount.objects.all()
     serializer_class = BankAccountSerializer
+    fast_serializer = FastSerializer(BankAccountSerializer)
+    filter_params = {
+        'holder': ('account_holder_id', integer),
+        'type': ('account_type', choice(AccountType)),
+        'balance_min': ('balance__gte', decimal),
+        'balance_max': ('balance__lte', decimal),
+    }
 
     def get_permissions(self):
         """ Administratorzy widzą wszystko, użytkownicy tylko swoje konta """
-        if self.action in ['list', 'retrieve']:  # Odczyt danych dostępny dla użytkowników
+        if self.action in ['list', 'retrieve', 'statement']:  # Odczyt danych dostępny dla użytkowników
             return [permissions.IsAuthenticated()]
-        return [permissions.IsAdminUser()]  # Tylko administrator może edytować i tworzyć konta
+        if self.action in ['withdraw', 'transfer']:  # Operacje na własnych kontach (get_queryset)
+            return [permissions.IsAuthenticated()]
+        return [permissions.IsAdminUser()]  # Tylko administrator może edytować i tworzyć konta oraz wpłacać środki
 
     def get_queryset(self):
         """ Zwykli użytkownicy widzą tylko swoje konta, admini widzą wszystko """
         user = self.request.user
         if user.is_staff:  # Admini widzą wszystko
             return BankAccount.objects.all()
-        return BankAccount.objects.filter(account_holder=user)  # Zwykli użytkownicy widzą tylko swoje konta
+        return BankAccount.objects.filter(account_holder_id=user.pk)  # Zwykli użytkownicy widzą tylko swoje konta
+
+    def list(self, request, *args, **kwargs):
+        """ Lista kont zwykłego użytkownika (bez filtrów) z cache, jeśli mieści się na jednej stronie """
+        if request.user.is_staff or request.query_params:
+            return self.fast_list(request)
+        accounts = get_user_accounts(request.user.pk)
+        if len(accounts) > self.paginator.page_size:
+            return self.fast_list(request)
+        return Response({
+            'next': None,
+            'previous': None,
+            'results': self.get_serializer(accounts, many=True).data,
+        })
+
+    def get_object(self):
+        """ Podgląd konta zwykłego użytkownika z cache jego kont - sprawdzenie własności bez zapytania do bazy """
+        if self.request.user.is_staff or self.action != 'retrieve':
+            # Operacje na pieniądzach i wyciągi sprawdzają właściciela w bazie (get_queryset), nie w cache,
+            # który po przeniesieniu konta do innego właściciela może być nieaktualny
+            return super().get_object()
+        for account in get_user_accounts(self.request.user.pk):
+            if str(account.pk) == self.kwargs['pk']:
+                return account
+        raise Http404
+
+    # Operacje zmieniające dane przyjmują nagłówek Idempotency-Key - powtórzone żądanie dostaje zapisaną odpowiedź
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @idempotent
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+    def _money_operation(self, request, operation, serializer_class):
+        """ Wspólna obsługa wpłaty/wypłaty/przelewu: walidacja, wywołanie serwisu, błąd biznesowy jako 400 """
+        account = self.get_object()
+        serializer = serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            operation(account, serializer.validated_data)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        account.refresh_from_db(fields=['balance', 'date_updated'])
+        return Response(self.get_serializer(account).data)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def deposit(self, request, pk=None):
+        return self._money_operation(request, lambda account, data: deposit(account, data['amount']), AmountSerializer)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def withdraw(self, request, pk=None):
+        return self._money_operation(request, lambda account, data: withdraw(account, data['amount']), AmountSerializer)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def transfer(self, request, pk=None):
+        def send(account, data):
+            target = BankAccount.objects.filter(account_number=data['to_account']).first()
+            if target is None:
+                raise ValueError(f"Account {data['to_account']} does not exist")
+            transfer(account, target, data['amount'])
+        return self._money_operation(request, send, AccountTransferSerializer)
+
+    @action(detail=False, methods=['post'], url_path='bulk-transfer')
+    @idempotent
+    def bulk_transfer(self, request):
+        """ Przelewy zbiorcze (np. wypłaty) - tylko administrator """
+        serializer = BulkTransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_transfer(serializer.validated_data['legs'])
+        failed = sum(1 for result in results if result['status'] == 'failure')
+        return Response({
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'results': results,
+        })
+
+    @action(detail=True, methods=['get', 'post'])
+    def statement(self, request, pk=None):
+        """
+        Wyciąg z konta jako strumień NDJSON/CSV (?fmt=, ?since=, ?until=).
+        POST zleca wygenerowanie pliku w tle i zwraca 202 z zadaniem (plik pod /api/tasks/<id>/download/)
+        """
+        account = self.get_object()
+        fmt = export_format(request)
+        try:
+            since = moment(request.query_params['since']) if request.query_params.get('since') else None
+            until = moment(request.query_params['until']) if request.query_params.get('until') else None
+        except ValueError as e:
+            raise ValidationError({'since/until': [str(e)]})
+        if request.method == 'POST':
+            task = enqueue('render_statement', owner_id=request.user.pk, account_id=account.pk, fmt=fmt,
+                           since=since, until=until)
+            location = reverse('task-detail', args=[task.pk], request=request)
+            return Response(TaskSerializer(task).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+        return export_response(request, statement_entries(account, since, until), LOG_COLUMNS,
+                               fmt, f'statement-{account.account_number}')
+
+
+# API dla zadań w tle (użytkownik widzi tylko zadania, które sam zlecił)
+class TaskViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Task.objects.all()
+    serializer_class = TaskSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Task.objects.all()
+        return Task.objects.filter(user_id=self.request.user.pk)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """ Plik wygenerowany przez zadanie (np. wyciąg) - dopiero po jego zakończeniu """
+        task = self.get_object()
+        if task.status != TaskStatus.DONE.value or not (task.result or {}).get('file'):
+            return Response({'detail': 'The task has not produced a file (yet).'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(default_storage.open(task.result['file']), as_attachment=True,
+                            filename=task.result['filename'])
 
 
 # API dla logów (tylko administratorzy mogą przeglądać logi)
-class LogEntryViewSet(viewsets.ReadOnlyModelViewSet):
+class LogEntryViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = LogEntry.objects.all()
     serializer_class = LogEntrySerializer
+    fast_serializer = FastSerializer(LogEntrySerializer)
     permission_classes = [permissions.IsAdminUser]  # Tylko administratorzy widzą logi
+    pagination_class = LogEntryPagination
+    filter_params = {
+        'action': ('action', choice(ActionType)),
+        'status': ('status', choice(ActionStatus)),
+        'account': ('account_id', integer),
+        'since': ('timestamp__gte', moment),
+        'until': ('timestamp__lt', moment),
+    }
+
+    def list(self, request, *args, **kwargs):
+        return self.fast_list(request)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """ Eksport logów jako strumień NDJSON/CSV, z tymi samymi filtrami co lista """
+        entries = self.filter_queryset(self.get_queryset()).order_by('id')
+        return export_response(request, entries, LOG_COLUMNS, export_format(request), 'logs')
+
+
+# API analityki - sumy, okresy, narastające salda i rankingi liczy baza z dziennych agregatów (bank/analytics.py)
+class AnalyticsViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def query(self, request) -> dict:
+        params = AnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def list(self, request):
+        """ Podsumowanie kont zalogowanego użytkownika (admin może podać ?holder=<id>) """
+        params = self.query(request)
+        holder = params.get('holder') if request.user.is_staff else None
+        data = analytics.holder_summary(holder or request.user.pk, params['period'], params.get('since'),
+                                        params.get('until'))
+        return Response(AnalyticsSerializer(data).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def bank(self, request):
+        """ Dane całego banku - tylko dla administratorów """
+        params = self.query(request)
+        data = analytics.bank_summary(params['period'], params.get('since'), params.get('until'), params['top'])
+        return Response(AnalyticsSerializer(data).data)
 
 
 # frontend
@@ -51,7 +269,9 @@ def register(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST, request.FILES)  # Handle file uploads like profile pictures
         if form.is_valid():
-            form.save()
+            user = form.save()
+            if user.profile_picture:  # Zmniejszenie zdjęcia i miniatura w tle (run_worker), nie w żądaniu
+                enqueue('process_profile_picture', user_id=user.pk)
             return redirect('profile')  # Redirect to home after successful registration
     else:
         form = CustomUserCreationForm()
@@ -64,7 +284,15 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
-        
+
+        # za dużo nieudanych prób z tego IP / na tego użytkownika - odmowa bez liczenia hasha
+        retry_after = throttle.retry_after(request, username)
+        if retry_after:
+            response = render(request, 'bank/login.html',
+                              {'error': 'Too many failed login attempts, try again later'}, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user) 
@@ -78,14 +306,42 @@ def login_view(request):
 
 
 @login_required
-def profile(request):
+async def profile(request):
+    # request.user podmieniony na już załadowanego użytkownika - szablony nie mogą odpytywać bazy w kontekście async
+    request.user = await request.auser()
     return render(request, 'bank/profile.html', {'user': request.user})
 
 @login_required
-def account(request):
-    user_accounts = request.user.bank_accounts.all()
-    return render(request, 'bank/account.html', {'accounts': user_accounts})
+async def account(request):
+    request.user = await request.auser()
+    return render(request, 'bank/account.html', {
+        'accounts': await aget_user_accounts(request.user.pk),
+        'accounts_version': await aaccounts_version(request.user.pk),
+    })
+
+@login_required
+def dashboard(request):
+    # ten sam raport co /api/analytics/, admini widzą dodatkowo cały bank
+    params = AnalyticsQuerySerializer(data=request.GET)
+    if not params.is_valid():
+        return render(request, 'bank/dashboard.html', {'periods': analytics.PERIODS, 'errors': params.errors},
+                      status=400)
+    query = params.validated_data
+    since, until = query['since'], query['until']
+    context = {
+        'periods': analytics.PERIODS,
+        'report': analytics.holder_summary(request.user.pk, query['period'], since, until),
+    }
+    if request.user.is_staff:
+        context['bank'] = analytics.bank_summary(query['period'], since, until)
+    return render(request, 'bank/dashboard.html', context)
 
 def custom_logout(request):
     logout(request)
-    return redirect('home')
\ No newline at end of file
+    return redirect('home')
+
+# Metryki w formacie Prometheusa - tylko dla adresów z INTERNAL_IPS (scraper) lub administratorów
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(metrics.render(metrics.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,156 @@
+"""
+In-process write queue for SQLite.
+
+SQLite allows one writer at a time and pays an fsync per commit. With
+``BANK_WRITE_QUEUE = True`` the money-moving functions in ``bank.services``
+and the ``QueuedSink`` audit log sink hand their work to a single writer
+thread, which runs whatever has queued up inside one transaction: writers
+never contend for the lock and a burst of N operations costs one commit.
+
+Each job runs under its own savepoint. A job that raises ``ValueError`` (a
+rejected deposit/transfer) keeps the failure log it wrote; any other error
+rolls the job back without affecting the rest of the batch.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from functools import wraps
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .logsinks import LogSink
+
+
+class WriteQueue:
+    def __init__(self, using: str = DEFAULT_DB_ALIAS, batch_size: int = 200):
+        self.using = using
+        self.batch_size = batch_size
+        self._jobs = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f"bank-writer-{using}", daemon=True)
+        self._thread.start()
+
+    def in_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        future = Future()
+        self._jobs.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """ Run ``func`` on the writer thread and wait for its result """
+        return self.submit(func, *args, **kwargs).result()
+
+    def stop(self) -> None:
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        try:
+            while not stopping:
+                batch = [self._jobs.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._jobs.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    batch.remove(None)
+                    stopping = True
+                self._run_batch(batch)
+        finally:
+            connections[self.using].close()
+
+    def _run_batch(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    sid = transaction.savepoint(using=self.using)
+                    try:
+                        result = func(*args, **kwargs)
+                    except ValueError as e:
+                        transaction.savepoint_commit(sid, using=self.using)
+                        outcomes.append((future, None, e))
+                    except Exception as e:
+                        transaction.savepoint_rollback(sid, using=self.using)
+                        outcomes.append((future, None, e))
+                    else:
+                        transaction.savepoint_commit(sid, using=self.using)
+                        outcomes.append((future, result, None))
+        except Exception as e:
+            # the commit itself failed: nothing in the batch was written
+            for future, *_ in outcomes:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """ The process-wide queue, or ``None`` when ``BANK_WRITE_QUEUE`` is off """
+    global _queue
+    if not getattr(settings, "BANK_WRITE_QUEUE", False):
+        return None
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteQueue()
+    return _queue
+
+
+def _can_queue(write_queue) -> bool:
+    # work inside the caller's own transaction must stay on the caller's connection
+    return (
+        write_queue is not None
+        and not write_queue.in_writer_thread()
+        and not connections[write_queue.using].in_atomic_block
+    )
+
+
+def serialized(func):
+    """ Run the decorated write on the writer thread when the write queue is enabled """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        write_queue = get_write_queue()
+        if not _can_queue(write_queue):
+            return func(*args, **kwargs)
+        return write_queue.run(func, *args, **kwargs)
+    return wrapper
+
+
+class QueuedSink(LogSink):
+    """ Audit log sink that inserts through the write queue without waiting for the result """
+
+    def write(self, entries):
+        from .models import LogEntry
+        write_queue = get_write_queue()
+        if not _can_queue(write_queue):
+            LogEntry.objects.bulk_create(entries)
+        else:
+            write_queue.submit(LogEntry.objects.bulk_create, entries)
+
+
+def reset_write_queue(**kwargs) -> None:
+    global _queue
+    if kwargs.get("setting", "BANK_WRITE_QUEUE") != "BANK_WRITE_QUEUE":
+        return
+    with _queue_lock:
+        if _queue is not None:
+            _queue.stop()
+        _queue = None
+
+
+setting_changed.connect(reset_write_queue)
@@ -0,0 +1,21 @@
+"""
+gunicorn settings, picked up from the working directory: ``gunicorn`` in app/.
+
+The application is loaded once in the master (``preload_app``) and
+``when_ready`` imports the rest of it (app/startup.py) before the workers
+are forked, so they share it copy-on-write and serve their first request
+without importing anything. Combine with ``BANK_APP_PROFILE=api`` for
+API-only instances.
+"""
+import os
+
+wsgi_app = 'app.wsgi:application'
+bind = os.environ.get('BANK_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = True
+
+
+def when_ready(server):
+    from app.startup import preload
+
+    preload()